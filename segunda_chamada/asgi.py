@@ -14,3 +14,10 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'segunda_chamada.settings')
 
 application = get_asgi_application()
+
+from django.conf import settings  # noqa: E402
+
+from solicitacoes.agendador import iniciar_agendador  # noqa: E402
+
+if settings.AGENDADOR:
+    iniciar_agendador()
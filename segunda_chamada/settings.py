@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -19,11 +20,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Inativo a menos que INSTRUMENTACAO esteja ligado (veja abaixo).
+    'solicitacoes.instrumentacao.InstrumentacaoMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'solicitacoes.api.TokenApiMiddleware',
+    'solicitacoes.papeis.PapelMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -31,7 +36,10 @@ ROOT_URLCONF = 'segunda_chamada.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # O DjangoTemplates com a medição de tempo da instrumentação, que só
+        # age com INSTRUMENTACAO ligado.
+        'BACKEND': 'solicitacoes.instrumentacao.TemplatesMedidos',
+        'NAME': 'django',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -46,12 +54,79 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'segunda_chamada.wsgi.application'
 
+# Perfil de produção do SQLite, aplicado a cada nova conexão (init_command).
+# WAL permite leituras simultâneas à escrita, synchronous=NORMAL é seguro com
+# WAL e o mmap evita cópias nas leituras. `timeout` é o busy timeout (s) e o
+# modo IMMEDIATE reserva a escrita no BEGIN, evitando o "database is locked"
+# que ocorre quando uma transação tenta promover a leitura para escrita.
+SQLITE_PRAGMAS = [
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA mmap_size=268435456',
+    'PRAGMA cache_size=-16000',
+    'PRAGMA temp_store=MEMORY',
+]
+SQLITE_TIMEOUT = 20
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'CONN_MAX_AGE': int(os.environ.get('CONN_MAX_AGE', 600)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': '; '.join(SQLITE_PRAGMAS),
+            'timeout': SQLITE_TIMEOUT,
+            'transaction_mode': 'IMMEDIATE',
+        },
+    },
+    # Mesma base em uma conexão separada e somente leitura, usada pelo
+    # RoteadorLeitura para as leituras fora de transação (dashboards).
+    'leitura': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': int(os.environ.get('CONN_MAX_AGE', 600)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': '; '.join([*SQLITE_PRAGMAS, 'PRAGMA query_only=ON']),
+            'timeout': SQLITE_TIMEOUT,
+        },
+        'TEST': {'MIRROR': 'default'},
+    },
 }
+DATABASE_ROUTERS = ['solicitacoes.roteador.RoteadorLeitura']
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'dashboards': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'dashboards',
+        'TIMEOUT': 60,
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+}
+
+# Aponte para um Redis local (ex.: redis://127.0.0.1:6379/1) para compartilhar
+# o cache dos dashboards entre processos.
+if os.environ.get('DASHBOARD_CACHE_URL'):
+    CACHES['dashboards'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['DASHBOARD_CACHE_URL'],
+        'TIMEOUT': 60,
+    }
+
+DASHBOARD_CACHE = 'dashboards'
+# Validade das versões dos escopos do cache. Uma mudança que não passe pelos
+# sinais (SQL manual, processo com outro cache) aparece depois disso, nos
+# dashboards e nas ETags da API.
+DASHBOARD_VERSOES_VALIDADE = 10 * 60
+
+# Sessões lidas do cache e gravadas também no banco; o perfil de cada usuário
+# fica no cache dos dashboards até ser salvo de novo (solicitacoes.papeis).
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+PAPEIS_CACHE_VALIDADE = 60 * 60
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -77,9 +152,22 @@ USE_I18N = True
 USE_TZ = True
 
 STATIC_URL = 'static/'
-STATICFILES_DIRS = [
-    BASE_DIR / 'solicitacoes' / 'static',
-]
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+# Com DEBUG desligado, `collectstatic` grava cada arquivo com o hash do
+# conteúdo no nome e as versões .gz/.br ao lado (solicitacoes.estaticos).
+# O CSS e a fonte de ícones saem de `manage.py construir_estaticos`.
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': (
+            'django.contrib.staticfiles.storage.StaticFilesStorage' if DEBUG
+            else 'solicitacoes.estaticos.ArmazenamentoEstatico'
+        ),
+    },
+}
 
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
@@ -89,3 +177,81 @@ LOGIN_REDIRECT_URL = 'dashboard_aluno'
 LOGOUT_REDIRECT_URL = 'login'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Tarefas periódicas em threads (solicitacoes/agendador.py): expiração,
+# notificações, arquivos, importações e exportações. Desligado por padrão,
+# porque cada worker do servidor rodaria a sua cópia. Ligue com AGENDADOR=1 em
+# um único processo, ou rode `manage.py agendador` à parte.
+AGENDADOR = os.environ.get('AGENDADOR') == '1'
+
+# Intervalo (em segundos) da varredura em processo que rejeita solicitações
+# com prazo expirado. Use 0 para desativar e agendar
+# `manage.py expirar_solicitacoes` externamente (cron, systemd timer etc.).
+EXPIRACAO_INTERVALO = 60
+
+# Entrega das notificações enfileiradas (EventoNotificacao). A thread em
+# processo drena a fila a cada NOTIFICACOES_INTERVALO segundos; use 0 e
+# `manage.py processar_notificacoes --intervalo 5` para um worker dedicado.
+NOTIFICACOES_INTERVALO = 5
+NOTIFICACOES_EMAIL = True
+# Um e-mail que falha é tentado de novo com espera crescente (1, 2, 4... até
+# 60 minutos) e descartado depois de NOTIFICACOES_EMAIL_TENTATIVAS falhas.
+NOTIFICACOES_EMAIL_TENTATIVAS = 8
+# Dias que uma notificação fica no painel antes de
+# `manage.py purgar_notificacoes` apagá-la.
+NOTIFICACOES_RETENCAO_DIAS = 180
+
+# Arquivos comprobatórios: limite aceito, tamanho de cada parte no envio
+# retomável e intervalo do pós-processamento (`manage.py processar_arquivos`).
+ARQUIVO_TAMANHO_MAXIMO = 10 * 1024 * 1024
+UPLOAD_PARTE_TAMANHO = 1024 * 1024
+ARQUIVOS_INTERVALO = 30
+
+# Fila de importações de usuários enviadas em /interno/usuarios/importar/.
+# Arquivos grandes podem ser importados direto com `manage.py provisionar_usuarios`.
+IMPORTACAO_USUARIOS_INTERVALO = 10
+
+# Exportações de solicitações pedidas em segundo plano (POST em
+# /exportacoes/solicitacoes/): intervalo da fila, dias em que o arquivo fica
+# disponível e endereço público usado no link enviado por e-mail.
+EXPORTACOES_INTERVALO = 10
+EXPORTACOES_VALIDADE_DIAS = 7
+SITE_URL = os.environ.get('SITE_URL', 'http://localhost:8000')
+
+# `manage.py arquivar_solicitacoes` move para as tabelas de arquivadas as
+# solicitações aprovadas ou rejeitadas feitas antes do início do semestre
+# letivo de ARQUIVAMENTO_SEMESTRES semestres atrás.
+ARQUIVAMENTO_SEMESTRES = 2
+
+# Atualizações ao vivo em /eventos/ (server-sent events). Exigem o servidor
+# ASGI (segunda_chamada.asgi:application, p.ex. `uvicorn`); sob WSGI o
+# endpoint responde 204 e os painéis ficam sem atualização automática.
+# BrokerLocal só alcança as conexões do próprio processo: rode um único
+# processo ASGI ou aponte EVENTOS_BROKER para uma classe com a mesma
+# interface sobre um broker compartilhado.
+EVENTOS_BROKER = 'solicitacoes.eventos.BrokerLocal'
+EVENTOS_PULSO = 20
+EVENTOS_RECONEXAO_MS = 5000
+
+# Entrega dos anexos depois da checagem de permissão: 'django' (FileResponse
+# com Range/ETag), 'nginx' (X-Accel-Redirect para ARQUIVOS_ACCEL_PREFIXO, uma
+# location `internal` apontando para MEDIA_ROOT) ou 'sendfile' (X-Sendfile do
+# Apache/lighttpd).
+ARQUIVOS_SERVIDOR = os.environ.get('ARQUIVOS_SERVIDOR', 'django')
+ARQUIVOS_ACCEL_PREFIXO = '/protegido/'
+
+# Instrumentação por view e papel (consultas, duplicatas, tempo de banco e de
+# template). Com INSTRUMENTACAO=1 os dados ficam em /interno/instrumentacao/
+# (staff) e /interno/metricas/ (Prometheus; staff ou Bearer INSTRUMENTACAO_TOKEN).
+# INSTRUMENTACAO_PERFIL_AMOSTRA é a fração de requisições rodando sob cProfile;
+# os INSTRUMENTACAO_PERFIS_GUARDADOS perfis mais lentos ficam em disco.
+INSTRUMENTACAO = os.environ.get('INSTRUMENTACAO') == '1'
+INSTRUMENTACAO_JANELA = 500
+INSTRUMENTACAO_TOKEN = os.environ.get('INSTRUMENTACAO_TOKEN', '')
+INSTRUMENTACAO_PERFIL_AMOSTRA = float(os.environ.get('INSTRUMENTACAO_PERFIL_AMOSTRA', 0))
+INSTRUMENTACAO_PERFIS_GUARDADOS = 10
+INSTRUMENTACAO_PERFIS_DIR = BASE_DIR / 'perfis'
+
+EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
+EMAIL_FILE_PATH = BASE_DIR / 'emails'
+DEFAULT_FROM_EMAIL = 'segunda-chamada@localhost'
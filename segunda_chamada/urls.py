@@ -1,12 +1,12 @@
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
-from django.conf import settings
-from django.conf.urls.static import static
+
+from solicitacoes.estaticos import servir_estatico
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    # Sem proxy na frente, os estáticos coletados saem daqui com cache longo.
+    path(f'{settings.STATIC_URL.strip("/")}/<path:caminho>', servir_estatico),
     path('', include('solicitacoes.urls')),
 ]
-
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
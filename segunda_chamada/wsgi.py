@@ -14,3 +14,10 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'segunda_chamada.settings')
 
 application = get_wsgi_application()
+
+from django.conf import settings  # noqa: E402
+
+from solicitacoes.agendador import iniciar_agendador  # noqa: E402
+
+if settings.AGENDADOR:
+    iniciar_agendador()
@@ -0,0 +1,60 @@
+import logging
+import threading
+
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+_tarefas = {}
+_lock = threading.Lock()
+
+
+def _executar(nome, funcao, intervalo, parar):
+    while not parar.wait(intervalo):
+        close_old_connections()
+        try:
+            funcao()
+        except Exception:
+            logger.exception('Falha na tarefa periódica %s.', nome)
+        finally:
+            close_old_connections()
+
+
+def iniciar_tarefa(nome, funcao, intervalo):
+    with _lock:
+        if nome in _tarefas or intervalo <= 0:
+            return _tarefas.get(nome)
+        parar = threading.Event()
+        thread = threading.Thread(
+            target=_executar,
+            args=(nome, funcao, intervalo, parar),
+            name=nome,
+            daemon=True,
+        )
+        thread.parar = parar
+        thread.start()
+        _tarefas[nome] = thread
+        return thread
+
+
+def parar_tarefas():
+    with _lock:
+        for thread in _tarefas.values():
+            thread.parar.set()
+        _tarefas.clear()
+
+
+def iniciar_agendador():
+    from django.conf import settings
+
+    from .arquivos import processar_arquivos
+    from .expiracao import expirar_solicitacoes
+    from .exportacao import processar_exportacoes
+    from .notificacoes import processar_notificacoes
+    from .provisionamento import processar_importacoes
+
+    iniciar_tarefa('expirar-solicitacoes', expirar_solicitacoes, settings.EXPIRACAO_INTERVALO)
+    iniciar_tarefa('processar-notificacoes', processar_notificacoes, settings.NOTIFICACOES_INTERVALO)
+    iniciar_tarefa('processar-arquivos', processar_arquivos, settings.ARQUIVOS_INTERVALO)
+    iniciar_tarefa('importar-usuarios', processar_importacoes, settings.IMPORTACAO_USUARIOS_INTERVALO)
+    iniciar_tarefa('exportar-solicitacoes', processar_exportacoes, settings.EXPORTACOES_INTERVALO)
@@ -0,0 +1,271 @@
+import hashlib
+import json
+from datetime import datetime, timezone as dt_timezone
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition, require_GET, require_POST
+
+from . import cache_dashboard
+from .busca import TAMANHO_PAGINA, filtrar_solicitacoes, paginar
+from .models import FILA_POR_PAPEL, DecisaoConcorrente, Notificacao, Perfil, Solicitacao, SolicitacaoArquivada, TokenApi
+from .notificacoes import contar_nao_lidas, marcar_lidas
+from .papeis import papel_requerido
+
+VERSAO = 'v1'
+PREFIXO = f'/api/{VERSAO}/'
+TAMANHO_MAXIMO = 100
+PAPEIS = [tipo for tipo, _ in Perfil.TIPO_CHOICES]
+
+# Nome na API -> campo lido com values(). Sem ?fields= vão todos.
+CAMPOS_SOLICITACAO = {
+    'id': 'id',
+    'disciplina': 'disciplina__nome',
+    'disciplina_codigo': 'disciplina__codigo',
+    'aluno': 'aluno__username',
+    'aluno_nome': 'aluno__first_name',
+    'motivo': 'motivo',
+    'arquivo_nome': 'arquivo_nome',
+    'status': 'status',
+    'etapa': 'etapa_atual',
+    'data_solicitacao': 'data_solicitacao',
+    'data_limite': 'data_limite',
+    'coordenador_status': 'coordenador_status',
+    'secretaria_status': 'secretaria_status',
+    'professor_status': 'professor_status',
+    'observacoes_professor': 'observacoes_professor',
+    'data_avaliacao': 'data_avaliacao',
+}
+CAMPOS_NOTIFICACAO = {
+    'id': 'id',
+    'solicitacao': 'solicitacao_id',
+    'mensagem': 'mensagem',
+    'lido': 'lido',
+    'criado_em': 'criado_em',
+}
+
+
+def _usuario_do_token(request):
+    cabecalho = request.headers.get('Authorization', '')
+    if not cabecalho.startswith('Bearer '):
+        return None
+    token = (
+        TokenApi.objects.select_related('user')
+        .filter(chave=TokenApi.resumir(cabecalho.removeprefix('Bearer ').strip()), user__is_active=True)
+        .first()
+    )
+    return token.user if token else False
+
+
+def _autenticar(request, user):
+    request.user = user
+
+    async def auser():
+        return user
+    request.auser = auser
+    # O token não vai em cookie, então não há CSRF a temer; a sessão
+    # continua exigindo o X-CSRFToken nos POSTs.
+    request._dont_enforce_csrf_checks = True
+
+
+class TokenApiMiddleware:
+    # Autentica pelo cabeçalho Authorization: Bearer <token> as rotas da API.
+    # Fica depois do AuthenticationMiddleware e antes do PapelMiddleware, que
+    # resolve o papel do usuário do token.
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.assincrono = iscoroutinefunction(get_response)
+        if self.assincrono:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.assincrono:
+            return self.__acall__(request)
+        if request.path.startswith(PREFIXO):
+            user = _usuario_do_token(request)
+            if user is False:
+                return _responder({'erro': 'Token inválido.'}, status=401)
+            if user is not None:
+                _autenticar(request, user)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        if request.path.startswith(PREFIXO):
+            user = await sync_to_async(_usuario_do_token)(request)
+            if user is False:
+                return _responder({'erro': 'Token inválido.'}, status=401)
+            if user is not None:
+                _autenticar(request, user)
+        return await self.get_response(request)
+
+
+def _versoes(request, escopos):
+    # Lidas uma vez por requisição: a ETag e o Last-Modified saem delas.
+    if not hasattr(request, 'versoes_api'):
+        request.versoes_api = cache_dashboard.versoes(escopos(request))
+    return request.versoes_api
+
+
+def condicional(escopos):
+    # GET condicional pelas versões dos escopos do cache dos dashboards, que
+    # os sinais trocam a cada mudança: uma consulta repetida sem novidades
+    # volta 304 sem ler as tabelas de solicitações e notificações. Com um
+    # cache por processo (locmem) as versões não enxergam o que os outros
+    # workers e os comandos gravam, e a resposta é sempre completa.
+    def etag(request, *args, **kwargs):
+        versoes = _versoes(request, escopos)
+        partes = [VERSAO, request.user.pk, request.papel, request.get_full_path(), *sorted(versoes.items())]
+        return hashlib.md5(repr(partes).encode()).hexdigest()
+
+    def modificado(request, *args, **kwargs):
+        return datetime.fromtimestamp(max(_versoes(request, escopos).values()) / 1e9, dt_timezone.utc)
+
+    def decorador(view):
+        condicionada = condition(etag_func=etag, last_modified_func=modificado)(view)
+
+        @wraps(view)
+        def envoltorio(request, *args, **kwargs):
+            if not cache_dashboard.compartilhado():
+                return view(request, *args, **kwargs)
+            return condicionada(request, *args, **kwargs)
+        return envoltorio
+
+    return decorador
+
+
+def _responder(dados, status=200):
+    resposta = JsonResponse(dados, status=status)
+    # Por usuário: nada de caches compartilhados, e o cliente sempre revalida.
+    patch_cache_control(resposta, private=True, no_cache=True)
+    return resposta
+
+
+def _tamanho(request):
+    try:
+        return min(max(int(request.GET.get('limite', TAMANHO_PAGINA)), 1), TAMANHO_MAXIMO)
+    except ValueError:
+        return TAMANHO_PAGINA
+
+
+def _listar(request, campos, queryset, arquivadas=None, campo_data='data_solicitacao', **extras):
+    nomes = [nome.strip() for nome in request.GET.get('fields', '').split(',') if nome.strip()] or list(campos)
+    desconhecidos = [nome for nome in nomes if nome not in campos]
+    if desconhecidos:
+        return _responder({'erro': f'Campos desconhecidos: {", ".join(desconhecidos)}.'}, status=400)
+    # O cursor precisa da data e do id mesmo quando não foram pedidos.
+    lidos = list(dict.fromkeys([*(campos[nome] for nome in nomes), campo_data, 'id']))
+    if arquivadas is not None:
+        arquivadas = arquivadas.values(*lidos)
+    linhas, proximo = paginar(
+        queryset.values(*lidos), request.GET.get('cursor'), _tamanho(request), arquivadas, campo=campo_data,
+    )
+    return _responder({
+        'resultados': [{nome: linha[campos[nome]] for nome in nomes} for linha in linhas],
+        'proximo': proximo,
+        **extras,
+    })
+
+
+def _escopos_do_usuario(request):
+    return [f'usuario:{request.user.pk}', 'disciplinas']
+
+
+@require_GET
+@papel_requerido('aluno', sem_perfil=True, mensagem='Acesso restrito a alunos.')
+@condicional(_escopos_do_usuario)
+def solicitacoes(request):
+    def filtrar(modelo):
+        return filtrar_solicitacoes(
+            modelo.objects.filter(aluno=request.user),
+            termo=request.GET.get('q', '').strip(),
+            status=request.GET.get('status', ''),
+        )
+
+    arquivadas = filtrar(SolicitacaoArquivada) if request.GET.get('arquivadas') == '1' else None
+    return _listar(request, CAMPOS_SOLICITACAO, filtrar(Solicitacao), arquivadas)
+
+
+@require_GET
+@papel_requerido(*FILA_POR_PAPEL, mensagem='Sem fila de aprovação.')
+@condicional(lambda request: [f'fila:{request.papel}', 'disciplinas'])
+def fila(request):
+    return _listar(request, CAMPOS_SOLICITACAO, Solicitacao.objects.pendentes_para(request.papel))
+
+
+@require_GET
+@papel_requerido(*FILA_POR_PAPEL, mensagem='Sem fila de aprovação.')
+@condicional(_escopos_do_usuario)
+def avaliadas(request):
+    arquivadas = None
+    if request.GET.get('arquivadas') == '1':
+        arquivadas = SolicitacaoArquivada.objects.avaliadas_por(request.user, request.papel)
+    return _listar(request, CAMPOS_SOLICITACAO, Solicitacao.objects.avaliadas_por(request.user, request.papel), arquivadas)
+
+
+def _dados_json(request):
+    try:
+        dados = json.loads(request.body)
+    except ValueError:
+        return None
+    return dados if isinstance(dados, dict) else None
+
+
+@require_POST
+@papel_requerido(*FILA_POR_PAPEL, mensagem='Sem fila de aprovação.')
+def decidir(request, solicitacao_id):
+    dados = _dados_json(request)
+    if dados is None:
+        return _responder({'erro': 'JSON inválido.'}, status=400)
+    papel = request.papel
+    decisao = dados.get('decisao')
+    observacoes = dados.get('observacoes', '')
+    if decisao not in ['aprovada', 'rejeitada']:
+        return _responder({'erro': 'Decisão inválida.'}, status=400)
+    if (papel == 'coordenador' or decisao == 'rejeitada') and not observacoes:
+        return _responder({'erro': 'Inclua uma justificativa para esta decisão.'}, status=400)
+
+    solicitacao = get_object_or_404(Solicitacao, pk=solicitacao_id)
+    if solicitacao.prazo_expirado:
+        Solicitacao.objects.filter(pk=solicitacao.pk).expirar()
+        return _responder({'erro': 'Prazo expirado para esta solicitação.'}, status=409)
+    if not solicitacao.pode_avaliar(papel):
+        return _responder({'erro': 'Esta solicitação não está na sua fila ou já foi avaliada.'}, status=409)
+    try:
+        solicitacao.registrar_decisao(papel, request.user, decisao, observacoes)
+    except DecisaoConcorrente:
+        return _responder({'erro': 'A solicitação foi alterada por outra pessoa; nada foi gravado.'}, status=409)
+    solicitacao.notificar_aluno(f'Seu pedido foi {decisao} pelo {papel}.')
+
+    linha = Solicitacao.objects.filter(pk=solicitacao.pk).values(*CAMPOS_SOLICITACAO.values()).get()
+    return _responder({nome: linha[campo] for nome, campo in CAMPOS_SOLICITACAO.items()})
+
+
+@require_GET
+@papel_requerido(*PAPEIS, sem_perfil=True)
+@condicional(lambda request: [f'notificacoes:{request.user.pk}'])
+def notificacoes(request):
+    return _listar(
+        request,
+        CAMPOS_NOTIFICACAO,
+        Notificacao.objects.filter(user=request.user),
+        campo_data='criado_em',
+        nao_lidas=contar_nao_lidas(request.user.pk),
+    )
+
+
+@require_POST
+@papel_requerido(*PAPEIS, sem_perfil=True)
+def marcar_notificacoes_lidas(request):
+    dados = _dados_json(request)
+    try:
+        ids = [int(notificacao_id) for notificacao_id in dados['ids']]
+    except (KeyError, TypeError, ValueError):
+        return _responder({'erro': 'Informe os ids das notificações em "ids".'}, status=400)
+    lidas = marcar_lidas(request.user.pk, ids)
+    return _responder({'lidas': lidas, 'nao_lidas': contar_nao_lidas(request.user.pk)})
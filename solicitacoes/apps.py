@@ -4,3 +4,39 @@ from django.apps import AppConfig
 class SolicitacoesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'solicitacoes'
+
+    def ready(self):
+        from django.contrib.auth.models import User
+        from django.db.models.signals import post_delete, post_migrate, post_save, pre_migrate
+
+        from . import signals
+        from .models import (
+            Disciplina,
+            Notificacao,
+            Perfil,
+            Solicitacao,
+            SolicitacaoArquivada,
+            decisoes_registradas,
+            solicitacoes_arquivadas,
+            solicitacoes_expiradas,
+        )
+
+        pre_migrate.connect(signals.suspender_indice_texto, sender=self)
+        post_migrate.connect(signals.restaurar_indice_texto, sender=self)
+
+        for sinal in (post_save, post_delete):
+            sinal.connect(signals.invalidar_solicitacao, sender=Solicitacao)
+            sinal.connect(signals.invalidar_notificacao, sender=Notificacao)
+            sinal.connect(signals.invalidar_disciplinas, sender=Disciplina)
+            sinal.connect(signals.publicar_solicitacao, sender=Solicitacao)
+            sinal.connect(signals.invalidar_papel, sender=Perfil)
+            sinal.connect(signals.invalidar_papel, sender=User)
+        post_delete.connect(signals.liberar_arquivo, sender=Solicitacao)
+        post_delete.connect(signals.descontar_da_fila, sender=Solicitacao)
+        post_delete.connect(signals.descontar_nao_lida, sender=Notificacao)
+        post_delete.connect(signals.liberar_anexo_arquivado, sender=SolicitacaoArquivada)
+        solicitacoes_arquivadas.connect(signals.invalidar_arquivadas, sender=Solicitacao)
+        solicitacoes_expiradas.connect(signals.invalidar_expiradas, sender=Solicitacao)
+        decisoes_registradas.connect(signals.invalidar_decisoes, sender=Solicitacao)
+        solicitacoes_expiradas.connect(signals.publicar_expiradas, sender=Solicitacao)
+        decisoes_registradas.connect(signals.publicar_decisoes, sender=Solicitacao)
@@ -0,0 +1,125 @@
+import hashlib
+import os
+import tempfile
+
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+PREFIXO = 'blobs'
+PREFIXO_PARCIAIS = f'{PREFIXO}/parciais'
+TAMANHO_LEITURA = 64 * 1024
+
+
+def nome_do_conteudo(sha256, nome_original):
+    extensao = os.path.splitext(nome_original)[1].lower()
+    return f'{PREFIXO}/{sha256[:2]}/{sha256}{extensao}'
+
+
+def calcular_sha256(arquivo):
+    digest = hashlib.sha256()
+    for bloco in iter(lambda: arquivo.read(TAMANHO_LEITURA), b''):
+        digest.update(bloco)
+    return digest.hexdigest()
+
+
+# Guarda cada conteúdo uma única vez, em blobs/<aa>/<sha256><ext>. Cada
+# arquivo salvo conta uma referência em ArquivoArmazenado; delete() só remove
+# o blob quando a última referência é liberada.
+class ArmazenamentoDeduplicado(FileSystemStorage):
+
+    def _save(self, name, content):
+        sha256 = getattr(content, 'sha256', None)
+        if sha256 is None:
+            caminho, sha256, tamanho = self._gravar_temporario(content)
+            return self.incorporar(caminho, name, sha256, tamanho)
+
+        # Hash já calculado durante o recebimento: conteúdo repetido não é
+        # gravado de novo, apenas ganha mais uma referência.
+        nome = self._referenciar(sha256, nome_do_conteudo(sha256, name), content.size)
+        if not self.exists(nome):
+            if hasattr(content, 'temporary_file_path'):
+                self._instalar(content.temporary_file_path(), nome)
+            else:
+                self._instalar(self._gravar_temporario(content)[0], nome)
+        return nome
+
+    def _gravar_temporario(self, content):
+        # Uma única passada: o hash é calculado enquanto o conteúdo é gravado
+        # em um temporário no próprio diretório dos blobs.
+        diretorio = self.path(PREFIXO)
+        os.makedirs(diretorio, exist_ok=True)
+        digest = hashlib.sha256()
+        tamanho = 0
+        with tempfile.NamedTemporaryFile(dir=diretorio, delete=False) as temporario:
+            for bloco in content.chunks():
+                digest.update(bloco)
+                temporario.write(bloco)
+                tamanho += len(bloco)
+        return temporario.name, digest.hexdigest(), tamanho
+
+    def incorporar(self, caminho, nome_original, sha256=None, tamanho=None):
+        """Move um arquivo já gravado em disco para o blob do seu conteúdo."""
+        if sha256 is None:
+            with open(caminho, 'rb') as arquivo:
+                sha256 = calcular_sha256(arquivo)
+        if tamanho is None:
+            tamanho = os.path.getsize(caminho)
+        nome = self._referenciar(sha256, nome_do_conteudo(sha256, nome_original), tamanho)
+        self._instalar(caminho, nome)
+        return nome
+
+    def _instalar(self, caminho, nome):
+        destino = self.path(nome)
+        if os.path.exists(destino):
+            os.remove(caminho)
+            return
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        file_move_safe(caminho, destino, allow_overwrite=True)
+        if self.file_permissions_mode is not None:
+            os.chmod(destino, self.file_permissions_mode)
+
+    def _referenciar(self, sha256, nome, tamanho):
+        from .models import ArquivoArmazenado
+
+        for _ in range(2):
+            with transaction.atomic():
+                blob = ArquivoArmazenado.objects.select_for_update().filter(pk=sha256).first()
+                if blob:
+                    ArquivoArmazenado.objects.filter(pk=sha256).update(referencias=F('referencias') + 1)
+                    return blob.nome
+                try:
+                    with transaction.atomic():
+                        ArquivoArmazenado.objects.create(sha256=sha256, nome=nome, tamanho=tamanho, referencias=1)
+                    return nome
+                except IntegrityError:
+                    # Outro envio criou o mesmo blob ao mesmo tempo.
+                    continue
+        raise IntegrityError(f'Não foi possível registrar o blob {sha256}.')
+
+    def adicionar_referencia(self, nome):
+        from .models import ArquivoArmazenado
+
+        return ArquivoArmazenado.objects.filter(nome=nome).update(referencias=F('referencias') + 1)
+
+    def delete(self, name):
+        from .models import ArquivoArmazenado
+
+        with transaction.atomic():
+            blob = ArquivoArmazenado.objects.select_for_update().filter(nome=name).first()
+            if blob is None:
+                super().delete(name)
+                return
+            if blob.referencias > 1:
+                ArquivoArmazenado.objects.filter(pk=blob.pk).update(referencias=F('referencias') - 1)
+                return
+            blob.delete()
+        super().delete(name)
+
+
+armazenamento = ArmazenamentoDeduplicado()
+
+
+def obter_armazenamento():
+    return armazenamento
@@ -0,0 +1,114 @@
+import logging
+import os
+import shutil
+from collections import Counter
+from datetime import datetime
+
+from django.conf import settings
+from django.db import router, transaction
+from django.utils import timezone
+
+from .armazenamento import armazenamento
+from .notificacoes import ajustar_nao_lidas
+from .models import (
+    EventoNotificacao,
+    Notificacao,
+    NotificacaoArquivada,
+    Solicitacao,
+    SolicitacaoArquivada,
+    solicitacoes_arquivadas,
+)
+
+logger = logging.getLogger(__name__)
+
+ENCERRADAS = ('aprovada', 'rejeitada')
+PREFIXO_ARQUIVADAS = 'arquivadas'
+TAMANHO_LOTE = 500
+
+CAMPOS_SOLICITACAO = [
+    campo.attname for campo in SolicitacaoArquivada._meta.concrete_fields if campo.name != 'arquivada_em'
+]
+CAMPOS_NOTIFICACAO = [campo.attname for campo in NotificacaoArquivada._meta.concrete_fields]
+
+
+def inicio_do_semestre(momento=None, recuar=0):
+    # Semestres letivos de janeiro a junho e de julho a dezembro.
+    local = timezone.localtime(momento or timezone.now())
+    ano, metade = divmod(local.year * 2 + (local.month > 6) - recuar, 2)
+    return timezone.make_aware(datetime(ano, 6 * metade + 1, 1))
+
+
+def _arquivar_anexo(nome):
+    # O anexo ganha uma cópia própria em arquivadas/ (que pode ser um volume
+    # mais barato montado em MEDIA_ROOT/arquivadas); o blob ativo perde a
+    # referência quando a linha sai de Solicitacao.
+    destino = f'{PREFIXO_ARQUIVADAS}/{nome}'
+    caminho = armazenamento.path(destino)
+    if os.path.exists(caminho):
+        return destino
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    try:
+        shutil.copyfile(armazenamento.path(nome), f'{caminho}.parcial')
+    except FileNotFoundError:
+        logger.warning('Anexo ausente ao arquivar: %s.', nome)
+        return destino
+    os.replace(f'{caminho}.parcial', caminho)
+    return destino
+
+
+def _apagar_sem_sinais(queryset):
+    # Um sinal para o lote inteiro (solicitacoes_arquivadas) no lugar de um
+    # post_delete por linha; os gatilhos do SQLite tiram as linhas do índice
+    # de busca.
+    queryset._raw_delete(router.db_for_write(queryset.model))
+
+
+def arquivar_lote(limite, tamanho=TAMANHO_LOTE):
+    candidatas = Solicitacao.objects.filter(status__in=ENCERRADAS, data_solicitacao__lt=limite).order_by('id')
+    ids = list(candidatas.values_list('id', flat=True)[:tamanho])
+    if not ids:
+        return 0
+
+    # As cópias dos anexos ficam fora da transação, que segura a escrita do
+    # banco só durante os INSERTs e DELETEs.
+    for nome in set(candidatas.filter(pk__in=ids).exclude(arquivo='').values_list('arquivo', flat=True)):
+        if nome:
+            _arquivar_anexo(nome)
+
+    with transaction.atomic():
+        # Relidas na transação: só entra o que ainda está encerrado.
+        linhas = list(candidatas.filter(pk__in=ids).values(*CAMPOS_SOLICITACAO))
+        ids = [linha['id'] for linha in linhas]
+        anexos = [linha['arquivo'] for linha in linhas if linha['arquivo']]
+        for linha in linhas:
+            if linha['arquivo']:
+                linha['arquivo'] = _arquivar_anexo(linha['arquivo'])
+        arquivadas = SolicitacaoArquivada.objects.bulk_create(SolicitacaoArquivada(**linha) for linha in linhas)
+        notificacoes = list(Notificacao.objects.filter(solicitacao_id__in=ids).values(*CAMPOS_NOTIFICACAO))
+        NotificacaoArquivada.objects.bulk_create(NotificacaoArquivada(**linha) for linha in notificacoes)
+        # As não lidas que saem deixam de contar no aviso do aluno.
+        nao_lidas = Counter(linha['user_id'] for linha in notificacoes if not linha['lido'])
+        ajustar_nao_lidas({user_id: -total for user_id, total in nao_lidas.items()})
+
+        _apagar_sem_sinais(EventoNotificacao.objects.filter(solicitacao_id__in=ids))
+        _apagar_sem_sinais(Notificacao.objects.filter(solicitacao_id__in=ids))
+        _apagar_sem_sinais(Solicitacao.objects.filter(pk__in=ids))
+
+        # Uma referência liberada por linha, como em signals.liberar_arquivo.
+        transaction.on_commit(lambda: [armazenamento.delete(nome) for nome in anexos])
+        solicitacoes_arquivadas.send(sender=Solicitacao, solicitacoes=arquivadas)
+    return len(arquivadas)
+
+
+def arquivar_solicitacoes(semestres=None, tamanho=TAMANHO_LOTE, lotes=None, agora=None):
+    # Cada lote é uma transação: interrompido, o comando retoma de onde parou.
+    if semestres is None:
+        semestres = settings.ARQUIVAMENTO_SEMESTRES
+    limite = inicio_do_semestre(agora, recuar=semestres)
+    executados = 0
+    while lotes is None or executados < lotes:
+        movidas = arquivar_lote(limite, tamanho)
+        if not movidas:
+            break
+        executados += 1
+        yield movidas
@@ -0,0 +1,107 @@
+import io
+import logging
+import os
+import re
+from datetime import timedelta
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from .models import Solicitacao, UploadParcial
+from .uploads import TAMANHO_LEITURA, TIPOS_PERMITIDOS, assinatura_valida, descartar
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow é opcional: sem ele não há miniaturas.
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+TAMANHO_LOTE = 50
+TAMANHO_MINIATURA = (320, 320)
+VALIDADE_UPLOAD_PARCIAL = timedelta(hours=24)
+
+PAGINA_PDF = re.compile(rb'/Type\s*/Page(?![a-zA-Z])')
+
+
+def identificar_tipo(arquivo):
+    inicio = arquivo.read(16)
+    arquivo.seek(0)
+    for tipo in TIPOS_PERMITIDOS:
+        if assinatura_valida(tipo, inicio):
+            return tipo
+    return ''
+
+
+def contar_paginas_pdf(arquivo):
+    paginas = 0
+    resto = b''
+    while True:
+        bloco = arquivo.read(TAMANHO_LEITURA)
+        if not bloco:
+            break
+        dados = resto + bloco
+        # Mantém o final do bloco para não perder um marcador dividido ao meio.
+        corte = max(len(dados) - 32, 0)
+        paginas += len(PAGINA_PDF.findall(dados, 0, corte))
+        resto = dados[corte:]
+    return paginas + len(PAGINA_PDF.findall(resto))
+
+
+def gerar_miniatura(solicitacao, arquivo):
+    if Image is None:
+        return None
+    with Image.open(arquivo) as imagem:
+        imagem.thumbnail(TAMANHO_MINIATURA)
+        saida = io.BytesIO()
+        imagem.convert('RGB').save(saida, 'JPEG', quality=80)
+    nome = os.path.splitext(os.path.basename(solicitacao.arquivo.name))[0] + '.jpg'
+    campo = solicitacao._meta.get_field('arquivo_miniatura')
+    return default_storage.save(campo.generate_filename(solicitacao, nome), ContentFile(saida.getvalue()))
+
+
+def processar_arquivo(solicitacao):
+    campos = {'arquivo_pendente': False}
+    try:
+        with solicitacao.arquivo.open('rb') as arquivo:
+            campos['arquivo_tamanho'] = solicitacao.arquivo.size
+            campos['arquivo_tipo'] = tipo = identificar_tipo(arquivo)
+            if tipo == 'application/pdf':
+                campos['arquivo_paginas'] = contar_paginas_pdf(arquivo)
+            elif tipo.startswith('image/'):
+                campos['arquivo_miniatura'] = gerar_miniatura(solicitacao, arquivo)
+    except Exception:
+        # Qualquer falha do Pillow ou da leitura do PDF (DecompressionBombError,
+        # SyntaxError, struct.error...) fica no log: a flag é limpa assim
+        # mesmo, senão o mesmo arquivo abriria todos os lotes seguintes.
+        logger.exception('Falha ao processar o arquivo da solicitação %s.', solicitacao.pk)
+    # update() evita reescrever a linha inteira e não dispara post_save,
+    # já que nada exibido nos dashboards muda aqui.
+    atualizadas = Solicitacao.objects.filter(pk=solicitacao.pk).update(**campos)
+    if not atualizadas and campos.get('arquivo_miniatura'):
+        # A solicitação foi excluída enquanto a miniatura era gerada.
+        default_storage.delete(campos['arquivo_miniatura'])
+
+
+def remover_uploads_abandonados(agora=None):
+    limite = (agora or timezone.now()) - VALIDADE_UPLOAD_PARCIAL
+    abandonados = list(UploadParcial.objects.filter(criado_em__lt=limite))
+    for upload in abandonados:
+        descartar(upload)
+    return len(abandonados)
+
+
+def processar_arquivos(tamanho_lote=TAMANHO_LOTE):
+    processados = 0
+    while True:
+        lote = list(Solicitacao.objects.filter(arquivo_pendente=True).order_by('id').only('id', 'arquivo')[:tamanho_lote])
+        for solicitacao in lote:
+            processar_arquivo(solicitacao)
+        processados += len(lote)
+        if len(lote) < tamanho_lote:
+            break
+    removidos = remover_uploads_abandonados()
+    if processados or removidos:
+        logger.info('%s arquivo(s) processado(s), %s envio(s) parcial(is) descartado(s).', processados, removidos)
+    return processados, removidos
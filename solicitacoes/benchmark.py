@@ -0,0 +1,402 @@
+import asyncio
+import http.cookiejar
+import json
+import platform
+import random
+import statistics
+import threading
+import time
+import urllib.parse
+import urllib.request
+from contextlib import ExitStack
+from datetime import timedelta
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connections, transaction
+from django.db.models import Count
+from django.test import AsyncRequestFactory, Client, RequestFactory
+from django.urls import reverse
+from django.utils import timezone
+
+from .estatisticas import recalcular
+from .models import Disciplina, Perfil, Solicitacao
+
+SENHA = 'benchmark'
+PAPEIS = ['coordenador', 'secretaria', 'professor']
+ESCRITA = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+MOTIVOS = [
+    'Atestado médico de {dias} dias',
+    'Compromisso de trabalho comprovado',
+    'Problema de transporte no dia da prova',
+    'Falecimento na família',
+    'Participação em evento acadêmico',
+]
+
+
+def gerar_dados(solicitacoes=20000, disciplinas=50, alunos=500, avaliadores=3, semente=42):
+    aleatorio = random.Random(semente)
+    senha = make_password(SENHA)
+    agora = timezone.now()
+
+    with transaction.atomic():
+        lista_disciplinas = Disciplina.objects.bulk_create([
+            Disciplina(codigo=f'BENCH{i:04}', nome=f'Disciplina de carga {i}')
+            for i in range(disciplinas)
+        ])
+        usuarios = User.objects.bulk_create(
+            [User(username=f'bench-aluno-{i}', password=senha, first_name=f'Aluno {i}') for i in range(alunos)]
+            + [
+                User(username=f'bench-{papel}-{i}', password=senha, first_name=f'{papel} {i}')
+                for papel in PAPEIS for i in range(avaliadores)
+            ]
+        )
+        lista_alunos, equipe = usuarios[:alunos], usuarios[alunos:]
+        Perfil.objects.bulk_create(
+            [Perfil(user=user, tipo='aluno') for user in lista_alunos]
+            + [Perfil(user=user, tipo=user.username.split('-')[1]) for user in equipe]
+        )
+        por_papel = {papel: [u for u in equipe if u.username.split('-')[1] == papel] for papel in PAPEIS}
+
+        # Distribuição aproximada das filas: 40% na coordenação, 20% na
+        # secretaria, 15% com o professor e o resto concluído.
+        objetos = []
+        for i in range(solicitacoes):
+            sorteio = aleatorio.random()
+            campos = {}
+            if sorteio >= 0.40:
+                campos.update(coordenador_status='aprovada', coordenador_responsavel=aleatorio.choice(por_papel['coordenador']))
+            if sorteio >= 0.60:
+                campos.update(secretaria_status='aprovada', secretaria_responsavel=aleatorio.choice(por_papel['secretaria']))
+            if sorteio >= 0.75:
+                decisao = aleatorio.choice(['aprovada', 'rejeitada'])
+                campos.update(professor_status=decisao, status=decisao, professor_responsavel=aleatorio.choice(por_papel['professor']))
+            solicitacao = Solicitacao(
+                aluno=aleatorio.choice(lista_alunos),
+                disciplina=aleatorio.choice(lista_disciplinas),
+                motivo=aleatorio.choice(MOTIVOS).format(dias=aleatorio.randint(1, 15)),
+                data_limite=agora + timedelta(days=aleatorio.randint(1, 7)),
+                **campos,
+            )
+            solicitacao.etapa_atual = solicitacao.calcular_etapa()
+            objetos.append(solicitacao)
+        Solicitacao.objects.bulk_create(objetos, batch_size=1000)
+        # bulk_create não passa pelos contadores; parte do estado estável.
+        recalcular()
+
+    return {'alunos': lista_alunos, **por_papel}
+
+
+class ContadorConsultas:
+    def __init__(self):
+        self.consultas = 0
+        self.linhas_escritas = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.consultas += 1
+        resultado = execute(sql, params, many, context)
+        if sql.lstrip().upper().startswith(ESCRITA):
+            self.linhas_escritas += max(context['cursor'].rowcount, 0)
+        return resultado
+
+
+def _percentil(valores, fracao):
+    ordenados = sorted(valores)
+    return ordenados[min(int(len(ordenados) * fracao), len(ordenados) - 1)]
+
+
+def resumir(latencias, consultas=None, linhas=None, erros=0):
+    resumo = {
+        'requisicoes': len(latencias),
+        'p50_ms': round(_percentil(latencias, 0.50) * 1000, 2),
+        'p95_ms': round(_percentil(latencias, 0.95) * 1000, 2),
+        'erros': erros,
+    }
+    if consultas is not None:
+        resumo['consultas'] = round(statistics.mean(consultas), 2)
+        resumo['linhas_escritas'] = round(statistics.mean(linhas), 2)
+    return resumo
+
+
+def medir(requisicao, repeticoes, antes=None):
+    latencias, consultas, linhas = [], [], []
+    erros = 0
+    for i in range(repeticoes):
+        if antes:
+            antes()
+        contador = ContadorConsultas()
+        with ExitStack() as pilha:
+            for conexao in connections.all():
+                pilha.enter_context(conexao.execute_wrapper(contador))
+            inicio = time.perf_counter()
+            resposta = requisicao(i)
+            latencias.append(time.perf_counter() - inicio)
+        if resposta.status_code >= 400:
+            erros += 1
+        consultas.append(contador.consultas)
+        linhas.append(contador.linhas_escritas)
+    return resumir(latencias, consultas, linhas, erros)
+
+
+def cenarios(usuarios, repeticoes):
+    cache = caches[settings.DASHBOARD_CACHE]
+    aluno = (
+        User.objects.filter(pk__in=[user.pk for user in usuarios['alunos']])
+        .annotate(total=Count('solicitacoes')).order_by('-total').first()
+    )
+    coordenador = usuarios['coordenador'][0]
+    clientes = {}
+
+    def cliente(user):
+        if user.pk not in clientes:
+            clientes[user.pk] = Client()
+            clientes[user.pk].force_login(user)
+        return clientes[user.pk]
+
+    def get(user, url, **params):
+        return lambda i: cliente(user).get(url, params)
+
+    fila = list(Solicitacao.objects.pendentes_para('coordenador').order_by('id').values_list('id', flat=True))
+    avaliar = fila[:repeticoes]
+    lote = fila[repeticoes:]
+
+    yield 'dashboard_aluno_frio', get(aluno, reverse('dashboard_aluno')), cache.clear
+    yield 'dashboard_aluno', get(aluno, reverse('dashboard_aluno')), None
+    yield 'dashboard_aluno_busca', get(aluno, reverse('dashboard_aluno'), q='atestado'), cache.clear
+    for papel in PAPEIS:
+        user = usuarios[papel][0]
+        yield f'dashboard_{papel}_frio', get(user, reverse('dashboard_professor')), cache.clear
+        yield f'dashboard_{papel}', get(user, reverse('dashboard_professor')), None
+    yield 'avaliar_solicitacao_get', (
+        lambda i: cliente(coordenador).get(reverse('avaliar_solicitacao', args=[avaliar[i % len(avaliar)]]))
+    ), None
+    yield 'avaliar_solicitacao_post', (
+        lambda i: cliente(coordenador).post(
+            reverse('avaliar_solicitacao', args=[avaliar[i]]),
+            {'decisao': 'aprovada', 'observacoes': 'Documentação conferida'},
+        )
+    ), None
+    if len(lote) < repeticoes * 50:
+        return
+    yield 'avaliar_em_lote_50', (
+        lambda i: cliente(coordenador).post(
+            reverse('avaliar_em_lote'),
+            {'ids': lote[i * 50:(i + 1) * 50], 'decisao': 'aprovada', 'observacoes': 'Lote conferido'},
+            content_type='application/json',
+        )
+    ), None
+
+
+def executar(repeticoes, **volume):
+    inicio = time.perf_counter()
+    usuarios = gerar_dados(**volume)
+    geracao = time.perf_counter() - inicio
+    resultados = {
+        nome: medir(requisicao, repeticoes, antes)
+        for nome, requisicao, antes in cenarios(usuarios, repeticoes)
+    }
+    return {
+        'meta': {
+            **volume,
+            'repeticoes': repeticoes,
+            'geracao_s': round(geracao, 2),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'data': timezone.now().isoformat(timespec='seconds'),
+        },
+        'cenarios': resultados,
+    }
+
+
+def comparar(atual, base, tolerancia):
+    # Consultas e linhas escritas são determinísticas e não podem crescer;
+    # latência só reprova acima da tolerância relativa.
+    regressoes = []
+    for nome, referencia in base['cenarios'].items():
+        medido = atual['cenarios'].get(nome)
+        if medido is None:
+            continue
+        for campo in ('consultas', 'linhas_escritas'):
+            if campo in referencia and medido.get(campo, 0) > referencia[campo]:
+                regressoes.append(f'{nome}: {campo} {referencia[campo]} -> {medido[campo]}')
+        limite = referencia['p95_ms'] * (1 + tolerancia)
+        if medido['p95_ms'] > limite:
+            regressoes.append(f"{nome}: p95 {referencia['p95_ms']}ms -> {medido['p95_ms']}ms")
+    return regressoes
+
+
+def _entrar(base_url, username):
+    cookies = http.cookiejar.CookieJar()
+    abridor = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(cookies))
+    abridor.open(base_url + reverse('login')).read()
+    csrf = next(cookie.value for cookie in cookies if cookie.name == 'csrftoken')
+    dados = urllib.parse.urlencode({'username': username, 'password': SENHA, 'csrfmiddlewaretoken': csrf}).encode()
+    requisicao = urllib.request.Request(base_url + reverse('login'), dados, headers={'Referer': base_url + '/'})
+    abridor.open(requisicao).read()
+    return abridor
+
+
+def carga_remota(base_url, sessoes, concorrencia, repeticoes):
+    # Dispara GETs simultâneos contra um servidor já em execução. `sessoes` é
+    # uma lista de (username, caminhos); cada thread usa uma delas.
+    todos = {caminho for _, caminhos in sessoes for caminho in caminhos}
+    resultados = {caminho: [] for caminho in todos}
+    erros = {caminho: 0 for caminho in todos}
+    trava = threading.Lock()
+
+    def trabalhador(indice):
+        username, caminhos = sessoes[indice % len(sessoes)]
+        abridor = _entrar(base_url, username)
+        for _ in range(repeticoes):
+            for caminho in caminhos:
+                inicio = time.perf_counter()
+                try:
+                    abridor.open(base_url + caminho).read()
+                    falhou = False
+                except OSError:
+                    falhou = True
+                duracao = time.perf_counter() - inicio
+                with trava:
+                    resultados[caminho].append(duracao)
+                    erros[caminho] += falhou
+
+    threads = [threading.Thread(target=trabalhador, args=(i,)) for i in range(concorrencia)]
+    inicio = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duracao = time.perf_counter() - inicio
+
+    total = sum(len(latencias) for latencias in resultados.values())
+    return {
+        'meta': {'url': base_url, 'concorrencia': concorrencia, 'repeticoes': repeticoes,
+                 'requisicoes_por_s': round(total / duracao, 1)},
+        'cenarios': {
+            caminho: resumir(latencias, erros=erros[caminho])
+            for caminho, latencias in resultados.items() if latencias
+        },
+    }
+
+
+def _sessao(user):
+    cliente = Client()
+    cliente.force_login(user)
+    return f'{settings.SESSION_COOKIE_NAME}={cliente.cookies[settings.SESSION_COOKIE_NAME].value}'
+
+
+def _carga_wsgi(alvos, concorrencia, repeticoes):
+    # Uma thread por cliente simultâneo, como gunicorn --threads.
+    handler = WSGIHandler()
+    fabrica = RequestFactory()
+
+    def chamar(cookie, caminho):
+        situacao = []
+        corpo = handler(
+            fabrica.get(caminho, HTTP_COOKIE=cookie).environ,
+            lambda status, cabecalhos, exc_info=None: situacao.append(status),
+        )
+        try:
+            b''.join(corpo)
+        finally:
+            corpo.close()
+        return int(situacao[0].split()[0])
+
+    latencias, erros = [], 0
+    trava = threading.Lock()
+
+    def trabalhador(indice):
+        nonlocal erros
+        cookie, caminho = alvos[indice % len(alvos)]
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            falhou = chamar(cookie, caminho) >= 400
+            duracao = time.perf_counter() - inicio
+            with trava:
+                latencias.append(duracao)
+                erros += falhou
+
+    threads = [threading.Thread(target=trabalhador, args=(i,)) for i in range(concorrencia)]
+    inicio = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencias, erros, time.perf_counter() - inicio
+
+
+async def _carga_asgi(alvos, concorrencia, repeticoes):
+    # Todos os clientes no mesmo loop, como um worker do uvicorn.
+    handler = ASGIHandler()
+    fabrica = AsyncRequestFactory()
+
+    async def chamar(cookie, caminho):
+        escopo = fabrica.get(caminho, headers={'cookie': cookie}).scope
+        encerrada = asyncio.Event()
+        situacao = []
+        corpo_enviado = False
+
+        async def receber():
+            nonlocal corpo_enviado
+            if not corpo_enviado:
+                corpo_enviado = True
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            await encerrada.wait()
+            return {'type': 'http.disconnect'}
+
+        async def enviar(mensagem):
+            if mensagem['type'] == 'http.response.start':
+                situacao.append(mensagem['status'])
+
+        try:
+            await handler(escopo, receber, enviar)
+        finally:
+            encerrada.set()
+        return situacao[0]
+
+    latencias, erros = [], 0
+
+    async def cliente(indice):
+        nonlocal erros
+        cookie, caminho = alvos[indice % len(alvos)]
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            erros += await chamar(cookie, caminho) >= 400
+            latencias.append(time.perf_counter() - inicio)
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(cliente(i) for i in range(concorrencia)))
+    return latencias, erros, time.perf_counter() - inicio
+
+
+def comparar_servidores(usuarios, concorrencia, repeticoes):
+    # Mesma carga de dashboards pelo handler WSGI e pelo ASGI do Django, no
+    # próprio processo, sem servidor HTTP no meio. Use uma base em arquivo:
+    # as threads do WSGI e as consultas paralelas abrem conexões próprias.
+    alvos = [(_sessao(user), reverse('dashboard_aluno')) for user in usuarios['alunos'][:concorrencia]]
+    alvos += [(_sessao(usuarios[papel][0]), reverse('dashboard_professor')) for papel in PAPEIS]
+    cache = caches[settings.DASHBOARD_CACHE]
+
+    resultado = {}
+    for nome, executar_carga in (
+        ('wsgi', lambda: _carga_wsgi(alvos, concorrencia, repeticoes)),
+        ('asgi', lambda: asyncio.run(_carga_asgi(alvos, concorrencia, repeticoes))),
+    ):
+        cache.clear()
+        latencias, erros, duracao = executar_carga()
+        resultado[nome] = {
+            **resumir(latencias, erros=erros),
+            'requisicoes_por_s': round(len(latencias) / duracao, 1),
+        }
+    return resultado
+
+
+def salvar(resultado, caminho):
+    with open(caminho, 'w', encoding='utf-8') as arquivo:
+        json.dump(resultado, arquivo, indent=2, ensure_ascii=False)
+        arquivo.write('\n')
@@ -0,0 +1,166 @@
+import base64
+import binascii
+import re
+from datetime import datetime
+
+from django.db import connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Solicitacao
+
+TAMANHO_PAGINA = 20
+TABELA_FTS = 'solicitacoes_solicitacao_fts'
+
+# Criados pelas migrações 0006 e 0017, que têm cópias congeladas deste SQL.
+# Os gatilhos referenciam as duas tabelas e impediriam o Django de recriá-las
+# em migrações no SQLite; por isso são removidos no pre_migrate e recriados
+# (com o índice reconstruído) no post_migrate. Veja solicitacoes/signals.py.
+SQLITE_TABELA_TEXTO = f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {TABELA_FTS} USING fts5(
+        motivo, disciplina, tokenize = 'unicode61 remove_diacritics 2'
+    )
+"""
+
+SQLITE_GATILHOS_TEXTO = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS solicitacoes_solicitacao_fts_ai
+    AFTER INSERT ON solicitacoes_solicitacao BEGIN
+        INSERT INTO {TABELA_FTS} (rowid, motivo, disciplina)
+        SELECT new.id, new.motivo, nome FROM solicitacoes_disciplina WHERE id = new.disciplina_id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS solicitacoes_solicitacao_fts_au
+    AFTER UPDATE OF motivo, disciplina_id ON solicitacoes_solicitacao BEGIN
+        DELETE FROM {TABELA_FTS} WHERE rowid = old.id;
+        INSERT INTO {TABELA_FTS} (rowid, motivo, disciplina)
+        SELECT new.id, new.motivo, nome FROM solicitacoes_disciplina WHERE id = new.disciplina_id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS solicitacoes_solicitacao_fts_ad
+    AFTER DELETE ON solicitacoes_solicitacao BEGIN
+        DELETE FROM {TABELA_FTS} WHERE rowid = old.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS solicitacoes_disciplina_fts_au
+    AFTER UPDATE OF nome ON solicitacoes_disciplina BEGIN
+        UPDATE {TABELA_FTS} SET disciplina = new.nome
+        WHERE rowid IN (SELECT id FROM solicitacoes_solicitacao WHERE disciplina_id = new.id);
+    END
+    """,
+]
+
+SQLITE_REMOVER_GATILHOS_TEXTO = [
+    'DROP TRIGGER IF EXISTS solicitacoes_disciplina_fts_au',
+    'DROP TRIGGER IF EXISTS solicitacoes_solicitacao_fts_ad',
+    'DROP TRIGGER IF EXISTS solicitacoes_solicitacao_fts_au',
+    'DROP TRIGGER IF EXISTS solicitacoes_solicitacao_fts_ai',
+]
+
+
+def _executar(connection, comandos):
+    with connection.cursor() as cursor:
+        for sql in comandos:
+            cursor.execute(sql)
+
+
+def suspender_gatilhos_texto(connection):
+    if connection.vendor == 'sqlite':
+        _executar(connection, SQLITE_REMOVER_GATILHOS_TEXTO)
+
+
+def restaurar_gatilhos_texto(connection):
+    if connection.vendor == 'sqlite':
+        _executar(connection, [SQLITE_TABELA_TEXTO, *SQLITE_GATILHOS_TEXTO])
+
+
+def reconstruir_indice_texto(connection):
+    if connection.vendor != 'sqlite':
+        return
+    _executar(connection, [
+        f'DELETE FROM {TABELA_FTS}',
+        f"""
+        INSERT INTO {TABELA_FTS} (rowid, motivo, disciplina)
+        SELECT s.id, s.motivo, d.nome
+        FROM solicitacoes_solicitacao s
+        JOIN solicitacoes_disciplina d ON d.id = s.disciplina_id
+        """,
+    ])
+
+
+def _consulta_fts(termo):
+    palavras = re.findall(r'\w+', termo)
+    return ' '.join(f'"{palavra}"*' for palavra in palavras)
+
+
+def filtrar_por_texto(queryset, termo):
+    termo = (termo or '').strip()
+    if not termo:
+        return queryset
+
+    # O índice FTS cobre só a tabela ativa; as arquivadas, já filtradas por
+    # usuário, caem no ILIKE.
+    if connections[queryset.db].vendor == 'sqlite' and queryset.model is Solicitacao:
+        consulta = _consulta_fts(termo)
+        if not consulta:
+            return queryset
+        return queryset.filter(id__in=RawSQL(
+            f'SELECT rowid FROM {TABELA_FTS} WHERE {TABELA_FTS} MATCH %s',
+            [consulta],
+        ))
+
+    # No PostgreSQL os índices GIN com gin_trgm_ops atendem o ILIKE.
+    return queryset.filter(Q(motivo__icontains=termo) | Q(disciplina__nome__icontains=termo))
+
+
+def filtrar_solicitacoes(queryset, termo='', status=''):
+    if status in dict(Solicitacao.STATUS_CHOICES):
+        queryset = queryset.filter(status=status)
+    return filtrar_por_texto(queryset, termo)
+
+
+def _posicao(item, campo):
+    # Instâncias ou dicionários de values(), como os da API.
+    if isinstance(item, dict):
+        return item[campo], item['id']
+    return getattr(item, campo), item.pk
+
+
+def codificar_cursor(item, campo='data_solicitacao'):
+    data, pk = _posicao(item, campo)
+    valor = f'{data.isoformat()}|{pk}'
+    return base64.urlsafe_b64encode(valor.encode()).decode()
+
+
+def decodificar_cursor(cursor):
+    try:
+        data, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(data), int(pk)
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        return None
+
+
+def _a_partir_de(queryset, posicao, quantidade, campo):
+    queryset = queryset.order_by(f'-{campo}', '-id')
+    if posicao:
+        data, pk = posicao
+        queryset = queryset.filter(Q(**{f'{campo}__lt': data}) | Q(**{campo: data, 'id__lt': pk}))
+    return list(queryset[:quantidade])
+
+
+def paginar(queryset, cursor=None, tamanho=TAMANHO_PAGINA, arquivadas=None, campo='data_solicitacao'):
+    # Com `arquivadas`, as duas tabelas são lidas a partir do mesmo cursor e
+    # intercaladas; os ids são únicos entre elas.
+    posicao = decodificar_cursor(cursor) if cursor else None
+    itens = _a_partir_de(queryset, posicao, tamanho + 1, campo)
+    if arquivadas is not None:
+        itens = sorted(
+            itens + _a_partir_de(arquivadas, posicao, tamanho + 1, campo),
+            key=lambda item: _posicao(item, campo),
+            reverse=True,
+        )
+    proximo = codificar_cursor(itens[tamanho - 1], campo) if len(itens) > tamanho else None
+    return itens[:tamanho], proximo
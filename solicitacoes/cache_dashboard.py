@@ -0,0 +1,90 @@
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+_AUSENTE = object()
+_lock = threading.Lock()
+_contadores = {'hits': 0, 'misses': 0, 'invalidacoes': 0}
+
+
+def _cache():
+    return caches[getattr(settings, 'DASHBOARD_CACHE', 'default')]
+
+
+def _contar(nome):
+    with _lock:
+        _contadores[nome] += 1
+
+
+def _chave_versao(escopo):
+    return f'dashboard:versao:{escopo}'
+
+
+def _nova_versao():
+    return time.time_ns()
+
+
+def compartilhado():
+    # Só um cache fora do processo (Redis, memcached, arquivos, banco) recebe
+    # as invalidações dos outros workers e dos comandos de manage.py.
+    return not isinstance(_cache(), (LocMemCache, DummyCache))
+
+
+def versoes(escopos):
+    cache = _cache()
+    chaves = {_chave_versao(escopo): escopo for escopo in escopos}
+    encontradas = cache.get_many(chaves)
+    resultado = {}
+    for chave, escopo in chaves.items():
+        versao = encontradas.get(chave)
+        if versao is None:
+            versao = _nova_versao()
+            if not cache.add(chave, versao, timeout=settings.DASHBOARD_VERSOES_VALIDADE):
+                versao = cache.get(chave, versao)
+        resultado[escopo] = versao
+    return resultado
+
+
+def invalidar(*escopos):
+    cache = _cache()
+    for escopo in escopos:
+        # A nova versão é o instante da mudança (em ns): a API a usa também
+        # como Last-Modified.
+        cache.set(_chave_versao(escopo), _nova_versao(), timeout=settings.DASHBOARD_VERSOES_VALIDADE)
+        _contar('invalidacoes')
+
+
+def obter(nome, escopos, calcular, *variacoes):
+    cache = _cache()
+    carimbo = ':'.join(f'{escopo}={versao}' for escopo, versao in sorted(versoes(escopos).items()))
+    partes = ':'.join(str(parte) for parte in (*variacoes, carimbo))
+    chave = f'dashboard:{nome}:{hashlib.md5(partes.encode()).hexdigest()}'
+
+    valor = cache.get(chave, _AUSENTE)
+    if valor is not _AUSENTE:
+        _contar('hits')
+        return valor
+
+    _contar('misses')
+    valor = calcular()
+    cache.set(chave, valor)
+    return valor
+
+
+def estatisticas():
+    with _lock:
+        dados = dict(_contadores)
+    consultas = dados['hits'] + dados['misses']
+    dados['taxa_acerto'] = dados['hits'] / consultas if consultas else 0.0
+    return dados
+
+
+def zerar_estatisticas():
+    with _lock:
+        for nome in _contadores:
+            _contadores[nome] = 0
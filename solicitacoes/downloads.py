@@ -0,0 +1,127 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import content_disposition_header, quote_etag
+
+from .armazenamento import PREFIXO
+
+FAIXA = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class _FaixaArquivo:
+    # Limita a leitura a um trecho do arquivo sem copiá-lo. O fileno() fica
+    # exposto para que o wsgi.file_wrapper (sendfile) continue disponível:
+    # ele parte da posição atual e respeita o Content-Length da resposta.
+    def __init__(self, arquivo, inicio, tamanho):
+        self.arquivo = arquivo
+        self.restante = tamanho
+        arquivo.seek(inicio)
+
+    def read(self, tamanho=-1):
+        if tamanho < 0 or tamanho > self.restante:
+            tamanho = self.restante
+        dados = self.arquivo.read(tamanho)
+        self.restante -= len(dados)
+        return dados
+
+    def fileno(self):
+        return self.arquivo.fileno()
+
+    def close(self):
+        self.arquivo.close()
+
+
+def _etag(nome, estado):
+    # Blobs têm o SHA-256 no nome; os demais usam data de modificação e tamanho.
+    if nome.startswith(f'{PREFIXO}/'):
+        return quote_etag(os.path.splitext(os.path.basename(nome))[0])
+    return quote_etag(f'{int(estado.st_mtime):x}-{estado.st_size:x}')
+
+
+def _faixa(request, etag, tamanho):
+    cabecalho = request.headers.get('Range')
+    if not cabecalho:
+        return None
+    if_range = request.headers.get('If-Range')
+    if if_range and if_range != etag:
+        return None
+    encontrado = FAIXA.match(cabecalho.strip())
+    if not encontrado or encontrado.groups() == ('', ''):
+        return False
+    inicio, fim = encontrado.groups()
+    if inicio:
+        inicio = int(inicio)
+        fim = min(int(fim), tamanho - 1) if fim else tamanho - 1
+    else:
+        # bytes=-N: os últimos N bytes.
+        inicio = max(tamanho - int(fim), 0)
+        fim = tamanho - 1
+    if inicio > fim or inicio >= tamanho:
+        return False
+    return inicio, fim
+
+
+def _entregar_pelo_proxy(servidor, caminho, nome, tipo, nome_download):
+    resposta = HttpResponse(content_type=tipo)
+    if servidor == 'nginx':
+        resposta['X-Accel-Redirect'] = settings.ARQUIVOS_ACCEL_PREFIXO + quote(nome)
+    else:
+        resposta['X-Sendfile'] = caminho
+    resposta['Content-Disposition'] = content_disposition_header(False, nome_download)
+    return resposta
+
+
+def responder_arquivo(request, storage, nome, nome_download=None, tipo=None):
+    try:
+        caminho = storage.path(nome)
+        estado = os.stat(caminho)
+    except (OSError, ValueError):
+        raise Http404('Arquivo não encontrado.')
+
+    nome_download = nome_download or os.path.basename(nome)
+    tipo = tipo or mimetypes.guess_type(nome_download)[0] or 'application/octet-stream'
+
+    servidor = settings.ARQUIVOS_SERVIDOR
+    if servidor in ('nginx', 'sendfile'):
+        # O proxy cuida de Range, ETag e da transferência em si.
+        resposta = _entregar_pelo_proxy(servidor, caminho, nome, tipo, nome_download)
+    else:
+        etag = _etag(nome, estado)
+        resposta = get_conditional_response(request, etag=etag, last_modified=int(estado.st_mtime))
+        if resposta is None:
+            resposta = _resposta_django(request, caminho, estado.st_size, etag, tipo, nome_download)
+        resposta['ETag'] = etag
+
+    # Sem cache compartilhado e sempre revalidado, para que a permissão seja
+    # conferida de novo; a revalidação custa um 304.
+    patch_cache_control(resposta, private=True, no_cache=True)
+    return resposta
+
+
+def _resposta_django(request, caminho, tamanho, etag, tipo, nome_download):
+    faixa = _faixa(request, etag, tamanho)
+    if faixa is False:
+        resposta = HttpResponse(status=416)
+        resposta['Content-Range'] = f'bytes */{tamanho}'
+        return resposta
+
+    arquivo = open(caminho, 'rb')
+    if faixa is None:
+        resposta = FileResponse(arquivo, content_type=tipo, filename=nome_download)
+    else:
+        inicio, fim = faixa
+        resposta = FileResponse(
+            _FaixaArquivo(arquivo, inicio, fim - inicio + 1),
+            status=206,
+            content_type=tipo,
+            filename=nome_download,
+        )
+        resposta['Content-Range'] = f'bytes {inicio}-{fim}/{tamanho}'
+        resposta['Content-Length'] = fim - inicio + 1
+    resposta['Accept-Ranges'] = 'bytes'
+    return resposta
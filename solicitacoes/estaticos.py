@@ -0,0 +1,203 @@
+import gzip
+import io
+import json
+import mimetypes
+import os
+import re
+import subprocess
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.contrib.staticfiles.views import serve
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+try:
+    import brotli
+except ImportError:  # brotli é opcional: sem ele só há as versões .gz.
+    brotli = None
+
+DIRETORIO_APP = Path(__file__).resolve().parent
+DIRETORIO_ESTATICO = DIRETORIO_APP / 'static' / 'solicitacoes'
+ORIGENS = [DIRETORIO_APP / 'templates', DIRETORIO_ESTATICO / 'js']
+DESTINO_CSS = DIRETORIO_ESTATICO / 'css' / 'app.css'
+DESTINO_ICONES = DIRETORIO_ESTATICO / 'css' / 'icones.css'
+DESTINO_FONTE = DIRETORIO_ESTATICO / 'fonts' / 'icones.woff2'
+# Entrada do CLI standalone do Tailwind, sem Node. A versão é fixada porque
+# o app.css versionado sai dela; requirements-estaticos.txt instala o binário
+# com os checksums de cada plataforma.
+ENTRADA_CSS = DIRETORIO_APP / 'estilos' / 'app.css'
+TAILWIND = os.environ.get('TAILWINDCSS', 'tailwindcss')
+TAILWIND_VERSAO = '4.3.3'
+TOKEN = re.compile(r'''[^\s"'`<>{}(),;=]+''')
+
+COMPRIMIVEIS = {'.css', '.js', '.svg', '.json', '.txt', '.map', '.ttf'}
+TAMANHO_MINIMO = 512
+UM_ANO = 365 * 24 * 60 * 60
+CODIFICACOES = [('br', '.br'), ('gzip', '.gz')]
+
+FONTE_ICONES = (
+    '@font-face{font-family:"Icones";font-style:normal;font-weight:900;font-display:block;'
+    'src:url(../fonts/icones.woff2) format("woff2")}'
+    '.fas,.fa-solid{-moz-osx-font-smoothing:grayscale;-webkit-font-smoothing:antialiased;display:inline-block;'
+    'font-style:normal;font-variant:normal;font-family:"Icones";font-weight:900;line-height:1;text-rendering:auto}'
+)
+
+
+def classes_usadas(diretorios=ORIGENS, extensoes=('.html', '.js')):
+    classes = set()
+    for diretorio in diretorios:
+        for caminho in sorted(Path(diretorio).rglob('*')):
+            if caminho.suffix in extensoes and caminho.is_file():
+                classes |= set(TOKEN.findall(caminho.read_text(encoding='utf-8')))
+    return classes
+
+
+def comando_tailwind(destino, executavel=TAILWIND):
+    # Os templates e o JS lidos vêm dos @source de estilos/app.css.
+    return [executavel, '-i', str(ENTRADA_CSS), '-o', str(destino), '--minify']
+
+
+def versao_tailwind(executavel=TAILWIND):
+    try:
+        saida = subprocess.run([executavel, '--help'], capture_output=True, text=True).stdout
+    except FileNotFoundError:
+        return None
+    encontrada = re.search(r'tailwindcss v(\S+)', saida)
+    return encontrada.group(1) if encontrada else None
+
+
+def construir_css(destino=DESTINO_CSS, executavel=TAILWIND):
+    versao = versao_tailwind(executavel)
+    if versao is None:
+        raise FileNotFoundError(executavel)
+    if versao != TAILWIND_VERSAO:
+        raise ValueError(f'{executavel} é o Tailwind v{versao}; o app.css versionado é gerado pela v{TAILWIND_VERSAO}.')
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    subprocess.run(comando_tailwind(destino, executavel), check=True, capture_output=True, text=True)
+    return destino.stat().st_size
+
+
+def icones_usados(classes):
+    return sorted(classe[3:] for classe in classes if re.fullmatch(r'fa-[a-z0-9-]+', classe))
+
+
+def fontawesome_instalado():
+    try:
+        import fontawesomefree
+    except ImportError:
+        return None
+    return Path(fontawesomefree.__file__).parent / 'static' / 'fontawesomefree'
+
+
+def _codigos_solid(origem):
+    with open(Path(origem) / 'metadata' / 'icons.json', encoding='utf-8') as arquivo:
+        metadados = json.load(arquivo)
+    codigos = {}
+    for nome, icone in metadados.items():
+        if 'solid' not in icone.get('styles', ()):
+            continue
+        # Os nomes da versão 5 (sign-out-alt, info-circle...) são apelidos.
+        for apelido in [nome, *icone.get('aliases', {}).get('names', ())]:
+            codigos[apelido] = int(icone['unicode'], 16)
+    return codigos
+
+
+def construir_icones(origem, nomes):
+    # Subconjunto da fonte solid só com os ícones usados: alguns KiB em vez
+    # das centenas da fonte e do CSS completos. Precisa de fonttools e brotli.
+    from fontTools import subset
+
+    codigos = _codigos_solid(origem)
+    encontrados = {nome: codigos[nome] for nome in nomes if nome in codigos}
+    ausentes = sorted(set(nomes) - set(encontrados))
+
+    opcoes = subset.Options()
+    opcoes.flavor = 'woff2'
+    fonte = subset.load_font(str(Path(origem) / 'webfonts' / 'fa-solid-900.ttf'), opcoes)
+    recortador = subset.Subsetter(opcoes)
+    recortador.populate(unicodes=set(encontrados.values()))
+    recortador.subset(fonte)
+    saida = io.BytesIO()
+    subset.save_font(fonte, saida, opcoes)
+
+    regras = ''.join(f'.fa-{nome}::before{{content:"\\{codigo:x}"}}' for nome, codigo in sorted(encontrados.items()))
+    return FONTE_ICONES + regras + '\n', saida.getvalue(), ausentes
+
+
+def gravar(caminho, dados):
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    caminho.write_bytes(dados)
+
+
+def comprimir(caminho):
+    with open(caminho, 'rb') as arquivo:
+        dados = arquivo.read()
+    if len(dados) < TAMANHO_MINIMO:
+        return []
+    versoes = [('.gz', gzip.compress(dados, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        versoes.append(('.br', brotli.compress(dados, quality=11)))
+    gravadas = []
+    for extensao, comprimido in versoes:
+        if len(comprimido) < len(dados):
+            with open(caminho + extensao, 'wb') as arquivo:
+                arquivo.write(comprimido)
+            gravadas.append(caminho + extensao)
+    return gravadas
+
+
+class ArmazenamentoEstatico(ManifestStaticFilesStorage):
+    # Nomes com o hash do conteúdo, que podem ficar em cache por um ano, e ao
+    # lado de cada arquivo de texto as versões .gz e .br, para que nem o nginx
+    # (gzip_static/brotli_static) nem servir_estatico comprimam a cada acesso.
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for nome in sorted(set(self.hashed_files.values())):
+            if os.path.splitext(nome)[1] in COMPRIMIVEIS:
+                comprimir(self.path(nome))
+
+
+def _versionados():
+    return set(getattr(staticfiles_storage, 'hashed_files', {}).values())
+
+
+def servir_estatico(request, caminho):
+    # Para quando não há um proxy na frente (uvicorn direto, rede do campus).
+    if settings.DEBUG:
+        return serve(request, caminho, insecure=True)
+    try:
+        completo = safe_join(settings.STATIC_ROOT, caminho)
+    except SuspiciousFileOperation:
+        raise Http404('Arquivo não encontrado.')
+    if not os.path.isfile(completo):
+        raise Http404('Arquivo não encontrado.')
+
+    versionado = caminho in _versionados()
+    modificado = int(os.stat(completo).st_mtime)
+    resposta = None if versionado else get_conditional_response(request, last_modified=modificado)
+    if resposta is None:
+        aceitas = request.headers.get('Accept-Encoding', '')
+        entregue, codificacao = completo, None
+        for nome, extensao in CODIFICACOES:
+            if re.search(rf'\b{nome}\b', aceitas) and os.path.isfile(completo + extensao):
+                entregue, codificacao = completo + extensao, nome
+                break
+        tipo = mimetypes.guess_type(completo)[0] or 'application/octet-stream'
+        resposta = FileResponse(open(entregue, 'rb'), content_type=tipo)
+        if codificacao:
+            resposta['Content-Encoding'] = codificacao
+        resposta['Last-Modified'] = http_date(modificado)
+    patch_vary_headers(resposta, ['Accept-Encoding'])
+    if versionado:
+        # O nome muda junto com o conteúdo: o navegador nem precisa revalidar.
+        patch_cache_control(resposta, public=True, max_age=UM_ANO, immutable=True)
+    else:
+        patch_cache_control(resposta, public=True, no_cache=True)
+    return resposta
@@ -0,0 +1,185 @@
+from collections import Counter, defaultdict
+from itertools import chain
+
+from django.apps import apps as apps_globais
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from .models import (
+    DATA_DECISAO_POR_PAPEL,
+    FAIXAS_HORAS,
+    FILA_POR_PAPEL,
+    INICIO_POR_PAPEL,
+    RESPONSAVEL_POR_PAPEL,
+    Disciplina,
+    EstatisticaDecisao,
+    EstatisticaFila,
+)
+
+TAMANHO_LOTE = 2000
+
+
+def _etapa_pendente(linha):
+    for papel, filtros in FILA_POR_PAPEL.items():
+        if all(linha[campo] == valor for campo, valor in filtros.items()):
+            return papel
+    return None
+
+
+def recalcular(apps=apps_globais):
+    # Recebe o registro de apps para rodar também dentro de uma migração.
+    modelos = [apps.get_model('solicitacoes', 'Solicitacao')]
+    try:
+        # As decisões das arquivadas continuam nos relatórios.
+        modelos.append(apps.get_model('solicitacoes', 'SolicitacaoArquivada'))
+    except LookupError:
+        # Migrações anteriores ao arquivamento.
+        pass
+    Fila = apps.get_model('solicitacoes', 'EstatisticaFila')
+    Decisao = apps.get_model('solicitacoes', 'EstatisticaDecisao')
+
+    campos = {'disciplina_id', 'status', *INICIO_POR_PAPEL.values(), *DATA_DECISAO_POR_PAPEL.values()}
+    for papel, filtros in FILA_POR_PAPEL.items():
+        campos.update(filtros)
+        campos.add(f'{RESPONSAVEL_POR_PAPEL[papel]}_id')
+
+    pendentes, expiradas = Counter(), Counter()
+    decisoes = defaultdict(Counter)
+    with transaction.atomic():
+        linhas = chain.from_iterable(
+            modelo.objects.order_by().values(*campos).iterator(chunk_size=TAMANHO_LOTE) for modelo in modelos
+        )
+        for linha in linhas:
+            disciplina_id = linha['disciplina_id']
+            etapa = _etapa_pendente(linha)
+            if linha['status'] == 'pendente' and etapa:
+                pendentes[(disciplina_id, etapa)] += 1
+            elif linha['status'] == 'rejeitada' and etapa:
+                # Rejeitada sem nenhuma etapa ter rejeitado: expirou nesta etapa.
+                expiradas[(disciplina_id, etapa)] += 1
+
+            for papel in FILA_POR_PAPEL:
+                decisao = linha[f'{papel}_status']
+                if decisao not in ('aprovada', 'rejeitada'):
+                    continue
+                inicio, fim = linha[INICIO_POR_PAPEL[papel]], linha[DATA_DECISAO_POR_PAPEL[papel]]
+                segundos = max((fim - inicio).total_seconds(), 0) if inicio and fim else None
+                chave = (
+                    disciplina_id,
+                    papel,
+                    linha[f'{RESPONSAVEL_POR_PAPEL[papel]}_id'],
+                    None if segundos is None else EstatisticaDecisao.faixa_de(segundos),
+                )
+                decisoes[chave]['aprovadas' if decisao == 'aprovada' else 'rejeitadas'] += 1
+                decisoes[chave]['segundos'] += segundos or 0
+
+        Fila.objects.all().delete()
+        Decisao.objects.all().delete()
+        Fila.objects.bulk_create([
+            Fila(disciplina_id=disciplina_id, etapa=etapa, pendentes=pendentes[(disciplina_id, etapa)],
+                 expiradas=expiradas[(disciplina_id, etapa)])
+            for disciplina_id, etapa in pendentes.keys() | expiradas.keys()
+        ], batch_size=TAMANHO_LOTE)
+        Decisao.objects.bulk_create([
+            Decisao(
+                disciplina_id=disciplina_id,
+                etapa=etapa,
+                responsavel_id=responsavel_id,
+                faixa=faixa,
+                **contagem,
+            )
+            for (disciplina_id, etapa, responsavel_id, faixa), contagem in decisoes.items()
+        ], batch_size=TAMANHO_LOTE)
+    return sum(pendentes.values()), sum(c['aprovadas'] + c['rejeitadas'] for c in decisoes.values())
+
+
+def _mediana_horas(histograma):
+    # Interpolação linear dentro da faixa que contém a mediana.
+    total = sum(histograma.values())
+    if not total:
+        return None
+    metade = total / 2
+    acumulado = 0
+    for indice, limite in enumerate(FAIXAS_HORAS):
+        quantidade = histograma.get(indice, 0)
+        if quantidade and acumulado + quantidade >= metade:
+            inferior = FAIXAS_HORAS[indice - 1] if indice else 0
+            if limite == float('inf'):
+                return round(inferior, 1)
+            return round(inferior + (limite - inferior) * (metade - acumulado) / quantidade, 1)
+        acumulado += quantidade
+    return None
+
+
+def _resumo_decisoes(aprovadas, rejeitadas, segundos, histograma):
+    decididas = aprovadas + rejeitadas
+    cronometradas = sum(histograma.values())
+    return {
+        'aprovadas': aprovadas,
+        'rejeitadas': rejeitadas,
+        'taxa_aprovacao': round(aprovadas / decididas, 3) if decididas else None,
+        'mediana_horas': _mediana_horas(histograma),
+        'media_horas': round(segundos / cronometradas / 3600, 1) if cronometradas else None,
+    }
+
+
+def _acumular_decisoes(linhas, chave):
+    grupos = defaultdict(lambda: {'aprovadas': 0, 'rejeitadas': 0, 'segundos': 0.0, 'histograma': Counter()})
+    for linha in linhas:
+        grupo = grupos[chave(linha)]
+        grupo['aprovadas'] += linha['aprovadas']
+        grupo['rejeitadas'] += linha['rejeitadas']
+        grupo['segundos'] += linha['segundos']
+        if linha['faixa'] is not None:
+            grupo['histograma'][linha['faixa']] += linha['aprovadas'] + linha['rejeitadas']
+    return {chave: _resumo_decisoes(**grupo) for chave, grupo in grupos.items()}
+
+
+def relatorio_por_disciplina():
+    filas = {
+        (linha['disciplina_id'], linha['etapa']): linha
+        for linha in EstatisticaFila.objects.values('disciplina_id', 'etapa', 'pendentes', 'expiradas')
+    }
+    decisoes = _acumular_decisoes(
+        EstatisticaDecisao.objects.values('disciplina_id', 'etapa', 'faixa', 'aprovadas', 'rejeitadas', 'segundos'),
+        lambda linha: (linha['disciplina_id'], linha['etapa']),
+    )
+    disciplinas = Disciplina.objects.order_by('codigo').values('id', 'codigo', 'nome')
+
+    linhas = []
+    for disciplina in disciplinas:
+        if not any((disciplina['id'], papel) in filas or (disciplina['id'], papel) in decisoes for papel in FILA_POR_PAPEL):
+            continue
+        linha = {'codigo': disciplina['codigo'], 'disciplina': disciplina['nome']}
+        for papel in FILA_POR_PAPEL:
+            chave = (disciplina['id'], papel)
+            fila = filas.get(chave, {})
+            linha[f'{papel}_pendentes'] = fila.get('pendentes', 0)
+            linha[f'{papel}_expiradas'] = fila.get('expiradas', 0)
+            resumo = decisoes.get(chave) or _resumo_decisoes(0, 0, 0, {})
+            linha.update({f'{papel}_{campo}': valor for campo, valor in resumo.items()})
+        linhas.append(linha)
+    return linhas
+
+
+def relatorio_por_responsavel():
+    decisoes = _acumular_decisoes(
+        EstatisticaDecisao.objects.values('responsavel_id', 'etapa', 'faixa', 'aprovadas', 'rejeitadas', 'segundos'),
+        lambda linha: (linha['responsavel_id'], linha['etapa']),
+    )
+    usuarios = {
+        user['id']: user
+        for user in User.objects.filter(
+            id__in={responsavel_id for responsavel_id, _ in decisoes},
+        ).values('id', 'username', 'first_name', 'last_name')
+    }
+    linhas = []
+    for (responsavel_id, etapa), resumo in sorted(decisoes.items(), key=lambda item: (item[0][1], item[0][0] or 0)):
+        user = usuarios.get(responsavel_id)
+        linhas.append({
+            'etapa': etapa,
+            'responsavel': user['username'] if user else None,
+            'nome': f"{user['first_name']} {user['last_name']}".strip() if user else '',
+            **resumo,
+        })
+    return linhas
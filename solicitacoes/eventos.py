@@ -0,0 +1,170 @@
+import asyncio
+import json
+import logging
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.utils.module_loading import import_string
+
+from .models import FILA_POR_PAPEL, Notificacao, Perfil
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_broker = None
+
+
+class Assinatura:
+    # Uma conexão aberta. O broker pode publicar de qualquer thread (views
+    # síncronas, agendador); a entrega passa para o loop de quem assinou.
+    def __init__(self, broker, canais, limite):
+        self.broker = broker
+        self.canais = tuple(canais)
+        self.loop = asyncio.get_running_loop()
+        self.fila = asyncio.Queue(maxsize=limite)
+        self.perdeu_eventos = False
+
+    def entregar(self, tipo, dados):
+        try:
+            self.loop.call_soon_threadsafe(self._enfileirar, tipo, dados)
+        except RuntimeError:
+            # Loop encerrado sem fechar a assinatura.
+            self.fechar()
+
+    def _enfileirar(self, tipo, dados):
+        try:
+            self.fila.put_nowait((tipo, dados))
+        except asyncio.QueueFull:
+            # Cliente lento: em vez de acumular memória, descarta e pede que
+            # ele recarregue tudo quando voltar a ler.
+            self.perdeu_eventos = True
+
+    async def proximo(self, espera):
+        if self.perdeu_eventos:
+            self.perdeu_eventos = False
+            while not self.fila.empty():
+                self.fila.get_nowait()
+            return 'recarregar', {}
+        return await asyncio.wait_for(self.fila.get(), espera)
+
+    def fechar(self):
+        self.broker.cancelar(self)
+
+
+class BrokerLocal:
+    # Pub/sub em memória: só alcança as conexões deste processo. Com vários
+    # processos, troque EVENTOS_BROKER por uma classe com a mesma interface
+    # (assinar, cancelar, publicar) sobre um broker externo.
+    def __init__(self, limite=100):
+        self.limite = limite
+        self._lock = threading.Lock()
+        self._assinaturas = defaultdict(set)
+
+    def assinar(self, canais):
+        assinatura = Assinatura(self, canais, self.limite)
+        with self._lock:
+            for canal in assinatura.canais:
+                self._assinaturas[canal].add(assinatura)
+        return assinatura
+
+    def cancelar(self, assinatura):
+        with self._lock:
+            for canal in assinatura.canais:
+                assinaturas = self._assinaturas.get(canal)
+                if assinaturas is not None:
+                    assinaturas.discard(assinatura)
+                    if not assinaturas:
+                        del self._assinaturas[canal]
+
+    def publicar(self, canal, tipo, dados):
+        with self._lock:
+            assinaturas = list(self._assinaturas.get(canal, ()))
+        for assinatura in assinaturas:
+            assinatura.entregar(tipo, dados)
+        return len(assinaturas)
+
+    def conexoes(self):
+        with self._lock:
+            return len({assinatura for assinaturas in self._assinaturas.values() for assinatura in assinaturas})
+
+
+def obter_broker():
+    global _broker
+    with _lock:
+        if _broker is None:
+            _broker = import_string(settings.EVENTOS_BROKER)()
+        return _broker
+
+
+def canais_do_usuario(user_id, papel):
+    canais = [f'usuario:{user_id}']
+    if papel in FILA_POR_PAPEL:
+        canais.append(f'fila:{papel}')
+    return canais
+
+
+def publicar(canais, tipo, dados):
+    # Só depois do commit: quem recebe o evento e consulta o banco precisa
+    # enxergar a mudança.
+    def enviar():
+        broker = obter_broker()
+        for canal in canais:
+            try:
+                broker.publicar(canal, tipo, dados)
+            except Exception:
+                logger.exception('Falha ao publicar evento %s em %s.', tipo, canal)
+
+    transaction.on_commit(enviar)
+
+
+def publicar_fila(solicitacoes):
+    # A etapa anterior não é conhecida aqui; todas as filas recebem o delta
+    # e cada cliente decide se a linha entrou ou saiu da sua.
+    publicar([f'fila:{papel}' for papel in FILA_POR_PAPEL], 'fila', {
+        'solicitacoes': [
+            {'id': solicitacao.id, 'etapa': solicitacao.etapa_atual, 'status': solicitacao.status}
+            for solicitacao in solicitacoes
+        ],
+    })
+
+
+def publicar_nao_lidas(usuarios):
+    usuarios = set(usuarios)
+    if not usuarios:
+        return
+    # O contador do perfil; só quem não tem perfil é contado na tabela.
+    contagens = dict(Perfil.objects.filter(user_id__in=usuarios).values_list('user_id', 'notificacoes_nao_lidas'))
+    sem_perfil = usuarios - set(contagens)
+    if sem_perfil:
+        contagens.update(dict.fromkeys(sem_perfil, 0))
+        contagens.update(
+            Notificacao.objects.filter(user_id__in=sem_perfil, lido=False)
+            .order_by().values('user_id').annotate(total=Count('id')).values_list('user_id', 'total')
+        )
+    for user_id, total in contagens.items():
+        publicar([f'usuario:{user_id}'], 'notificacoes', {'nao_lidas': total})
+
+
+def _mensagem(tipo, dados):
+    return f'event: {tipo}\ndata: {json.dumps(dados)}\n\n'.encode()
+
+
+async def transmitir(canais):
+    assinatura = obter_broker().assinar(canais)
+    try:
+        # `retry` orienta a reconexão do EventSource; o comentário inicial faz
+        # proxies liberarem os cabeçalhos de imediato.
+        yield f'retry: {settings.EVENTOS_RECONEXAO_MS}\n: conectado\n\n'.encode()
+        while True:
+            try:
+                tipo, dados = await assinatura.proximo(settings.EVENTOS_PULSO)
+            except asyncio.TimeoutError:
+                # Mantém a conexão viva em proxies que fecham conexões ociosas.
+                yield b': pulso\n\n'
+                continue
+            yield _mensagem(tipo, dados)
+    finally:
+        assinatura.fechar()
@@ -0,0 +1,12 @@
+import logging
+
+from .models import Solicitacao
+
+logger = logging.getLogger(__name__)
+
+
+def expirar_solicitacoes():
+    total = Solicitacao.objects.expirar()
+    if total:
+        logger.info('%s solicitação(ões) rejeitada(s) por prazo expirado.', total)
+    return total
@@ -0,0 +1,359 @@
+import csv
+import gzip
+import io
+import logging
+import re
+import tempfile
+import zipfile
+from datetime import datetime, time, timedelta
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.core.files import File
+from django.core.mail import send_mail
+from django.db import transaction
+from django.db.models import Q
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .models import Exportacao, Solicitacao
+
+logger = logging.getLogger(__name__)
+
+TAMANHO_LOTE = 2000
+TAMANHO_BLOCO = 64 * 1024
+# Uma exportação 'processando' há mais que RESERVA teve o worker interrompido
+# e volta para a fila; depois de TENTATIVAS reservas, é dada como falha.
+RESERVA = timedelta(hours=1)
+TENTATIVAS = 3
+
+COLUNAS = [
+    ('id', 'id'),
+    ('data_solicitacao', 'data_solicitacao'),
+    ('aluno', 'aluno__username'),
+    ('nome', 'aluno__first_name'),
+    ('sobrenome', 'aluno__last_name'),
+    ('matricula', 'aluno__perfil__matricula'),
+    ('disciplina_codigo', 'disciplina__codigo'),
+    ('disciplina', 'disciplina__nome'),
+    ('status', 'status'),
+    ('etapa_atual', 'etapa_atual'),
+    ('data_limite', 'data_limite'),
+    ('coordenador_status', 'coordenador_status'),
+    ('coordenador_data', 'coordenador_data'),
+    ('secretaria_status', 'secretaria_status'),
+    ('secretaria_data', 'secretaria_data'),
+    ('professor_status', 'professor_status'),
+    ('data_avaliacao', 'data_avaliacao'),
+    ('motivo', 'motivo'),
+]
+FORMATOS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx'),
+}
+# Caracteres proibidos em XML 1.0.
+CONTROLE_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+# Início de célula que o Excel interpreta como fórmula.
+INICIO_FORMULA = ('=', '+', '-', '@', '\t', '\r')
+
+
+def limpar_filtros(dados):
+    filtros = {}
+    for chave in ('de', 'ate'):
+        if dados.get(chave):
+            data = parse_date(dados[chave])
+            if data is None:
+                raise ValueError(f'Data inválida em "{chave}"; use AAAA-MM-DD.')
+            filtros[chave] = data.isoformat()
+    if dados.get('status'):
+        if dados['status'] not in dict(Solicitacao.STATUS_CHOICES):
+            raise ValueError('Status inválido.')
+        filtros['status'] = dados['status']
+    if dados.get('etapa'):
+        if dados['etapa'] not in dict(Solicitacao.ETAPA_CHOICES):
+            raise ValueError('Etapa inválida.')
+        filtros['etapa'] = dados['etapa']
+    if dados.get('disciplina'):
+        filtros['disciplina'] = dados['disciplina']
+    return filtros
+
+
+def _inicio_do_dia(data):
+    return timezone.make_aware(datetime.combine(data, time.min))
+
+
+def consultar(filtros):
+    queryset = Solicitacao.objects.all()
+    # Intervalos em vez de __date, para o banco poder usar o índice da data.
+    if 'de' in filtros:
+        queryset = queryset.filter(data_solicitacao__gte=_inicio_do_dia(parse_date(filtros['de'])))
+    if 'ate' in filtros:
+        fim = parse_date(filtros['ate']) + timedelta(days=1)
+        queryset = queryset.filter(data_solicitacao__lt=_inicio_do_dia(fim))
+    if 'status' in filtros:
+        queryset = queryset.filter(status=filtros['status'])
+    if 'etapa' in filtros:
+        queryset = queryset.filter(etapa_atual=filtros['etapa'])
+    if 'disciplina' in filtros:
+        queryset = queryset.filter(disciplina__codigo=filtros['disciplina'])
+    return queryset
+
+
+def linhas(filtros):
+    # values_list + iterator: nada de instâncias nem do resultado inteiro em
+    # memória; o banco entrega TAMANHO_LOTE linhas por vez.
+    consulta = consultar(filtros).order_by('id').values_list(*(campo for _, campo in COLUNAS))
+    for linha in consulta.iterator(chunk_size=TAMANHO_LOTE):
+        yield [
+            timezone.localtime(valor).strftime('%Y-%m-%d %H:%M') if isinstance(valor, datetime) else valor
+            for valor in linha
+        ]
+
+
+def _celula_csv(valor):
+    # Texto vindo do aluno (motivo, nome) não pode virar fórmula ao abrir a
+    # planilha; o apóstrofo faz o Excel tratá-lo como texto. No XLSX as
+    # células já são strings inline.
+    if isinstance(valor, str) and valor.startswith(INICIO_FORMULA):
+        return f"'{valor}"
+    return valor
+
+
+def gerar_csv(registros):
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    # O BOM faz o Excel abrir o arquivo como UTF-8.
+    buffer.write('﻿')
+    escritor.writerow([cabecalho for cabecalho, _ in COLUNAS])
+    yield buffer.getvalue().encode()
+    buffer.seek(0)
+    buffer.truncate()
+    for linha in registros:
+        escritor.writerow([_celula_csv(valor) for valor in linha])
+        if buffer.tell() >= TAMANHO_BLOCO:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+class _Saida:
+    # Destino sem seek para o zipfile: ele passa a gravar os tamanhos em
+    # descritores depois de cada entrada e o arquivo sai em sequência.
+    def __init__(self):
+        self.partes = []
+
+    def write(self, dados):
+        self.partes.append(bytes(dados))
+        return len(dados)
+
+    def flush(self):
+        pass
+
+    def esvaziar(self):
+        dados = b''.join(self.partes)
+        self.partes.clear()
+        return dados
+
+
+XLSX_FIXOS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Solicitações" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def _celula(valor):
+    if valor is None:
+        return '<c/>'
+    if isinstance(valor, int) and not isinstance(valor, bool):
+        return f'<c><v>{valor}</v></c>'
+    texto = escape(CONTROLE_XML.sub('', str(valor)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{texto}</t></is></c>'
+
+
+def _linha_xlsx(valores):
+    return '<row>' + ''.join(_celula(valor) for valor in valores) + '</row>'
+
+
+def gerar_xlsx(registros):
+    # Planilha mínima (texto inline, sem estilos) montada com o zipfile da
+    # biblioteca padrão, entregue à medida que as linhas são comprimidas.
+    saida = _Saida()
+    with zipfile.ZipFile(saida, 'w', compression=zipfile.ZIP_DEFLATED) as pacote:
+        for nome, conteudo in XLSX_FIXOS.items():
+            pacote.writestr(nome, conteudo)
+        with pacote.open('xl/worksheets/sheet1.xml', 'w') as planilha:
+            planilha.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+                + _linha_xlsx(cabecalho for cabecalho, _ in COLUNAS)
+            ).encode())
+            yield saida.esvaziar()
+            pendente = []
+            tamanho = 0
+            for linha in registros:
+                xml = _linha_xlsx(linha)
+                pendente.append(xml)
+                tamanho += len(xml)
+                if tamanho >= TAMANHO_BLOCO:
+                    planilha.write(''.join(pendente).encode())
+                    pendente.clear()
+                    tamanho = 0
+                    dados = saida.esvaziar()
+                    if dados:
+                        yield dados
+            planilha.write((''.join(pendente) + '</sheetData></worksheet>').encode())
+    yield saida.esvaziar()
+
+
+def gerar(formato, filtros):
+    registros = linhas(filtros)
+    return gerar_xlsx(registros) if formato == 'xlsx' else gerar_csv(registros)
+
+
+def nome_arquivo(formato, data=None):
+    data = data or timezone.localdate()
+    return f'solicitacoes-{data.isoformat()}.{FORMATOS[formato][1]}'
+
+
+def extensao_gravada(formato):
+    # CSV vai comprimido com gzip; o XLSX já é um zip.
+    return 'csv.gz' if formato == 'csv' else 'xlsx'
+
+
+def _gravar(exportacao):
+    total = 0
+    with tempfile.TemporaryFile() as temporario:
+        if exportacao.formato == 'csv':
+            destino = gzip.GzipFile(fileobj=temporario, mode='wb')
+        else:
+            destino = temporario
+
+        def contar(registros):
+            nonlocal total
+            for linha in registros:
+                total += 1
+                yield linha
+
+        registros = contar(linhas(exportacao.filtros))
+        blocos = gerar_xlsx(registros) if exportacao.formato == 'xlsx' else gerar_csv(registros)
+        for bloco in blocos:
+            destino.write(bloco)
+        if destino is not temporario:
+            destino.close()
+        temporario.seek(0)
+        nome = f'{exportacao.id}.{extensao_gravada(exportacao.formato)}'
+        exportacao.arquivo.save(nome, File(temporario), save=False)
+    return total
+
+
+def _avisar(exportacao):
+    if not exportacao.user.email:
+        return
+    link = settings.SITE_URL.rstrip('/') + reverse('baixar_exportacao', args=[exportacao.id])
+    send_mail(
+        'Exportação de solicitações pronta',
+        f'Sua exportação com {exportacao.linhas} solicitação(ões) está disponível por '
+        f'{settings.EXPORTACOES_VALIDADE_DIAS} dia(s) em {link}',
+        None,
+        [exportacao.user.email],
+        fail_silently=True,
+    )
+
+
+def liberar_reservas_vencidas(agora=None):
+    agora = agora or timezone.now()
+    vencidas = Exportacao.objects.filter(status='processando').filter(
+        Q(reservada_em__lt=agora - RESERVA) | Q(reservada_em__isnull=True),
+    )
+    falhas = vencidas.filter(tentativas__gte=TENTATIVAS).update(status='falhou', concluida_em=agora)
+    devolvidas = vencidas.update(status='pendente', reservada_em=None)
+    if falhas or devolvidas:
+        logger.warning('Exportações interrompidas: %s de volta à fila, %s com falha.', devolvidas, falhas)
+    return devolvidas, falhas
+
+
+def remover_expiradas():
+    liberar_reservas_vencidas()
+    limite = timezone.now() - timedelta(days=settings.EXPORTACOES_VALIDADE_DIAS)
+    removidas = 0
+    for exportacao in Exportacao.objects.filter(criado_em__lt=limite).exclude(status='processando'):
+        exportacao.arquivo.delete(save=False)
+        exportacao.delete()
+        removidas += 1
+    return removidas
+
+
+def processar_exportacoes():
+    remover_expiradas()
+    with transaction.atomic():
+        exportacao = (
+            Exportacao.objects.select_for_update(skip_locked=True)
+            .filter(status='pendente').order_by('criado_em').first()
+        )
+        if exportacao is None:
+            return None
+        exportacao.status = 'processando'
+        exportacao.reservada_em = timezone.now()
+        exportacao.tentativas += 1
+        exportacao.save(update_fields=['status', 'reservada_em', 'tentativas'])
+
+    try:
+        exportacao.linhas = _gravar(exportacao)
+        exportacao.status = 'concluida'
+    except Exception:
+        logger.exception('Falha na exportação %s.', exportacao.id)
+        exportacao.status = 'falhou'
+    exportacao.concluida_em = timezone.now()
+    # Só grava se a reserva ainda for desta execução: passada a RESERVA, a
+    # exportação pode ter voltado para a fila e sido pega por outro worker.
+    gravada = Exportacao.objects.filter(
+        pk=exportacao.pk, status='processando', reservada_em=exportacao.reservada_em,
+    ).update(
+        status=exportacao.status,
+        arquivo=exportacao.arquivo.name,
+        linhas=exportacao.linhas,
+        concluida_em=exportacao.concluida_em,
+    )
+    if not gravada:
+        logger.warning('Exportação %s terminou depois de perder a reserva; resultado descartado.', exportacao.id)
+        exportacao.arquivo.delete(save=False)
+        exportacao.refresh_from_db()
+        return exportacao
+    if exportacao.status == 'concluida':
+        _avisar(exportacao)
+    return exportacao
@@ -0,0 +1,187 @@
+import csv
+import io
+import itertools
+import json
+import os
+
+from django.db import transaction
+
+from . import cache_dashboard
+from .models import Disciplina
+from .signals import ESCOPOS_FILAS
+
+TAMANHO_LOTE = 1000
+TAMANHO_BLOCO = 64 * 1024
+VERDADEIROS = {'1', 'true', 'sim', 's', 'yes', 'y', 'ativo'}
+CAMPOS_DISCIPLINA = ['nome', 'descricao', 'ativo']
+
+
+def detectar_formato(caminho):
+    extensao = os.path.splitext(caminho)[1].lower()
+    return 'json' if extensao in ('.json', '.jsonl', '.ndjson') else 'csv'
+
+
+def ler_csv(arquivo):
+    # Sem seek(): a entrada pode ser um pipe (`popular_disciplinas -`). A
+    # amostra é completada até o fim da linha e lida de novo antes do resto.
+    amostra = arquivo.read(TAMANHO_BLOCO)
+    if amostra and not amostra.endswith('\n'):
+        amostra += arquivo.readline()
+    try:
+        dialeto = csv.Sniffer().sniff(amostra, delimiters=',;\t')
+    except csv.Error:
+        dialeto = csv.excel
+    yield from csv.DictReader(itertools.chain(io.StringIO(amostra), arquivo), dialect=dialeto)
+
+
+def ler_json(arquivo):
+    # Aceita um array de objetos ou JSON Lines sem carregar o arquivo inteiro:
+    # cada objeto é decodificado assim que termina de chegar no buffer.
+    decoder = json.JSONDecoder()
+    buffer, posicao, acabou = '', 0, False
+    while True:
+        while posicao < len(buffer) and buffer[posicao] in ' \t\r\n,[':
+            posicao += 1
+        if posicao < len(buffer) and buffer[posicao] == ']':
+            return
+        try:
+            if posicao >= len(buffer):
+                raise json.JSONDecodeError('fim do buffer', buffer, posicao)
+            objeto, posicao = decoder.raw_decode(buffer, posicao)
+        except json.JSONDecodeError:
+            if acabou:
+                if buffer[posicao:].strip():
+                    raise
+                return
+            bloco = arquivo.read(TAMANHO_BLOCO)
+            acabou = not bloco
+            buffer, posicao = buffer[posicao:] + bloco, 0
+            continue
+        yield objeto
+
+
+def ler_registros(arquivo, formato):
+    return ler_json(arquivo) if formato == 'json' else ler_csv(arquivo)
+
+
+def em_lotes(iteravel, tamanho):
+    lote = []
+    for item in iteravel:
+        lote.append(item)
+        if len(lote) >= tamanho:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+def _normalizar_disciplina(registro):
+    codigo = str(registro.get('codigo') or '').strip()
+    nome = str(registro.get('nome') or '').strip()
+    if not codigo or not nome:
+        raise ValueError('codigo e nome são obrigatórios')
+    if len(codigo) > Disciplina._meta.get_field('codigo').max_length:
+        raise ValueError(f'codigo "{codigo}" excede o tamanho máximo')
+    ativo = registro.get('ativo', True)
+    if isinstance(ativo, str):
+        ativo = ativo.strip().lower() in VERDADEIROS if ativo.strip() else True
+    return Disciplina(
+        codigo=codigo,
+        nome=nome[:Disciplina._meta.get_field('nome').max_length],
+        descricao=str(registro.get('descricao') or '').strip(),
+        ativo=bool(ativo),
+    )
+
+
+def _desativar_ausentes(vistos):
+    # Transação própria e curta, depois de todos os lotes gravados.
+    desativadas = 0
+    with transaction.atomic():
+        ativas = set(Disciplina.objects.filter(ativo=True).values_list('codigo', flat=True))
+        ausentes = list(ativas - vistos)
+        # Normalmente um único UPDATE; o fatiamento só respeita o limite de
+        # parâmetros do SQLite em catálogos muito grandes.
+        for inicio in range(0, len(ausentes), 10000):
+            desativadas += Disciplina.objects.filter(
+                codigo__in=ausentes[inicio:inicio + 10000],
+            ).update(ativo=False)
+    return desativadas
+
+
+def importar_disciplinas(registros, tamanho_lote=TAMANHO_LOTE, desativar_ausentes=False, dry_run=False, atualizar=False):
+    # Sem `atualizar`, como o get_or_create de antes: só cria as que faltam e
+    # mantém as já cadastradas (contadas em `mantidas`).
+    resultado = {
+        'criadas': 0, 'atualizadas': 0, 'inalteradas': 0, 'mantidas': 0, 'desativadas': 0,
+        'invalidas': 0, 'erros': [],
+    }
+    vistos = set()
+    # No dry-run nada fica gravado entre os lotes: o que já teria sido
+    # gravado vale como existente para os seguintes.
+    previstas = {}
+
+    try:
+        for numero, lote in enumerate(em_lotes(registros, tamanho_lote)):
+            novas = {}
+            for indice, registro in enumerate(lote, start=numero * tamanho_lote + 1):
+                try:
+                    disciplina = _normalizar_disciplina(registro)
+                except (AttributeError, ValueError) as erro:
+                    resultado['invalidas'] += 1
+                    if len(resultado['erros']) < 20:
+                        resultado['erros'].append(f'registro {indice}: {erro}')
+                    continue
+                # Código repetido no arquivo: vale a última ocorrência.
+                novas[disciplina.codigo] = disciplina
+            vistos.update(novas)
+
+            # Cada lote é uma transação: a trava de escrita do SQLite fica
+            # presa por um lote, não pela importação inteira.
+            with transaction.atomic():
+                # Uma leitura por lote separa criadas, alteradas e inalteradas;
+                # só as duas primeiras vão para o upsert.
+                existentes = {
+                    codigo: (nome, descricao, ativo)
+                    for codigo, nome, descricao, ativo in Disciplina.objects.filter(codigo__in=list(novas))
+                    .values_list('codigo', *CAMPOS_DISCIPLINA)
+                }
+                existentes.update((codigo, previstas[codigo]) for codigo in novas if codigo in previstas)
+                gravar = []
+                for codigo, disciplina in novas.items():
+                    atual = existentes.get(codigo)
+                    if atual is None:
+                        resultado['criadas'] += 1
+                    elif not atualizar:
+                        resultado['mantidas'] += 1
+                        continue
+                    elif atual == (disciplina.nome, disciplina.descricao, disciplina.ativo):
+                        resultado['inalteradas'] += 1
+                        continue
+                    else:
+                        resultado['atualizadas'] += 1
+                    gravar.append(disciplina)
+                if dry_run:
+                    previstas.update(
+                        (disciplina.codigo, (disciplina.nome, disciplina.descricao, disciplina.ativo))
+                        for disciplina in gravar
+                    )
+                elif gravar:
+                    Disciplina.objects.bulk_create(
+                        gravar,
+                        update_conflicts=True,
+                        unique_fields=['codigo'],
+                        update_fields=CAMPOS_DISCIPLINA,
+                    )
+
+        if desativar_ausentes:
+            if dry_run:
+                ativas = set(Disciplina.objects.filter(ativo=True).values_list('codigo', flat=True))
+                resultado['desativadas'] = len(ativas - vistos)
+            else:
+                resultado['desativadas'] = _desativar_ausentes(vistos)
+    finally:
+        # Também quando um lote falha: os anteriores já estão gravados.
+        # bulk_create e update() não disparam post_save.
+        if not dry_run and (resultado['criadas'] or resultado['atualizadas'] or resultado['desativadas']):
+            cache_dashboard.invalidar('disciplinas', *ESCOPOS_FILAS)
+    return resultado
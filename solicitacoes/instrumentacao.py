@@ -0,0 +1,275 @@
+import cProfile
+import heapq
+import os
+import random
+import re
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.backends.django import DjangoTemplates, Template
+from django.utils.functional import empty
+
+from .models import Perfil
+
+# Limites (ms) do histograma, no formato "le" do Prometheus.
+LIMITES_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, float('inf'))
+LISTA_IN = re.compile(r'\((?:%s, )+%s\)')
+ESPACOS = re.compile(r'\s+')
+
+# A medição da requisição atual. O sync_to_async copia o contexto para a
+# thread que executa a função, então as threads de _em_paralelo e os
+# render() de views assíncronas somam na mesma medição.
+_medicao = ContextVar('medicao', default=None)
+_profundidade_template = ContextVar('profundidade_template', default=0)
+
+
+def impressao_digital(sql):
+    # Os parâmetros já vêm separados; só falta colapsar listas IN de tamanhos
+    # diferentes para que a mesma consulta tenha a mesma impressão digital.
+    return ESPACOS.sub(' ', LISTA_IN.sub('(...)', sql)).strip()
+
+
+class Serie:
+    def __init__(self, janela):
+        self.requisicoes = 0
+        self.baldes = [0] * len(LIMITES_MS)
+        self.soma_ms = 0.0
+        self.soma_consultas = 0
+        self.soma_banco_ms = 0.0
+        self.soma_template_ms = 0.0
+        self.duplicadas = Counter()
+        self.recentes = deque(maxlen=janela)
+
+    def registrar(self, amostra):
+        self.requisicoes += 1
+        self.soma_ms += amostra['total_ms']
+        self.soma_consultas += amostra['consultas']
+        self.soma_banco_ms += amostra['banco_ms']
+        self.soma_template_ms += amostra['template_ms']
+        for indice, limite in enumerate(LIMITES_MS):
+            if amostra['total_ms'] <= limite:
+                self.baldes[indice] += 1
+                break
+        self.duplicadas.update(amostra['duplicadas'])
+        self.recentes.append((amostra['total_ms'], amostra['consultas']))
+
+    def resumo(self):
+        latencias = sorted(total for total, _ in self.recentes)
+
+        def percentil(fracao):
+            if not latencias:
+                return 0
+            return round(latencias[min(int(len(latencias) * fracao), len(latencias) - 1)], 2)
+
+        return {
+            'requisicoes': self.requisicoes,
+            'p50_ms': percentil(0.50),
+            'p95_ms': percentil(0.95),
+            'p99_ms': percentil(0.99),
+            'consultas_media': round(self.soma_consultas / self.requisicoes, 2),
+            'banco_ms_medio': round(self.soma_banco_ms / self.requisicoes, 2),
+            'template_ms_medio': round(self.soma_template_ms / self.requisicoes, 2),
+            'consultas_duplicadas': [
+                {'sql': sql, 'repeticoes': total}
+                for sql, total in self.duplicadas.most_common(5)
+            ],
+        }
+
+
+class Registro:
+    def __init__(self):
+        self.trava = threading.Lock()
+        self.series = defaultdict(lambda: Serie(settings.INSTRUMENTACAO_JANELA))
+        self.mais_lentas = []
+
+    def registrar(self, view, papel, amostra):
+        with self.trava:
+            self.series[(view, papel)].registrar(amostra)
+
+    def resumo(self):
+        with self.trava:
+            return {
+                'views': [
+                    {'view': view, 'papel': papel, **serie.resumo()}
+                    for (view, papel), serie in sorted(self.series.items())
+                ],
+                'perfis_mais_lentos': [
+                    {'total_ms': round(total, 2), 'view': view, 'arquivo': arquivo}
+                    for total, view, arquivo in sorted(self.mais_lentas, reverse=True)
+                ],
+            }
+
+    def prometheus(self):
+        linhas = [
+            '# HELP segunda_chamada_requisicao_ms Latência das requisições por view e papel.',
+            '# TYPE segunda_chamada_requisicao_ms histogram',
+        ]
+        contadores = {
+            'consultas': 'Consultas SQL executadas.',
+            'banco_ms': 'Tempo gasto no banco (ms).',
+            'template_ms': 'Tempo de renderização de templates (ms).',
+        }
+        with self.trava:
+            series = sorted(self.series.items())
+            for (view, papel), serie in series:
+                rotulos = f'view="{view}",papel="{papel}"'
+                acumulado = 0
+                for limite, quantidade in zip(LIMITES_MS, serie.baldes):
+                    acumulado += quantidade
+                    le = '+Inf' if limite == float('inf') else limite
+                    linhas.append(f'segunda_chamada_requisicao_ms_bucket{{{rotulos},le="{le}"}} {acumulado}')
+                linhas.append(f'segunda_chamada_requisicao_ms_sum{{{rotulos}}} {serie.soma_ms:.3f}')
+                linhas.append(f'segunda_chamada_requisicao_ms_count{{{rotulos}}} {serie.requisicoes}')
+            for nome, ajuda in contadores.items():
+                linhas.append(f'# HELP segunda_chamada_{nome}_total {ajuda}')
+                linhas.append(f'# TYPE segunda_chamada_{nome}_total counter')
+                for (view, papel), serie in series:
+                    valor = getattr(serie, f'soma_{nome}')
+                    linhas.append(f'segunda_chamada_{nome}_total{{view="{view}",papel="{papel}"}} {valor:g}')
+        return '\n'.join(linhas) + '\n'
+
+    def guardar_perfil(self, total_ms, view, perfil):
+        # Mantém em disco apenas os N perfis mais lentos já amostrados.
+        limite = settings.INSTRUMENTACAO_PERFIS_GUARDADOS
+        with self.trava:
+            if len(self.mais_lentas) >= limite and total_ms <= self.mais_lentas[0][0]:
+                return None
+            diretorio = settings.INSTRUMENTACAO_PERFIS_DIR
+            os.makedirs(diretorio, exist_ok=True)
+            arquivo = os.path.join(diretorio, f'{view.replace(":", "_")}-{int(time.time() * 1000)}.prof')
+            perfil.dump_stats(arquivo)
+            heapq.heappush(self.mais_lentas, (total_ms, view, arquivo))
+            if len(self.mais_lentas) > limite:
+                _, _, descartado = heapq.heappop(self.mais_lentas)
+                if os.path.exists(descartado):
+                    os.remove(descartado)
+            return arquivo
+
+    def zerar(self):
+        with self.trava:
+            self.series.clear()
+            self.mais_lentas.clear()
+
+
+registro = Registro()
+
+
+class _Medicao:
+    def __init__(self):
+        self.trava = threading.Lock()
+        self.consultas = 0
+        self.banco = 0.0
+        self.template = 0.0
+        self.impressoes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duracao = time.perf_counter() - inicio
+            with self.trava:
+                self.banco += duracao
+                self.consultas += 1
+                self.impressoes[impressao_digital(sql)] += 1
+
+    def somar_template(self, duracao):
+        with self.trava:
+            self.template += duracao
+
+
+class TemplateMedido(Template):
+    def render(self, context=None, request=None):
+        medicao = _medicao.get()
+        if medicao is None:
+            return super().render(context, request)
+        # Só o template mais externo conta; includes e render_to_string
+        # aninhados já estão dentro dele.
+        profundidade = _profundidade_template.set(_profundidade_template.get() + 1)
+        inicio = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            _profundidade_template.reset(profundidade)
+            if _profundidade_template.get() == 0:
+                medicao.somar_template(time.perf_counter() - inicio)
+
+
+class TemplatesMedidos(DjangoTemplates):
+    # O backend de templates do projeto (settings.TEMPLATES): igual ao do
+    # Django, com os templates medidos quando há uma medição em andamento.
+    def from_string(self, template_code):
+        return TemplateMedido(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return TemplateMedido(super().get_template(template_name).template, self)
+
+
+def _papel(request):
+    user = getattr(request, 'user', None)
+    if getattr(user, '_wrapped', None) is empty:
+        # A view nem chegou a carregar o usuário; não carrega só para medir.
+        return 'nao_carregado'
+    if user is None or not user.is_authenticated:
+        return 'anonimo'
+    # Não faz consulta extra: usa o perfil só se a view já o carregou.
+    relacao = Perfil.user.field.remote_field
+    if relacao.is_cached(user):
+        perfil = relacao.get_cached_value(user)
+        return perfil.tipo if perfil else 'sem_perfil'
+    return 'staff' if user.is_staff else 'desconhecido'
+
+
+class InstrumentacaoMiddleware:
+    def __init__(self, get_response):
+        if not settings.INSTRUMENTACAO:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        medicao = _Medicao()
+        token = _medicao.set(medicao)
+        perfil = None
+        if random.random() < settings.INSTRUMENTACAO_PERFIL_AMOSTRA:
+            perfil = cProfile.Profile()
+        inicio = time.perf_counter()
+        try:
+            with ExitStack() as pilha:
+                for conexao in connections.all():
+                    pilha.enter_context(conexao.execute_wrapper(medicao))
+                if perfil:
+                    try:
+                        perfil.enable()
+                    except ValueError:
+                        # Outro profiler já está ativo nesta thread.
+                        perfil = None
+                try:
+                    response = self.get_response(request)
+                finally:
+                    if perfil:
+                        perfil.disable()
+        finally:
+            _medicao.reset(token)
+
+        total_ms = (time.perf_counter() - inicio) * 1000
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'nao_resolvida'
+        registro.registrar(view, _papel(request), {
+            'total_ms': total_ms,
+            'consultas': medicao.consultas,
+            'banco_ms': medicao.banco * 1000,
+            'template_ms': medicao.template * 1000,
+            'duplicadas': {sql: n for sql, n in medicao.impressoes.items() if n > 1},
+        })
+        if perfil:
+            registro.guardar_perfil(total_ms, view, perfil)
+        response['Server-Timing'] = (
+            f'db;dur={medicao.banco * 1000:.1f}, tpl;dur={medicao.template * 1000:.1f}, total;dur={total_ms:.1f}'
+        )
+        return response
@@ -0,0 +1,19 @@
+import threading
+
+from django.core.management.base import BaseCommand
+
+from solicitacoes.agendador import iniciar_agendador, parar_tarefas
+
+
+class Command(BaseCommand):
+    help = 'Roda as tarefas periódicas (expiração, notificações, arquivos, importações e exportações) neste processo'
+
+    def handle(self, *args, **options):
+        iniciar_agendador()
+        self.stdout.write(self.style.SUCCESS('Agendador em execução; Ctrl+C para parar.'))
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            parar_tarefas()
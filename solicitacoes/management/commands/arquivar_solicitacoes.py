@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from solicitacoes.arquivamento import TAMANHO_LOTE, arquivar_solicitacoes, inicio_do_semestre
+
+
+class Command(BaseCommand):
+    help = 'Move as solicitações encerradas de semestres antigos, com notificações e anexos, para o arquivo'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--semestres',
+            type=int,
+            default=settings.ARQUIVAMENTO_SEMESTRES,
+            help='Arquiva o que foi pedido antes do início do semestre letivo de N semestres atrás',
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=TAMANHO_LOTE,
+            help='Solicitações por transação',
+        )
+        parser.add_argument(
+            '--lotes',
+            type=int,
+            default=None,
+            help='Para depois de N lotes; rode de novo para continuar',
+        )
+
+    def handle(self, *args, **options):
+        limite = inicio_do_semestre(recuar=options['semestres'])
+        self.stdout.write(f'Arquivando solicitações encerradas pedidas antes de {limite:%d/%m/%Y}.')
+        total = 0
+        for movidas in arquivar_solicitacoes(options['semestres'], options['lote'], options['lotes']):
+            total += movidas
+            self.stdout.write(f'Lote arquivado: {movidas} (total {total})')
+        self.stdout.write(self.style.SUCCESS(f'Solicitações arquivadas: {total}'))
@@ -0,0 +1,106 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+from django.urls import reverse
+
+from solicitacoes import benchmark
+
+
+class Command(BaseCommand):
+    help = 'Mede latência, consultas e linhas escritas do fluxo de aprovação com dados gerados'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--solicitacoes', type=int, default=20000, help='Solicitações geradas')
+        parser.add_argument('--disciplinas', type=int, default=50, help='Disciplinas geradas')
+        parser.add_argument('--alunos', type=int, default=500, help='Alunos gerados')
+        parser.add_argument('--repeticoes', type=int, default=30, help='Requisições por cenário')
+        parser.add_argument('--banco-arquivo', help='Usa um arquivo SQLite temporário em vez da base em memória')
+        parser.add_argument('--saida', help='Grava o resultado em JSON (baseline)')
+        parser.add_argument('--comparar', help='Baseline JSON para comparação; falha se houver regressão')
+        parser.add_argument('--tolerancia', type=float, default=0.5, help='Aumento relativo de p95 aceito na comparação')
+        parser.add_argument('--popular', action='store_true', help='Gera os dados no banco configurado e encerra')
+        parser.add_argument('--url', help='Modo remoto: envia carga simultânea a um servidor já em execução')
+        parser.add_argument('--concorrencia', type=int, default=8, help='Clientes simultâneos no modo remoto e em --servidores')
+        parser.add_argument(
+            '--servidores',
+            action='store_true',
+            help='Compara a vazão dos dashboards pelo handler WSGI e pelo ASGI (use com --banco-arquivo)',
+        )
+
+    def handle(self, *args, **options):
+        base = None
+        if options['comparar']:
+            with open(options['comparar'], encoding='utf-8') as arquivo:
+                base = json.load(arquivo)
+            # A comparação só faz sentido com o mesmo volume da baseline.
+            for campo in ('solicitacoes', 'disciplinas', 'alunos', 'repeticoes'):
+                if campo in base['meta']:
+                    options[campo] = base['meta'][campo]
+
+        volume = {
+            'solicitacoes': options['solicitacoes'],
+            'disciplinas': options['disciplinas'],
+            'alunos': options['alunos'],
+        }
+
+        if options['popular']:
+            benchmark.gerar_dados(**volume)
+            self.stdout.write(self.style.SUCCESS(
+                f"Dados gerados. Usuários bench-aluno-N, bench-coordenador-N etc., senha '{benchmark.SENHA}'."
+            ))
+            return
+
+        if options['url']:
+            sessoes = [
+                (f'bench-aluno-{i}', [reverse('dashboard_aluno')]) for i in range(options['concorrencia'])
+            ] + [
+                (f'bench-{papel}-0', [reverse('dashboard_professor')]) for papel in benchmark.PAPEIS
+            ]
+            resultado = benchmark.carga_remota(
+                options['url'].rstrip('/'), sessoes, options['concorrencia'], options['repeticoes'],
+            )
+        elif options['servidores']:
+            resultado = self.executar_local(volume, options, servidores=True)
+        else:
+            resultado = self.executar_local(volume, options)
+
+        self.relatar(resultado)
+        if options['saida']:
+            benchmark.salvar(resultado, options['saida'])
+        if base:
+            regressoes = benchmark.comparar(resultado, base, options['tolerancia'])
+            if regressoes:
+                raise CommandError('Regressões em relação à baseline:\n' + '\n'.join(regressoes))
+            self.stdout.write(self.style.SUCCESS('Sem regressões em relação à baseline.'))
+
+    def executar_local(self, volume, options, servidores=False):
+        # Base de teste descartável: os dados gerados nunca tocam db.sqlite3.
+        setup_test_environment()
+        if options['banco_arquivo']:
+            from django.db import connections
+
+            connections['default'].settings_dict['TEST']['NAME'] = options['banco_arquivo']
+        configuracao = setup_databases(verbosity=0, interactive=False)
+        try:
+            if servidores:
+                usuarios = benchmark.gerar_dados(**volume)
+                return {
+                    'meta': {**volume, 'concorrencia': options['concorrencia'], 'repeticoes': options['repeticoes']},
+                    'cenarios': benchmark.comparar_servidores(usuarios, options['concorrencia'], options['repeticoes']),
+                }
+            return benchmark.executar(options['repeticoes'], **volume)
+        finally:
+            teardown_databases(configuracao, verbosity=0)
+            teardown_test_environment()
+
+    def relatar(self, resultado):
+        self.stdout.write(
+            f"{'cenário':<28}{'p50 ms':>9}{'p95 ms':>9}{'consultas':>11}{'escritas':>10}{'req/s':>9}{'erros':>7}"
+        )
+        for nome, medida in resultado['cenarios'].items():
+            self.stdout.write(
+                f"{nome:<28}{medida['p50_ms']:>9}{medida['p95_ms']:>9}"
+                f"{medida.get('consultas', '-'):>11}{medida.get('linhas_escritas', '-'):>10}"
+                f"{medida.get('requisicoes_por_s', '-'):>9}{medida['erros']:>7}"
+            )
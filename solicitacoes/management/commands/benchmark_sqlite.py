@@ -0,0 +1,145 @@
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+ESQUEMA = [
+    '''CREATE TABLE solicitacao (
+        id INTEGER PRIMARY KEY,
+        aluno_id INTEGER NOT NULL,
+        etapa TEXT NOT NULL,
+        motivo TEXT NOT NULL,
+        data REAL NOT NULL
+    )''',
+    'CREATE INDEX solicitacao_aluno_idx ON solicitacao (aluno_id, data)',
+    'CREATE INDEX solicitacao_etapa_idx ON solicitacao (etapa, data)',
+    'CREATE TABLE sessao (chave INTEGER PRIMARY KEY, dados TEXT, expira REAL)',
+]
+ETAPAS = ['coordenador', 'secretaria', 'professor', 'concluida']
+ALUNOS = 200
+
+
+def perfis():
+    opcoes = settings.DATABASES['default'].get('OPTIONS', {})
+    return {
+        # Configuração anterior: journal DELETE, synchronous FULL, busy timeout
+        # padrão do Django (5s) e transações DEFERRED.
+        'padrao': {'pragmas': [], 'timeout': 5, 'begin': 'BEGIN'},
+        'producao': {
+            'pragmas': [p.strip() for p in opcoes.get('init_command', '').split(';') if p.strip()],
+            'timeout': opcoes.get('timeout', 5),
+            'begin': f"BEGIN {opcoes.get('transaction_mode', 'DEFERRED')}",
+        },
+    }
+
+
+def preparar(caminho, linhas):
+    conexao = sqlite3.connect(caminho, isolation_level=None)
+    for comando in ESQUEMA:
+        conexao.execute(comando)
+    agora = time.time()
+    conexao.execute('BEGIN')
+    conexao.executemany(
+        'INSERT INTO solicitacao (aluno_id, etapa, motivo, data) VALUES (?, ?, ?, ?)',
+        [(i % ALUNOS, ETAPAS[i % len(ETAPAS)], f'Motivo {i}', agora - i) for i in range(linhas)],
+    )
+    conexao.execute('COMMIT')
+    conexao.close()
+
+
+def conectar(caminho, perfil):
+    conexao = sqlite3.connect(caminho, timeout=perfil['timeout'], isolation_level=None, check_same_thread=False)
+    for pragma in perfil['pragmas']:
+        conexao.execute(pragma).fetchall()
+    return conexao
+
+
+def trabalhador(caminho, perfil, fim, proporcao_escrita, resultado, trava):
+    conexao = conectar(caminho, perfil)
+    aleatorio = random.Random()
+    leituras = escritas = erros = 0
+    latencias = []
+    while time.monotonic() < fim:
+        inicio = time.monotonic()
+        try:
+            if aleatorio.random() < proporcao_escrita:
+                # Como uma visita a dashboard que grava: lê e depois escreve
+                # na mesma transação (sessão, notificações, decisão).
+                conexao.execute(perfil['begin'])
+                linha = conexao.execute(
+                    "SELECT id FROM solicitacao WHERE etapa = 'coordenador' ORDER BY data LIMIT 1"
+                ).fetchone()
+                conexao.execute(
+                    'INSERT OR REPLACE INTO sessao (chave, dados, expira) VALUES (?, ?, ?)',
+                    (aleatorio.randrange(1000), 'x' * 200, time.time()),
+                )
+                if linha:
+                    conexao.execute('UPDATE solicitacao SET data = ? WHERE id = ?', (time.time(), linha[0]))
+                conexao.execute('COMMIT')
+                escritas += 1
+            else:
+                conexao.execute(
+                    'SELECT id, motivo, etapa FROM solicitacao WHERE aluno_id = ? ORDER BY data DESC LIMIT 20',
+                    (aleatorio.randrange(ALUNOS),),
+                ).fetchall()
+                leituras += 1
+            latencias.append(time.monotonic() - inicio)
+        except sqlite3.OperationalError:
+            erros += 1
+            if conexao.in_transaction:
+                conexao.execute('ROLLBACK')
+    conexao.close()
+    with trava:
+        resultado['leituras'] += leituras
+        resultado['escritas'] += escritas
+        resultado['erros'] += erros
+        resultado['latencias'].extend(latencias)
+
+
+class Command(BaseCommand):
+    help = 'Compara a vazão do SQLite com a configuração padrão e com o perfil de produção'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help='Conexões simultâneas')
+        parser.add_argument('--duracao', type=float, default=5.0, help='Segundos de carga por perfil')
+        parser.add_argument('--escrita', type=float, default=0.2, help='Fração das operações que escrevem')
+        parser.add_argument('--linhas', type=int, default=20000, help='Solicitações geradas no banco de teste')
+        parser.add_argument('--diretorio', default=None, help='Onde criar os bancos temporários (use o mesmo disco da produção)')
+
+    def handle(self, *args, **options):
+        for nome, perfil in perfis().items():
+            with tempfile.TemporaryDirectory(dir=options['diretorio']) as diretorio:
+                caminho = os.path.join(diretorio, 'benchmark.sqlite3')
+                preparar(caminho, options['linhas'])
+                # O journal_mode persiste no arquivo; aplica antes da carga.
+                conectar(caminho, perfil).close()
+
+                resultado = {'leituras': 0, 'escritas': 0, 'erros': 0, 'latencias': []}
+                trava = threading.Lock()
+                fim = time.monotonic() + options['duracao']
+                threads = [
+                    threading.Thread(
+                        target=trabalhador,
+                        args=(caminho, perfil, fim, options['escrita'], resultado, trava),
+                    )
+                    for _ in range(options['threads'])
+                ]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+
+            latencias = sorted(resultado['latencias']) or [0]
+            total = resultado['leituras'] + resultado['escritas']
+            self.stdout.write(
+                f"{nome:>9}: {total / options['duracao']:8.0f} ops/s "
+                f"(leituras {resultado['leituras']}, escritas {resultado['escritas']}, "
+                f"erros de bloqueio {resultado['erros']}) "
+                f"p50 {latencias[len(latencias) // 2] * 1000:.2f}ms "
+                f"p95 {latencias[int(len(latencias) * 0.95)] * 1000:.2f}ms"
+            )
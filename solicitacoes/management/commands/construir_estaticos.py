@@ -0,0 +1,56 @@
+import subprocess
+
+from django.core.management.base import BaseCommand, CommandError
+
+from solicitacoes import estaticos
+
+
+class Command(BaseCommand):
+    help = (
+        'Gera em solicitacoes/static o CSS do Tailwind e a fonte de ícones com apenas o que os templates '
+        'usam. Rode de novo ao mudar classes ou ícones e, em produção, siga com collectstatic.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tailwind',
+            default=estaticos.TAILWIND,
+            help=f'Executável standalone do Tailwind CSS v{estaticos.TAILWIND_VERSAO}; '
+                 'padrão: $TAILWINDCSS ou tailwindcss no PATH',
+        )
+        parser.add_argument(
+            '--fontawesome',
+            help='Diretório do Font Awesome Free (com metadata/ e webfonts/); '
+                 'padrão: o do pacote fontawesomefree, se instalado',
+        )
+        parser.add_argument('--sem-icones', action='store_true', help='Regera só o CSS do Tailwind')
+
+    def handle(self, *args, **options):
+        try:
+            tamanho = estaticos.construir_css(executavel=options['tailwind'])
+        except FileNotFoundError:
+            raise CommandError(
+                f'CLI do Tailwind não encontrado ({options["tailwind"]}): instale-o com '
+                'pip install -r requirements-estaticos.txt ou use --tailwind / TAILWINDCSS.'
+            )
+        except ValueError as erro:
+            raise CommandError(str(erro))
+        except subprocess.CalledProcessError as erro:
+            raise CommandError(f'O Tailwind falhou: {erro.stderr.strip()}')
+        self.stdout.write(f'{estaticos.DESTINO_CSS.name}: {tamanho} bytes')
+
+        if options['sem_icones']:
+            return
+        origem = options['fontawesome'] or estaticos.fontawesome_instalado()
+        if not origem:
+            raise CommandError('Font Awesome Free não encontrado: instale fontawesomefree ou use --fontawesome.')
+        nomes = estaticos.icones_usados(estaticos.classes_usadas())
+        try:
+            css_icones, fonte, ausentes = estaticos.construir_icones(origem, nomes)
+        except ImportError as erro:
+            raise CommandError(f'A fonte de ícones precisa de fonttools e brotli: {erro}')
+        estaticos.gravar(estaticos.DESTINO_ICONES, css_icones.encode())
+        estaticos.gravar(estaticos.DESTINO_FONTE, fonte)
+        self.stdout.write(f'{estaticos.DESTINO_FONTE.name}: {len(nomes) - len(ausentes)} ícone(s), {len(fonte)} bytes')
+        if ausentes:
+            self.stderr.write(self.style.WARNING(f'Sem ícone solid correspondente: {", ".join(ausentes)}'))
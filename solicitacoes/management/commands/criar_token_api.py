@@ -0,0 +1,25 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from solicitacoes.models import TokenApi
+
+
+class Command(BaseCommand):
+    help = 'Cria um token de acesso à API para o usuário, ou revoga os tokens dele'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('--nome', default='', help='Identificação do cliente (ex.: aplicativo móvel)')
+        parser.add_argument('--revogar', action='store_true', help='Apaga todos os tokens do usuário')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f'Usuário "{options["username"]}" não encontrado.')
+        if options['revogar']:
+            total, _ = TokenApi.objects.filter(user=user).delete()
+            self.stdout.write(self.style.SUCCESS(f'Tokens revogados: {total}'))
+            return
+        # Mostrado só agora: o banco guarda apenas o resumo.
+        self.stdout.write(TokenApi.gerar(user, options['nome']))
@@ -0,0 +1,155 @@
+import os
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from solicitacoes.armazenamento import PREFIXO, armazenamento, calcular_sha256
+from solicitacoes.models import ArquivoArmazenado, Solicitacao, SolicitacaoArquivada, UploadParcial
+
+# Arquivos mais novos que isso podem pertencer a um envio em andamento.
+IDADE_MINIMA_ORFAO = 60 * 60
+
+
+class Command(BaseCommand):
+    help = 'Move os anexos existentes para o armazenamento por SHA-256 e remove blobs órfãos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Apenas informa o que seria migrado ou removido',
+        )
+        parser.add_argument(
+            '--sem-migrar',
+            action='store_true',
+            help='Executa somente a coleta de órfãos',
+        )
+
+    def handle(self, *args, **options):
+        self.dry_run = options['dry_run']
+        if not options['sem_migrar']:
+            self.migrar()
+        self.coletar()
+
+    def migrar(self):
+        pendentes = (
+            Solicitacao.objects.exclude(arquivo='').exclude(arquivo__isnull=True)
+            .exclude(arquivo__startswith=f'{PREFIXO}/')
+            .order_by('id').only('id', 'arquivo', 'arquivo_nome')
+        )
+        migrados = {}
+        vistos = {}
+        economizados = 0
+        for solicitacao in pendentes.iterator():
+            antigo = solicitacao.arquivo.name
+            caminho = armazenamento.path(antigo)
+            if antigo in migrados:
+                novo = migrados[antigo]
+                if not self.dry_run:
+                    armazenamento.adicionar_referencia(novo)
+            elif not os.path.exists(caminho):
+                self.stderr.write(f'Solicitação {solicitacao.id}: arquivo ausente ({antigo}).')
+                continue
+            elif self.dry_run:
+                with open(caminho, 'rb') as arquivo:
+                    sha256 = calcular_sha256(arquivo)
+                if sha256 in vistos:
+                    economizados += os.path.getsize(caminho)
+                novo = vistos.setdefault(sha256, antigo)
+            else:
+                tamanho = os.path.getsize(caminho)
+                novo = armazenamento.incorporar(caminho, antigo)
+                if ArquivoArmazenado.objects.filter(nome=novo, referencias__gt=1).exists():
+                    economizados += tamanho
+            migrados[antigo] = novo
+
+            if not self.dry_run:
+                Solicitacao.objects.filter(pk=solicitacao.pk).update(
+                    arquivo=novo,
+                    arquivo_nome=solicitacao.arquivo_nome or os.path.basename(antigo),
+                )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Anexos migrados: {len(migrados)} (bytes economizados com duplicatas: {economizados})'
+        ))
+
+    def coletar(self):
+        removidos = self.recontar_referencias()
+        removidos += self.remover_arquivos_orfaos()
+        verbo = 'seriam removidos' if self.dry_run else 'removidos'
+        self.stdout.write(self.style.SUCCESS(f'Arquivos órfãos {verbo}: {removidos}'))
+
+    def recontar_referencias(self):
+        removidos = 0
+        apagar = []
+        # A transação (IMMEDIATE no SQLite) trava a escrita antes da contagem:
+        # nenhum envio ou solicitação novo muda as referências no meio dela.
+        with transaction.atomic():
+            usados = {
+                linha['arquivo']: linha['total']
+                for linha in Solicitacao.objects.filter(arquivo__startswith=f'{PREFIXO}/')
+                .values('arquivo').annotate(total=Count('id')).order_by()
+            }
+            for nome in UploadParcial.objects.values_list('nome', flat=True):
+                usados[nome] = usados.get(nome, 0) + 1
+
+            # Blobs recentes podem ter sido referenciados por um envio cuja
+            # solicitação ainda não foi gravada.
+            limite = timezone.now() - timedelta(seconds=IDADE_MINIMA_ORFAO)
+            blobs = list(ArquivoArmazenado.objects.select_for_update().filter(criado_em__lte=limite))
+            corrigidos = []
+            for blob in blobs:
+                referencias = usados.get(blob.nome, 0)
+                if referencias == 0:
+                    removidos += 1
+                    if not self.dry_run:
+                        blob.delete()
+                        apagar.append(blob.nome)
+                elif referencias != blob.referencias:
+                    blob.referencias = referencias
+                    corrigidos.append(blob)
+            if corrigidos and not self.dry_run:
+                ArquivoArmazenado.objects.bulk_update(corrigidos, ['referencias'])
+
+            def apagar_arquivos():
+                # O disco só muda depois que a remoção das linhas foi gravada.
+                for nome in apagar:
+                    armazenamento.delete(nome)
+            transaction.on_commit(apagar_arquivos)
+        if corrigidos:
+            self.stdout.write(f'Contagens de referência corrigidas: {len(corrigidos)}')
+        return removidos
+
+    def remover_arquivos_orfaos(self):
+        conhecidos = set(ArquivoArmazenado.objects.values_list('nome', flat=True))
+        conhecidos.update(UploadParcial.objects.values_list('nome', flat=True))
+        conhecidos.update(
+            nome
+            for modelo in (Solicitacao, SolicitacaoArquivada)
+            for linha in modelo.objects.values_list('arquivo', 'arquivo_miniatura')
+            for nome in linha
+            if nome
+        )
+
+        limite = time.time() - IDADE_MINIMA_ORFAO
+        removidos = 0
+        # Blobs (incluindo envios parciais) e o diretório antigo de upload_to.
+        for raiz in (PREFIXO, 'solicitacoes'):
+            diretorio = armazenamento.path(raiz)
+            for pasta, _, arquivos in os.walk(diretorio):
+                for arquivo in arquivos:
+                    caminho = os.path.join(pasta, arquivo)
+                    nome = os.path.relpath(caminho, armazenamento.location).replace(os.sep, '/')
+                    if nome in conhecidos or os.path.getmtime(caminho) > limite:
+                        continue
+                    conhecidos.add(nome)
+                    removidos += 1
+                    if self.dry_run:
+                        self.stdout.write(f'Órfão: {nome}')
+                    else:
+                        os.remove(caminho)
+        return removidos
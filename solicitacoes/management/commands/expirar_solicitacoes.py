@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from solicitacoes.expiracao import expirar_solicitacoes
+
+
+class Command(BaseCommand):
+    help = 'Rejeita as solicitações pendentes com prazo expirado'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--intervalo',
+            type=int,
+            default=0,
+            help='Repete a varredura a cada N segundos (0 executa uma única vez)',
+        )
+
+    def handle(self, *args, **options):
+        intervalo = options['intervalo']
+
+        while True:
+            total = expirar_solicitacoes()
+            self.stdout.write(self.style.SUCCESS(f'Solicitações expiradas: {total}'))
+            if intervalo <= 0:
+                break
+            time.sleep(intervalo)
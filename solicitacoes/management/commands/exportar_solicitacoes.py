@@ -0,0 +1,47 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from solicitacoes.exportacao import FORMATOS, gerar, limpar_filtros, processar_exportacoes
+
+
+class Command(BaseCommand):
+    help = 'Exporta solicitações em CSV ou XLSX, ou processa a fila de exportações pedidas no painel'
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo', nargs='?', default='-', help='Arquivo de saída ("-" para a saída padrão)')
+        parser.add_argument('--formato', choices=list(FORMATOS), default='csv')
+        parser.add_argument('--de', help='Solicitações feitas a partir de AAAA-MM-DD')
+        parser.add_argument('--ate', help='Solicitações feitas até AAAA-MM-DD (inclusive)')
+        parser.add_argument('--status', help='pendente, aprovada ou rejeitada')
+        parser.add_argument('--etapa', help='coordenador, secretaria, professor ou concluida')
+        parser.add_argument('--disciplina', help='Código da disciplina')
+        parser.add_argument(
+            '--fila',
+            action='store_true',
+            help='Processa as exportações em segundo plano pedidas no painel em vez de exportar',
+        )
+
+    def handle(self, *args, **options):
+        if options['fila']:
+            while (exportacao := processar_exportacoes()) is not None:
+                self.stdout.write(f'Exportação {exportacao.id}: {exportacao.get_status_display()}')
+            return
+
+        try:
+            filtros = limpar_filtros(options)
+        except ValueError as erro:
+            raise CommandError(erro)
+        if options['arquivo'] == '-':
+            destino = sys.stdout.buffer
+        else:
+            try:
+                destino = open(options['arquivo'], 'wb')
+            except OSError as erro:
+                raise CommandError(f'Não foi possível criar {options["arquivo"]}: {erro}')
+        try:
+            for bloco in gerar(options['formato'], filtros):
+                destino.write(bloco)
+        finally:
+            if destino is not sys.stdout.buffer:
+                destino.close()
@@ -1,49 +1,129 @@
-from django.core.management.base import BaseCommand
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from solicitacoes.benchmark import ContadorConsultas
+from solicitacoes.importacao import TAMANHO_LOTE, detectar_formato, importar_disciplinas, ler_registros
 from solicitacoes.models import Disciplina
 
+DISCIPLINAS_PADRAO = [
+    {'codigo': 'ALG001', 'nome': 'Algoritmos e Estruturas de Dados I', 'descricao': 'Introdução a algoritmos e estruturas de dados básicas'},
+    {'codigo': 'ALG002', 'nome': 'Algoritmos e Estruturas de Dados II', 'descricao': 'Estruturas de dados avançadas e algoritmos de ordenação'},
+    {'codigo': 'WEB001', 'nome': 'Desenvolvimento Web I', 'descricao': 'HTML, CSS, JavaScript básico'},
+    {'codigo': 'WEB002', 'nome': 'Desenvolvimento Web II', 'descricao': 'Frameworks frontend e backend'},
+    {'codigo': 'BD001', 'nome': 'Banco de Dados I', 'descricao': 'Modelagem e SQL básico'},
+    {'codigo': 'BD002', 'nome': 'Banco de Dados II', 'descricao': 'Administração e otimização de bancos de dados'},
+    {'codigo': 'JAVA001', 'nome': 'Programação Java I', 'descricao': 'Fundamentos da linguagem Java'},
+    {'codigo': 'JAVA002', 'nome': 'Programação Java II', 'descricao': 'Java avançado e frameworks'},
+    {'codigo': 'PY001', 'nome': 'Python para Iniciantes', 'descricao': 'Introdução à programação com Python'},
+    {'codigo': 'PY002', 'nome': 'Python Avançado', 'descricao': 'Programação avançada em Python'},
+    {'codigo': 'SO001', 'nome': 'Sistemas Operacionais', 'descricao': 'Conceitos de sistemas operacionais'},
+    {'codigo': 'REDE001', 'nome': 'Redes de Computadores', 'descricao': 'Fundamentos de redes e protocolos'},
+    {'codigo': 'SEC001', 'nome': 'Segurança da Informação', 'descricao': 'Princípios de segurança cibernética'},
+    {'codigo': 'MOBILE001', 'nome': 'Desenvolvimento Mobile', 'descricao': 'Criação de aplicativos móveis'},
+    {'codigo': 'IA001', 'nome': 'Inteligência Artificial', 'descricao': 'Introdução à IA e machine learning'},
+    {'codigo': 'DEVOPS001', 'nome': 'DevOps e Cloud', 'descricao': 'Práticas DevOps e computação em nuvem'},
+    {'codigo': 'PROJ001', 'nome': 'Gerenciamento de Projetos', 'descricao': 'Metodologias ágeis e gestão de projetos'},
+    {'codigo': 'UX001', 'nome': 'UX/UI Design', 'descricao': 'Design de experiência do usuário'},
+    {'codigo': 'TEST001', 'nome': 'Testes de Software', 'descricao': 'Técnicas de teste e qualidade de software'},
+    {'codigo': 'API001', 'nome': 'Desenvolvimento de APIs', 'descricao': 'REST, GraphQL e microserviços'},
+]
+
+
 class Command(BaseCommand):
-    help = 'Popula o banco com disciplinas de TI'
-    
+    help = 'Importa disciplinas de um CSV/JSON (ou as disciplinas de TI padrão) com upsert em lote'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'arquivo',
+            nargs='?',
+            help='CSV (codigo,nome,descricao,ativo) ou JSON/JSON Lines; use - para stdin',
+        )
+        parser.add_argument('--formato', choices=['csv', 'json'], help='Formato do arquivo (padrão: pela extensão)')
+        parser.add_argument('--lote', type=int, default=TAMANHO_LOTE, help='Registros por upsert')
+        parser.add_argument(
+            '--desativar-ausentes',
+            action='store_true',
+            help='Desativa as disciplinas ativas cujo código não aparece no arquivo',
+        )
+        parser.add_argument(
+            '--atualizar',
+            action='store_true',
+            help='Atualiza nome, descrição e situação das disciplinas já cadastradas (padrão: só cria as novas)',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Calcula as contagens sem gravar nada')
+        parser.add_argument(
+            '--benchmark',
+            type=int,
+            metavar='N',
+            help='Mede a importação de N disciplinas geradas contra get_or_create (nada é gravado)',
+        )
+
     def handle(self, *args, **options):
-        disciplinas = [
-            {'codigo': 'ALG001', 'nome': 'Algoritmos e Estruturas de Dados I', 'descricao': 'Introdução a algoritmos e estruturas de dados básicas'},
-            {'codigo': 'ALG002', 'nome': 'Algoritmos e Estruturas de Dados II', 'descricao': 'Estruturas de dados avançadas e algoritmos de ordenação'},
-            {'codigo': 'WEB001', 'nome': 'Desenvolvimento Web I', 'descricao': 'HTML, CSS, JavaScript básico'},
-            {'codigo': 'WEB002', 'nome': 'Desenvolvimento Web II', 'descricao': 'Frameworks frontend e backend'},
-            {'codigo': 'BD001', 'nome': 'Banco de Dados I', 'descricao': 'Modelagem e SQL básico'},
-            {'codigo': 'BD002', 'nome': 'Banco de Dados II', 'descricao': 'Administração e otimização de bancos de dados'},
-            {'codigo': 'JAVA001', 'nome': 'Programação Java I', 'descricao': 'Fundamentos da linguagem Java'},
-            {'codigo': 'JAVA002', 'nome': 'Programação Java II', 'descricao': 'Java avançado e frameworks'},
-            {'codigo': 'PY001', 'nome': 'Python para Iniciantes', 'descricao': 'Introdução à programação com Python'},
-            {'codigo': 'PY002', 'nome': 'Python Avançado', 'descricao': 'Programação avançada em Python'},
-            {'codigo': 'SO001', 'nome': 'Sistemas Operacionais', 'descricao': 'Conceitos de sistemas operacionais'},
-            {'codigo': 'REDE001', 'nome': 'Redes de Computadores', 'descricao': 'Fundamentos de redes e protocolos'},
-            {'codigo': 'SEC001', 'nome': 'Segurança da Informação', 'descricao': 'Princípios de segurança cibernética'},
-            {'codigo': 'MOBILE001', 'nome': 'Desenvolvimento Mobile', 'descricao': 'Criação de aplicativos móveis'},
-            {'codigo': 'IA001', 'nome': 'Inteligência Artificial', 'descricao': 'Introdução à IA e machine learning'},
-            {'codigo': 'DEVOPS001', 'nome': 'DevOps e Cloud', 'descricao': 'Práticas DevOps e computação em nuvem'},
-            {'codigo': 'PROJ001', 'nome': 'Gerenciamento de Projetos', 'descricao': 'Metodologias ágeis e gestão de projetos'},
-            {'codigo': 'UX001', 'nome': 'UX/UI Design', 'descricao': 'Design de experiência do usuário'},
-            {'codigo': 'TEST001', 'nome': 'Testes de Software', 'descricao': 'Técnicas de teste e qualidade de software'},
-            {'codigo': 'API001', 'nome': 'Desenvolvimento de APIs', 'descricao': 'REST, GraphQL e microserviços'},
-        ]
-        
-        for disc_data in disciplinas:
-            disciplina, created = Disciplina.objects.get_or_create(
-                codigo=disc_data['codigo'],
-                defaults={
-                    'nome': disc_data['nome'],
-                    'descricao': disc_data['descricao'],
-                    'ativo': True
-                }
-            )
-            if created:
-                self.stdout.write(
-                    self.style.SUCCESS(f'Disciplina criada: {disciplina.codigo} - {disciplina.nome}')
-                )
-            else:
+        if options['benchmark']:
+            return self.benchmark(options['benchmark'], options['lote'])
+
+        opcoes = {
+            'tamanho_lote': options['lote'],
+            'desativar_ausentes': options['desativar_ausentes'],
+            'dry_run': options['dry_run'],
+            'atualizar': options['atualizar'],
+        }
+        if not options['arquivo']:
+            resultado = importar_disciplinas(iter(DISCIPLINAS_PADRAO), **opcoes)
+        elif options['arquivo'] == '-':
+            resultado = importar_disciplinas(ler_registros(sys.stdin, options['formato'] or 'csv'), **opcoes)
+        else:
+            formato = options['formato'] or detectar_formato(options['arquivo'])
+            try:
+                arquivo = open(options['arquivo'], encoding='utf-8-sig', newline='')
+            except OSError as erro:
+                raise CommandError(f'Não foi possível abrir {options["arquivo"]}: {erro}')
+            with arquivo:
+                resultado = importar_disciplinas(ler_registros(arquivo, formato), **opcoes)
+
+        for erro in resultado['erros']:
+            self.stderr.write(self.style.WARNING(erro))
+        prefixo = '[dry-run] ' if options['dry_run'] else ''
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefixo}Disciplinas criadas: {resultado['criadas']}, atualizadas: {resultado['atualizadas']}, "
+            f"inalteradas: {resultado['inalteradas']}, mantidas: {resultado['mantidas']}, "
+            f"desativadas: {resultado['desativadas']}, inválidas: {resultado['invalidas']}"
+        ))
+
+    def benchmark(self, quantidade, lote):
+        def gerar(sufixo=''):
+            for i in range(quantidade):
+                yield {'codigo': f'B{i:07}', 'nome': f'Disciplina {i}{sufixo}', 'descricao': 'Gerada pelo benchmark'}
+
+        self.stdout.write(f'Importando {quantidade} disciplinas (tudo é desfeito ao final)...')
+        with transaction.atomic():
+            for etapa, sufixo in (('inserção', ''), ('atualização', ' (rev. 2)'), ('sem mudanças', ' (rev. 2)')):
+                contador = ContadorConsultas()
+                with connection.execute_wrapper(contador):
+                    inicio = time.perf_counter()
+                    resultado = importar_disciplinas(gerar(sufixo), lote, atualizar=True)
+                    duracao = time.perf_counter() - inicio
                 self.stdout.write(
-                    self.style.WARNING(f'Disciplina já existe: {disciplina.codigo}')
+                    f'  upsert em lote, {etapa}: {duracao:.2f}s ({quantidade / duracao:,.0f} linhas/s, '
+                    f"{contador.consultas} consultas; criadas {resultado['criadas']}, atualizadas {resultado['atualizadas']})"
                 )
-        
-        self.stdout.write(self.style.SUCCESS('Comando executado com sucesso!'))
\ No newline at end of file
+
+            # A abordagem anterior (get_or_create por linha) é medida numa amostra.
+            amostra = min(quantidade, 5000)
+            contador = ContadorConsultas()
+            with connection.execute_wrapper(contador):
+                inicio = time.perf_counter()
+                for i in range(amostra):
+                    Disciplina.objects.get_or_create(
+                        codigo=f'G{i:07}', defaults={'nome': f'Disciplina {i}', 'descricao': 'Gerada pelo benchmark'},
+                    )
+                duracao = time.perf_counter() - inicio
+            self.stdout.write(
+                f'  get_or_create por linha: {amostra / duracao:,.0f} linhas/s '
+                f'({contador.consultas / amostra:.1f} consultas por linha; estimativa para {quantidade}: '
+                f'{duracao * quantidade / amostra:.1f}s)'
+            )
+            transaction.set_rollback(True)
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from solicitacoes.arquivos import TAMANHO_LOTE, processar_arquivos
+
+
+class Command(BaseCommand):
+    help = 'Processa os arquivos comprobatórios enviados (tamanho, tipo, páginas e miniaturas)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=TAMANHO_LOTE,
+            help='Quantidade de arquivos lidos por consulta',
+        )
+        parser.add_argument(
+            '--intervalo',
+            type=int,
+            default=0,
+            help='Repete o processamento a cada N segundos (0 executa uma única vez)',
+        )
+
+    def handle(self, *args, **options):
+        intervalo = options['intervalo']
+
+        while True:
+            processados, removidos = processar_arquivos(options['lote'])
+            self.stdout.write(self.style.SUCCESS(
+                f'Arquivos processados: {processados} (envios parciais descartados: {removidos})'
+            ))
+            if intervalo <= 0:
+                break
+            time.sleep(intervalo)
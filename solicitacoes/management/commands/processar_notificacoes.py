@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from solicitacoes.notificacoes import TAMANHO_LOTE, processar_notificacoes
+
+
+class Command(BaseCommand):
+    help = 'Entrega as notificações pendentes (internas e por e-mail) em lotes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=TAMANHO_LOTE,
+            help='Quantidade de eventos processados por transação',
+        )
+        parser.add_argument(
+            '--intervalo',
+            type=int,
+            default=0,
+            help='Repete a entrega a cada N segundos (0 executa uma única vez)',
+        )
+        parser.add_argument(
+            '--sem-email',
+            action='store_true',
+            help='Cria apenas as notificações internas, sem enviar e-mails',
+        )
+
+    def handle(self, *args, **options):
+        intervalo = options['intervalo']
+        enviar_email = None if not options['sem_email'] else False
+
+        while True:
+            entregues, enviados = processar_notificacoes(options['lote'], enviar_email)
+            self.stdout.write(self.style.SUCCESS(
+                f'Notificações entregues: {entregues} (e-mails enviados: {enviados})'
+            ))
+            if intervalo <= 0:
+                break
+            time.sleep(intervalo)
@@ -0,0 +1,63 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from solicitacoes.provisionamento import TAMANHO_LOTE, processar_importacoes, provisionar_arquivo
+
+
+class Command(BaseCommand):
+    help = 'Cria usuários e perfis em lote a partir de uma exportação de matrículas (CSV ou JSON)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'arquivo',
+            nargs='?',
+            help='CSV/JSON com matricula, username, nome, sobrenome, email, tipo e senha (opcionais, exceto matricula ou username)',
+        )
+        parser.add_argument('--formato', choices=['csv', 'json'], help='Formato do arquivo (padrão: pela extensão)')
+        parser.add_argument('--lote', type=int, default=TAMANHO_LOTE, help='Usuários gravados por transação')
+        parser.add_argument(
+            '--processos',
+            type=int,
+            default=None,
+            help='Processos que calculam os hashes de senha (padrão: um por CPU; 0 calcula no próprio processo)',
+        )
+        parser.add_argument(
+            '--senha-matricula',
+            action='store_true',
+            help='Usa a matrícula como senha inicial quando o arquivo não traz senha',
+        )
+        parser.add_argument(
+            '--fila',
+            action='store_true',
+            help='Processa as importações enviadas pela equipe em vez de um arquivo',
+        )
+
+    def handle(self, *args, **options):
+        if options['fila']:
+            while (importacao := processar_importacoes()) is not None:
+                self.stdout.write(f'Importação {importacao.id}: {importacao.get_status_display()}')
+            return
+        if not options['arquivo']:
+            raise CommandError('Informe o arquivo ou use --fila.')
+
+        inicio = time.perf_counter()
+        try:
+            resultado = provisionar_arquivo(
+                options['arquivo'],
+                options['formato'],
+                tamanho_lote=options['lote'],
+                processos=options['processos'],
+                senha_matricula=options['senha_matricula'],
+            )
+        except OSError as erro:
+            raise CommandError(f'Não foi possível abrir {options["arquivo"]}: {erro}')
+        duracao = time.perf_counter() - inicio
+
+        for erro in resultado['erros']:
+            self.stderr.write(self.style.WARNING(erro))
+        self.stdout.write(self.style.SUCCESS(
+            f"Usuários criados: {resultado['criados']}, já existentes: {resultado['existentes']}, "
+            f"repetidos no arquivo: {resultado['duplicados']}, inválidos: {resultado['invalidos']}, "
+            f"falhas: {resultado['falhas']} ({duracao:.1f}s)"
+        ))
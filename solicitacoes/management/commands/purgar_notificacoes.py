@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from solicitacoes.notificacoes import TAMANHO_LOTE_PURGA, purgar_notificacoes, recontar_nao_lidas
+
+
+class Command(BaseCommand):
+    help = 'Apaga as notificações mais antigas que o período de retenção'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dias',
+            type=int,
+            default=settings.NOTIFICACOES_RETENCAO_DIAS,
+            help='Apaga as notificações criadas há mais de N dias',
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=TAMANHO_LOTE_PURGA,
+            help='Notificações apagadas por transação',
+        )
+        parser.add_argument(
+            '--recontar',
+            action='store_true',
+            help='Refaz os contadores de não lidas dos perfis a partir da tabela',
+        )
+
+    def handle(self, *args, **options):
+        total = sum(purgar_notificacoes(options['dias'], options['lote']))
+        self.stdout.write(self.style.SUCCESS(f'Notificações apagadas: {total}'))
+        if options['recontar']:
+            perfis = recontar_nao_lidas()
+            self.stdout.write(self.style.SUCCESS(f'Perfis com notificações não lidas: {perfis}'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from solicitacoes.estatisticas import recalcular
+
+
+class Command(BaseCommand):
+    help = 'Refaz as tabelas de estatísticas (filas e decisões) a partir das solicitações'
+
+    def handle(self, *args, **options):
+        pendentes, decisoes = recalcular()
+        self.stdout.write(self.style.SUCCESS(
+            f'Estatísticas recalculadas: {pendentes} solicitação(ões) pendente(s), {decisoes} decisão(ões)'
+        ))
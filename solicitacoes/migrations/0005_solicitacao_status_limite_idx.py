@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:53
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('solicitacoes', '0004_solicitacao_coordenador_data_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='solicitacao',
+            index=models.Index(fields=['status', 'data_limite'], name='solicitacao_status_limite_idx'),
+        ),
+    ]
@@ -0,0 +1,103 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:54
+
+from django.conf import settings
+from django.db import migrations, models
+
+SQLITE_INDICE_TEXTO = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS solicitacoes_solicitacao_fts USING fts5(
+        motivo, disciplina, tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS solicitacoes_solicitacao_fts_ai
+    AFTER INSERT ON solicitacoes_solicitacao BEGIN
+        INSERT INTO solicitacoes_solicitacao_fts (rowid, motivo, disciplina)
+        SELECT new.id, new.motivo, nome FROM solicitacoes_disciplina WHERE id = new.disciplina_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS solicitacoes_solicitacao_fts_au
+    AFTER UPDATE OF motivo, disciplina_id ON solicitacoes_solicitacao BEGIN
+        DELETE FROM solicitacoes_solicitacao_fts WHERE rowid = old.id;
+        INSERT INTO solicitacoes_solicitacao_fts (rowid, motivo, disciplina)
+        SELECT new.id, new.motivo, nome FROM solicitacoes_disciplina WHERE id = new.disciplina_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS solicitacoes_solicitacao_fts_ad
+    AFTER DELETE ON solicitacoes_solicitacao BEGIN
+        DELETE FROM solicitacoes_solicitacao_fts WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS solicitacoes_disciplina_fts_au
+    AFTER UPDATE OF nome ON solicitacoes_disciplina BEGIN
+        UPDATE solicitacoes_solicitacao_fts SET disciplina = new.nome
+        WHERE rowid IN (SELECT id FROM solicitacoes_solicitacao WHERE disciplina_id = new.id);
+    END
+    """,
+    'DELETE FROM solicitacoes_solicitacao_fts',
+    """
+    INSERT INTO solicitacoes_solicitacao_fts (rowid, motivo, disciplina)
+    SELECT s.id, s.motivo, d.nome
+    FROM solicitacoes_solicitacao s
+    JOIN solicitacoes_disciplina d ON d.id = s.disciplina_id
+    """,
+]
+
+SQLITE_REMOVER_INDICE_TEXTO = [
+    'DROP TRIGGER IF EXISTS solicitacoes_disciplina_fts_au',
+    'DROP TRIGGER IF EXISTS solicitacoes_solicitacao_fts_ad',
+    'DROP TRIGGER IF EXISTS solicitacoes_solicitacao_fts_au',
+    'DROP TRIGGER IF EXISTS solicitacoes_solicitacao_fts_ai',
+    'DROP TABLE IF EXISTS solicitacoes_solicitacao_fts',
+]
+
+POSTGRES_INDICE_TEXTO = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX IF NOT EXISTS solicitacao_motivo_trgm ON solicitacoes_solicitacao USING gin (motivo gin_trgm_ops)',
+    'CREATE INDEX IF NOT EXISTS disciplina_nome_trgm ON solicitacoes_disciplina USING gin (nome gin_trgm_ops)',
+]
+
+POSTGRES_REMOVER_INDICE_TEXTO = [
+    'DROP INDEX IF EXISTS disciplina_nome_trgm',
+    'DROP INDEX IF EXISTS solicitacao_motivo_trgm',
+]
+
+
+def _executar(schema_editor, comandos):
+    for sql in comandos:
+        schema_editor.execute(sql)
+
+
+def criar_indice_texto(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        _executar(schema_editor, SQLITE_INDICE_TEXTO)
+    elif vendor == 'postgresql':
+        _executar(schema_editor, POSTGRES_INDICE_TEXTO)
+
+
+def remover_indice_texto(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        _executar(schema_editor, SQLITE_REMOVER_INDICE_TEXTO)
+    elif vendor == 'postgresql':
+        _executar(schema_editor, POSTGRES_REMOVER_INDICE_TEXTO)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('solicitacoes', '0005_solicitacao_status_limite_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='solicitacao',
+            index=models.Index(fields=['aluno', '-data_solicitacao', '-id'], name='solicitacao_aluno_data_idx'),
+        ),
+        migrations.RunPython(criar_indice_texto, remover_indice_texto),
+    ]
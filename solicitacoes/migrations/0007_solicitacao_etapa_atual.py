@@ -0,0 +1,65 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:56
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Case, Q, Value, When
+
+# Os gatilhos da busca (0006) impedem o SQLite de recriar a tabela no
+# AddField; a 0017 os recria e recarrega o índice.
+SQLITE_REMOVER_GATILHOS_TEXTO = [
+    'DROP TRIGGER IF EXISTS solicitacoes_disciplina_fts_au',
+    'DROP TRIGGER IF EXISTS solicitacoes_solicitacao_fts_ad',
+    'DROP TRIGGER IF EXISTS solicitacoes_solicitacao_fts_au',
+    'DROP TRIGGER IF EXISTS solicitacoes_solicitacao_fts_ai',
+]
+
+
+def remover_gatilhos_texto(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for sql in SQLITE_REMOVER_GATILHOS_TEXTO:
+            schema_editor.execute(sql)
+
+
+def preencher_etapa_atual(apps, schema_editor):
+    Solicitacao = apps.get_model('solicitacoes', 'Solicitacao')
+    Solicitacao.objects.update(etapa_atual=Case(
+        When(~Q(status='pendente'), then=Value('concluida')),
+        When(coordenador_status='pendente', then=Value('coordenador')),
+        When(coordenador_status='aprovada', secretaria_status='pendente', then=Value('secretaria')),
+        When(coordenador_status='aprovada', secretaria_status='aprovada', professor_status='pendente', then=Value('professor')),
+        default=Value('concluida'),
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('solicitacoes', '0006_busca_solicitacoes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(remover_gatilhos_texto, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name='solicitacao',
+            name='etapa_atual',
+            field=models.CharField(choices=[('coordenador', 'Coordenação'), ('secretaria', 'Secretaria'), ('professor', 'Professor'), ('concluida', 'Concluída')], default='coordenador', editable=False, max_length=12),
+        ),
+        migrations.RunPython(preencher_etapa_atual, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='solicitacao',
+            index=models.Index(fields=['etapa_atual', 'data_limite'], name='solicitacao_etapa_limite_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='solicitacao',
+            index=models.Index(fields=['coordenador_responsavel', '-data_solicitacao'], name='solicitacao_coord_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='solicitacao',
+            index=models.Index(fields=['secretaria_responsavel', '-data_solicitacao'], name='solicitacao_secr_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='solicitacao',
+            index=models.Index(fields=['professor_responsavel', '-data_solicitacao'], name='solicitacao_prof_data_idx'),
+        ),
+    ]
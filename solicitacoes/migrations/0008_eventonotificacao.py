@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('solicitacoes', '0007_solicitacao_etapa_atual'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventoNotificacao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mensagem', models.TextField()),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('solicitacao', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='solicitacoes.solicitacao')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:05
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+def marcar_arquivos_existentes(apps, schema_editor):
+    Solicitacao = apps.get_model('solicitacoes', 'Solicitacao')
+    Solicitacao.objects.exclude(arquivo='').exclude(arquivo__isnull=True).update(arquivo_pendente=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('solicitacoes', '0008_eventonotificacao'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadParcial',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('nome', models.CharField(max_length=255)),
+                ('nome_original', models.CharField(max_length=255)),
+                ('tipo', models.CharField(max_length=100)),
+                ('tamanho', models.PositiveBigIntegerField()),
+                ('recebido', models.PositiveBigIntegerField(default=0)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='solicitacao',
+            name='arquivo_miniatura',
+            field=models.FileField(blank=True, editable=False, null=True, upload_to='solicitacoes/miniaturas/%Y/%m/'),
+        ),
+        migrations.AddField(
+            model_name='solicitacao',
+            name='arquivo_paginas',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='solicitacao',
+            name='arquivo_pendente',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name='solicitacao',
+            name='arquivo_tamanho',
+            field=models.PositiveBigIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='solicitacao',
+            name='arquivo_tipo',
+            field=models.CharField(blank=True, editable=False, max_length=100),
+        ),
+        migrations.RunPython(marcar_arquivos_existentes, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='solicitacao',
+            index=models.Index(condition=models.Q(('arquivo_pendente', True)), fields=['id'], name='solicitacao_arquivo_pend_idx'),
+        ),
+        migrations.AddField(
+            model_name='uploadparcial',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:09
+
+import solicitacoes.armazenamento
+import os
+
+from django.db import migrations, models
+
+
+def preencher_arquivo_nome(apps, schema_editor):
+    Solicitacao = apps.get_model('solicitacoes', 'Solicitacao')
+    solicitacoes = list(Solicitacao.objects.exclude(arquivo='').exclude(arquivo__isnull=True).only('id', 'arquivo'))
+    for solicitacao in solicitacoes:
+        solicitacao.arquivo_nome = os.path.basename(solicitacao.arquivo.name)
+    Solicitacao.objects.bulk_update(solicitacoes, ['arquivo_nome'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('solicitacoes', '0009_arquivos_em_partes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArquivoArmazenado',
+            fields=[
+                ('sha256', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('nome', models.CharField(max_length=255, unique=True)),
+                ('tamanho', models.PositiveBigIntegerField()),
+                ('referencias', models.PositiveIntegerField(default=0)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='solicitacao',
+            name='arquivo_nome',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='solicitacao',
+            name='arquivo',
+            field=models.FileField(blank=True, help_text='Arquivo comprobatório (opcional)', null=True, storage=solicitacoes.armazenamento.obter_armazenamento, upload_to='solicitacoes/%Y/%m/'),
+        ),
+        migrations.RunPython(preencher_arquivo_nome, migrations.RunPython.noop),
+    ]
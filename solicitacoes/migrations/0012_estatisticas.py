@@ -0,0 +1,52 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def calcular_estatisticas(apps, schema_editor):
+    from solicitacoes.estatisticas import recalcular
+
+    recalcular(apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('solicitacoes', '0011_importacao_usuarios'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstatisticaDecisao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('etapa', models.CharField(max_length=12)),
+                ('faixa', models.PositiveSmallIntegerField(null=True)),
+                ('aprovadas', models.PositiveIntegerField(default=0)),
+                ('rejeitadas', models.PositiveIntegerField(default=0)),
+                ('segundos', models.FloatField(default=0)),
+                ('disciplina', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='solicitacoes.disciplina')),
+                ('responsavel', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('disciplina', 'etapa', 'responsavel', 'faixa'), name='estatistica_decisao_unica')],
+            },
+        ),
+        migrations.CreateModel(
+            name='EstatisticaFila',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('etapa', models.CharField(max_length=12)),
+                ('pendentes', models.IntegerField(default=0)),
+                ('expiradas', models.PositiveIntegerField(default=0)),
+                ('disciplina', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='solicitacoes.disciplina')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('disciplina', 'etapa'), name='estatistica_fila_unica')],
+            },
+        ),
+        migrations.RunPython(calcular_estatisticas, migrations.RunPython.noop),
+    ]
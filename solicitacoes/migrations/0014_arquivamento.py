@@ -0,0 +1,83 @@
+# Generated by Django 5.2.6 on 2026-10-18 17:14
+
+import django.db.models.deletion
+import solicitacoes.armazenamento
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('solicitacoes', '0013_exportacao'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SolicitacaoArquivada',
+            fields=[
+                ('motivo', models.TextField()),
+                ('arquivo', models.FileField(blank=True, help_text='Arquivo comprobatório (opcional)', null=True, storage=solicitacoes.armazenamento.obter_armazenamento, upload_to='solicitacoes/%Y/%m/')),
+                ('arquivo_nome', models.CharField(blank=True, editable=False, max_length=255)),
+                ('arquivo_pendente', models.BooleanField(default=False, editable=False)),
+                ('arquivo_tamanho', models.PositiveBigIntegerField(blank=True, editable=False, null=True)),
+                ('arquivo_tipo', models.CharField(blank=True, editable=False, max_length=100)),
+                ('arquivo_paginas', models.PositiveIntegerField(blank=True, editable=False, null=True)),
+                ('arquivo_miniatura', models.FileField(blank=True, editable=False, null=True, upload_to='solicitacoes/miniaturas/%Y/%m/')),
+                ('data_limite', models.DateTimeField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('pendente', 'Pendente'), ('aprovada', 'Aprovada'), ('rejeitada', 'Rejeitada')], default='pendente', max_length=10)),
+                ('etapa_atual', models.CharField(choices=[('coordenador', 'Coordenação'), ('secretaria', 'Secretaria'), ('professor', 'Professor'), ('concluida', 'Concluída')], default='coordenador', editable=False, max_length=12)),
+                ('coordenador_status', models.CharField(choices=[('pendente', 'Pendente'), ('aprovada', 'Aprovada'), ('rejeitada', 'Rejeitada')], default='pendente', max_length=10)),
+                ('coordenador_justificativa', models.TextField(blank=True)),
+                ('coordenador_data', models.DateTimeField(blank=True, null=True)),
+                ('secretaria_status', models.CharField(choices=[('pendente', 'Pendente'), ('aprovada', 'Aprovada'), ('rejeitada', 'Rejeitada')], default='pendente', max_length=10)),
+                ('secretaria_justificativa', models.TextField(blank=True)),
+                ('secretaria_data', models.DateTimeField(blank=True, null=True)),
+                ('professor_status', models.CharField(choices=[('pendente', 'Pendente'), ('aprovada', 'Aprovada'), ('rejeitada', 'Rejeitada')], default='pendente', max_length=10)),
+                ('observacoes_professor', models.TextField(blank=True, null=True)),
+                ('data_avaliacao', models.DateTimeField(blank=True, null=True)),
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('data_solicitacao', models.DateTimeField()),
+                ('arquivada_em', models.DateTimeField(auto_now_add=True)),
+                ('aluno', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('coordenador_responsavel', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('disciplina', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='solicitacoes.disciplina')),
+                ('professor_responsavel', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('secretaria_responsavel', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-data_solicitacao'],
+            },
+        ),
+        migrations.CreateModel(
+            name='NotificacaoArquivada',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('mensagem', models.TextField()),
+                ('lido', models.BooleanField(default=False)),
+                ('criado_em', models.DateTimeField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('solicitacao', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notificacoes', to='solicitacoes.solicitacaoarquivada')),
+            ],
+            options={
+                'ordering': ['-criado_em'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='solicitacaoarquivada',
+            index=models.Index(fields=['aluno', '-data_solicitacao', '-id'], name='arquivada_aluno_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='solicitacaoarquivada',
+            index=models.Index(fields=['coordenador_responsavel', '-data_solicitacao'], name='arquivada_coord_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='solicitacaoarquivada',
+            index=models.Index(fields=['secretaria_responsavel', '-data_solicitacao'], name='arquivada_secr_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='solicitacaoarquivada',
+            index=models.Index(fields=['professor_responsavel', '-data_solicitacao'], name='arquivada_prof_data_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.6 on 2026-10-18 17:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def contar_nao_lidas(apps, schema_editor):
+    from solicitacoes.notificacoes import recontar_nao_lidas
+
+    recontar_nao_lidas(apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('solicitacoes', '0014_arquivamento'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='perfil',
+            name='notificacoes_nao_lidas',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='notificacao',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='notificacao',
+            index=models.Index(fields=['user', '-criado_em'], name='notificacao_user_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notificacao',
+            index=models.Index(fields=['user', 'lido', '-criado_em'], name='notificacao_user_lido_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notificacao',
+            index=models.Index(fields=['criado_em'], name='notificacao_criado_idx'),
+        ),
+        migrations.RunPython(contar_nao_lidas, migrations.RunPython.noop),
+    ]
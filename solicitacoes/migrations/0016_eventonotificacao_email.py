@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-18 17:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('solicitacoes', '0015_notificacoes_nao_lidas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='eventonotificacao',
+            name='entregue',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='eventonotificacao',
+            name='proxima_tentativa',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='eventonotificacao',
+            name='tentativas_email',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+    ]
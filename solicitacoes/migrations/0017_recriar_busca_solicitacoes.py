@@ -0,0 +1,78 @@
+from django.db import migrations
+
+SQLITE_INDICE_TEXTO = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS solicitacoes_solicitacao_fts USING fts5(
+        motivo, disciplina, tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS solicitacoes_solicitacao_fts_ai
+    AFTER INSERT ON solicitacoes_solicitacao BEGIN
+        INSERT INTO solicitacoes_solicitacao_fts (rowid, motivo, disciplina)
+        SELECT new.id, new.motivo, nome FROM solicitacoes_disciplina WHERE id = new.disciplina_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS solicitacoes_solicitacao_fts_au
+    AFTER UPDATE OF motivo, disciplina_id ON solicitacoes_solicitacao BEGIN
+        DELETE FROM solicitacoes_solicitacao_fts WHERE rowid = old.id;
+        INSERT INTO solicitacoes_solicitacao_fts (rowid, motivo, disciplina)
+        SELECT new.id, new.motivo, nome FROM solicitacoes_disciplina WHERE id = new.disciplina_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS solicitacoes_solicitacao_fts_ad
+    AFTER DELETE ON solicitacoes_solicitacao BEGIN
+        DELETE FROM solicitacoes_solicitacao_fts WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS solicitacoes_disciplina_fts_au
+    AFTER UPDATE OF nome ON solicitacoes_disciplina BEGIN
+        UPDATE solicitacoes_solicitacao_fts SET disciplina = new.nome
+        WHERE rowid IN (SELECT id FROM solicitacoes_solicitacao WHERE disciplina_id = new.id);
+    END
+    """,
+    'DELETE FROM solicitacoes_solicitacao_fts',
+    """
+    INSERT INTO solicitacoes_solicitacao_fts (rowid, motivo, disciplina)
+    SELECT s.id, s.motivo, d.nome
+    FROM solicitacoes_solicitacao s
+    JOIN solicitacoes_disciplina d ON d.id = s.disciplina_id
+    """,
+]
+
+SQLITE_REMOVER_GATILHOS_TEXTO = [
+    'DROP TRIGGER IF EXISTS solicitacoes_disciplina_fts_au',
+    'DROP TRIGGER IF EXISTS solicitacoes_solicitacao_fts_ad',
+    'DROP TRIGGER IF EXISTS solicitacoes_solicitacao_fts_au',
+    'DROP TRIGGER IF EXISTS solicitacoes_solicitacao_fts_ai',
+]
+
+
+def _executar(schema_editor, comandos):
+    if schema_editor.connection.vendor == 'sqlite':
+        for sql in comandos:
+            schema_editor.execute(sql)
+
+
+def recriar_indice_texto(apps, schema_editor):
+    # Gatilhos removidos pela 0007 (ou pelo pre_migrate) e índice recarregado
+    # com as linhas gravadas enquanto estavam fora.
+    _executar(schema_editor, SQLITE_INDICE_TEXTO)
+
+
+def remover_gatilhos_texto(apps, schema_editor):
+    _executar(schema_editor, SQLITE_REMOVER_GATILHOS_TEXTO)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('solicitacoes', '0016_eventonotificacao_email'),
+    ]
+
+    operations = [
+        migrations.RunPython(recriar_indice_texto, remover_gatilhos_texto),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-18 17:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('solicitacoes', '0017_recriar_busca_solicitacoes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exportacao',
+            name='reservada_em',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='exportacao',
+            name='tentativas',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+    ]
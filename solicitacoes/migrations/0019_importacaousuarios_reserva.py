@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('solicitacoes', '0018_exportacao_reserva'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importacaousuarios',
+            name='reservada_em',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='importacaousuarios',
+            name='tentativas',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+    ]
@@ -1,7 +1,15 @@
-from django.db import models
+import hashlib
+import secrets
+import uuid
+from collections import Counter
+
+from django.db import IntegrityError, models, transaction
 from django.contrib.auth.models import User
+from django.dispatch import Signal
 from django.utils import timezone
 
+from .armazenamento import obter_armazenamento
+
 
 class Perfil(models.Model):
     TIPO_CHOICES = [
@@ -14,6 +22,9 @@ class Perfil(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     tipo = models.CharField(max_length=20, choices=TIPO_CHOICES)
     matricula = models.CharField(max_length=20, unique=True, blank=True, null=True)
+    # Mantido por notificacoes.ajustar_nao_lidas junto com as notificações e
+    # lido por notificacoes.contar_nao_lidas (fica fora do cache de papéis).
+    notificacoes_nao_lidas = models.IntegerField(default=0)
 
     def __str__(self):
         return f"{self.user.username} - {self.tipo}"
@@ -32,37 +43,177 @@ class Disciplina(models.Model):
         ordering = ['codigo']
 
 
-class Solicitacao(models.Model):
+MENSAGEM_EXPIRACAO = 'Rejeitada automaticamente por expirar o prazo.'
+
+# Enviados pelas operações em lote, pelas decisões (UPDATE condicional) e
+# pelo arquivamento, que não disparam post_save/post_delete.
+solicitacoes_expiradas = Signal()
+decisoes_registradas = Signal()
+solicitacoes_arquivadas = Signal()
+
+
+class DecisaoConcorrente(Exception):
+    # A solicitação saiu da fila do papel (outra decisão, expiração) entre a
+    # leitura e a gravação.
+    pass
+
+# Situação das etapas exigida para que o pedido esteja na fila de cada papel.
+FILA_POR_PAPEL = {
+    'coordenador': {'coordenador_status': 'pendente'},
+    'secretaria': {'coordenador_status': 'aprovada', 'secretaria_status': 'pendente'},
+    'professor': {'coordenador_status': 'aprovada', 'secretaria_status': 'aprovada', 'professor_status': 'pendente'},
+}
+
+RESPONSAVEL_POR_PAPEL = {
+    'coordenador': 'coordenador_responsavel',
+    'secretaria': 'secretaria_responsavel',
+    'professor': 'professor_responsavel',
+}
+
+CAMPOS_DECISAO = {
+    'coordenador': ['coordenador_status', 'coordenador_responsavel', 'coordenador_justificativa', 'coordenador_data'],
+    'secretaria': ['secretaria_status', 'secretaria_responsavel', 'secretaria_justificativa', 'secretaria_data'],
+    'professor': ['professor_status', 'professor_responsavel', 'observacoes_professor', 'data_avaliacao'],
+}
+
+# Campos que uma decisão dentro do prazo altera além dos da própria etapa;
+# data_avaliacao, que atualizar_status_final também preenche, só muda na
+# etapa do professor e já consta em CAMPOS_DECISAO.
+CAMPOS_STATUS_FINAL = ['status', 'etapa_atual']
+
+# Quando cada etapa começa e quando sua decisão é registrada; a diferença
+# alimenta o histograma de EstatisticaDecisao.
+INICIO_POR_PAPEL = {
+    'coordenador': 'data_solicitacao',
+    'secretaria': 'coordenador_data',
+    'professor': 'secretaria_data',
+}
+DATA_DECISAO_POR_PAPEL = {
+    'coordenador': 'coordenador_data',
+    'secretaria': 'secretaria_data',
+    'professor': 'data_avaliacao',
+}
+
+# Limites (horas) das faixas de tempo até a decisão.
+FAIXAS_HORAS = (1, 4, 12, 24, 48, 72, 168, 336, 720, float('inf'))
+
+CAMPOS_LISTAGEM = [
+    'id', 'motivo', 'arquivo', 'arquivo_nome', 'data_solicitacao', 'data_limite', 'status', 'etapa_atual',
+    'coordenador_status', 'coordenador_data',
+    'secretaria_status',
+    'professor_status', 'observacoes_professor', 'data_avaliacao',
+    'aluno__id', 'aluno__username', 'aluno__first_name', 'aluno__last_name',
+    'disciplina__id', 'disciplina__codigo', 'disciplina__nome',
+]
+
+
+class SolicitacaoQuerySet(models.QuerySet):
+    def para_listagem(self):
+        return self.select_related('aluno', 'disciplina').only(*CAMPOS_LISTAGEM)
+
+    def do_aluno(self, usuario):
+        return self.filter(aluno=usuario).para_listagem()
+
+    def pendentes_para(self, papel, agora=None):
+        if papel not in FILA_POR_PAPEL:
+            return self.none()
+        return self.filter(etapa_atual=papel).no_prazo(agora).para_listagem()
+
+    def avaliadas_por(self, usuario, papel=None):
+        if papel is not None:
+            campo = RESPONSAVEL_POR_PAPEL.get(papel)
+            if campo is None:
+                return self.none()
+            condicao = models.Q(**{campo: usuario})
+        else:
+            condicao = models.Q()
+            for campo in RESPONSAVEL_POR_PAPEL.values():
+                condicao |= models.Q(**{campo: usuario})
+        return self.filter(condicao).para_listagem()
+
+    def vencidas(self, agora=None):
+        agora = agora or timezone.now()
+        return self.filter(status='pendente', data_limite__lt=agora)
+
+    def no_prazo(self, agora=None):
+        agora = agora or timezone.now()
+        return self.filter(models.Q(data_limite__isnull=True) | models.Q(data_limite__gte=agora))
+
+    def expirar(self, agora=None):
+        observacoes = models.Case(
+            models.When(
+                models.Q(observacoes_professor__isnull=True) | models.Q(observacoes_professor=''),
+                then=models.Value(MENSAGEM_EXPIRACAO),
+            ),
+            default=models.F('observacoes_professor'),
+            output_field=models.TextField(),
+        )
+        vencidas = self.vencidas(agora)
+        with transaction.atomic():
+            linhas = list(vencidas.order_by().values_list('aluno_id', 'disciplina_id', 'etapa_atual'))
+            if not linhas:
+                return 0
+            total = vencidas.update(
+                status='rejeitada',
+                etapa_atual='concluida',
+                observacoes_professor=observacoes,
+            )
+            EstatisticaFila.registrar_expiracao(Counter(
+                (disciplina_id, etapa) for _, disciplina_id, etapa in linhas
+            ))
+        if total:
+            solicitacoes_expiradas.send(sender=self.model, alunos={aluno_id for aluno_id, _, _ in linhas})
+        return total
+
+
+# Colunas e comportamento comuns às solicitações ativas e às arquivadas
+# (SolicitacaoArquivada); cada uma declara as próprias chaves estrangeiras.
+class DadosSolicitacao(models.Model):
     STATUS_CHOICES = [
         ('pendente', 'Pendente'),
         ('aprovada', 'Aprovada'),
         ('rejeitada', 'Rejeitada'),
     ]
     APPROVAL_CHOICES = STATUS_CHOICES
+    ETAPA_CHOICES = [
+        ('coordenador', 'Coordenação'),
+        ('secretaria', 'Secretaria'),
+        ('professor', 'Professor'),
+        ('concluida', 'Concluída'),
+    ]
+    CAMPOS_ETAPA = {'status', 'coordenador_status', 'secretaria_status', 'professor_status'}
 
-    aluno = models.ForeignKey(User, on_delete=models.CASCADE, related_name='solicitacoes')
-    disciplina = models.ForeignKey(Disciplina, on_delete=models.CASCADE)
     motivo = models.TextField()
-    arquivo = models.FileField(upload_to='solicitacoes/%Y/%m/', blank=True, null=True, help_text='Arquivo comprobatório (opcional)')
+    arquivo = models.FileField(upload_to='solicitacoes/%Y/%m/', storage=obter_armazenamento, blank=True, null=True, help_text='Arquivo comprobatório (opcional)')
+    arquivo_nome = models.CharField(max_length=255, blank=True, editable=False)
+    # Preenchidos por processar_arquivos, fora da requisição de envio.
+    arquivo_pendente = models.BooleanField(default=False, editable=False)
+    arquivo_tamanho = models.PositiveBigIntegerField(null=True, blank=True, editable=False)
+    arquivo_tipo = models.CharField(max_length=100, blank=True, editable=False)
+    arquivo_paginas = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    arquivo_miniatura = models.FileField(upload_to='solicitacoes/miniaturas/%Y/%m/', blank=True, null=True, editable=False)
     data_solicitacao = models.DateTimeField(auto_now_add=True)
     data_limite = models.DateTimeField(null=True, blank=True)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pendente')
+    etapa_atual = models.CharField(max_length=12, choices=ETAPA_CHOICES, default='coordenador', editable=False)
 
     coordenador_status = models.CharField(max_length=10, choices=APPROVAL_CHOICES, default='pendente')
     coordenador_justificativa = models.TextField(blank=True)
-    coordenador_responsavel = models.ForeignKey(User, on_delete=models.SET_NULL, related_name='aprovacoes_coordenador', null=True, blank=True)
     coordenador_data = models.DateTimeField(null=True, blank=True)
 
     secretaria_status = models.CharField(max_length=10, choices=APPROVAL_CHOICES, default='pendente')
     secretaria_justificativa = models.TextField(blank=True)
-    secretaria_responsavel = models.ForeignKey(User, on_delete=models.SET_NULL, related_name='aprovacoes_secretaria', null=True, blank=True)
     secretaria_data = models.DateTimeField(null=True, blank=True)
 
     professor_status = models.CharField(max_length=10, choices=APPROVAL_CHOICES, default='pendente')
-    professor_responsavel = models.ForeignKey(User, on_delete=models.SET_NULL, related_name='avaliacoes', null=True, blank=True)
     observacoes_professor = models.TextField(blank=True, null=True)
     data_avaliacao = models.DateTimeField(null=True, blank=True)
 
+    objects = SolicitacaoQuerySet.as_manager()
+
+    class Meta:
+        abstract = True
+
     def __str__(self):
         return f"{self.aluno.username} - {self.disciplina.nome} ({self.status})"
 
@@ -73,33 +224,60 @@ class Solicitacao(models.Model):
     @property
     def nome_arquivo(self):
         if self.arquivo:
-            return self.arquivo.name.split('/')[-1]
+            return self.arquivo_nome or self.arquivo.name.split('/')[-1]
         return None
 
     @property
     def prazo_expirado(self):
         return bool(self.data_limite and timezone.now() > self.data_limite)
 
+
+class Solicitacao(DadosSolicitacao):
+    aluno = models.ForeignKey(User, on_delete=models.CASCADE, related_name='solicitacoes')
+    disciplina = models.ForeignKey(Disciplina, on_delete=models.CASCADE)
+    coordenador_responsavel = models.ForeignKey(User, on_delete=models.SET_NULL, related_name='aprovacoes_coordenador', null=True, blank=True)
+    secretaria_responsavel = models.ForeignKey(User, on_delete=models.SET_NULL, related_name='aprovacoes_secretaria', null=True, blank=True)
+    professor_responsavel = models.ForeignKey(User, on_delete=models.SET_NULL, related_name='avaliacoes', null=True, blank=True)
+
+    def save(self, *args, **kwargs):
+        self.etapa_atual = self.calcular_etapa()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and self.CAMPOS_ETAPA.intersection(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'etapa_atual'}
+        if not self._state.adding:
+            super().save(*args, **kwargs)
+            return
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if self.etapa_atual in FILA_POR_PAPEL:
+                EstatisticaFila.ajustar({(self.disciplina_id, self.etapa_atual): 1})
+
     def notificar_aluno(self, mensagem):
-        Notificacao.objects.create(user=self.aluno, solicitacao=self, mensagem=mensagem)
+        EventoNotificacao.objects.create(user_id=self.aluno_id, solicitacao=self, mensagem=mensagem)
 
     def pode_avaliar(self, tipo_aprovador):
         if self.status != 'pendente' or self.prazo_expirado:
             return False
 
-        if tipo_aprovador == 'coordenador':
-            return self.coordenador_status == 'pendente'
-        if tipo_aprovador == 'secretaria':
-            return self.coordenador_status == 'aprovada' and self.secretaria_status == 'pendente'
-        if tipo_aprovador == 'professor':
-            return self.coordenador_status == 'aprovada' and self.secretaria_status == 'aprovada' and self.professor_status == 'pendente'
-        return False
+        filtros = FILA_POR_PAPEL.get(tipo_aprovador)
+        if filtros is None:
+            return False
+        return all(getattr(self, campo) == valor for campo, valor in filtros.items())
+
+    def calcular_etapa(self):
+        if self.status != 'pendente':
+            return 'concluida'
+        for papel, filtros in FILA_POR_PAPEL.items():
+            if all(getattr(self, campo) == valor for campo, valor in filtros.items()):
+                return papel
+        return 'concluida'
 
     def atualizar_status_final(self):
         if self.data_limite and timezone.now() > self.data_limite and self.status == 'pendente':
             self.status = 'rejeitada'
             if not self.observacoes_professor:
-                self.observacoes_professor = 'Rejeitada automaticamente por expirar o prazo.'
+                self.observacoes_professor = MENSAGEM_EXPIRACAO
+            self.etapa_atual = self.calcular_etapa()
             return
 
         etapas = [
@@ -117,9 +295,9 @@ class Solicitacao(models.Model):
         else:
             self.status = 'pendente'
 
-    def registrar_decisao(self, tipo_aprovador, usuario, decisao, justificativa=''):
-        agora = timezone.now()
+        self.etapa_atual = self.calcular_etapa()
 
+    def _aplicar_decisao(self, tipo_aprovador, usuario, decisao, justificativa, agora):
         if tipo_aprovador == 'coordenador':
             self.coordenador_status = decisao
             self.coordenador_responsavel = usuario
@@ -137,15 +315,81 @@ class Solicitacao(models.Model):
             self.data_avaliacao = agora
 
         self.atualizar_status_final()
-        self.save()
+
+    def registrar_decisao(self, tipo_aprovador, usuario, decisao, justificativa=''):
+        agora = timezone.now()
+        self._aplicar_decisao(tipo_aprovador, usuario, decisao, justificativa, agora)
+        campos = [*CAMPOS_DECISAO[tipo_aprovador], *CAMPOS_STATUS_FINAL]
+        with transaction.atomic():
+            # UPDATE condicional: grava só as colunas da etapa e apenas se o
+            # pedido ainda estiver pendente, no prazo e na fila deste papel.
+            # Quem chega depois de outra decisão não sobrescreve nada.
+            atualizadas = (
+                Solicitacao.objects.filter(pk=self.pk, status='pendente', **FILA_POR_PAPEL[tipo_aprovador])
+                .exclude(data_limite__lt=agora)
+                .update(**{campo: getattr(self, campo) for campo in campos})
+            )
+            if atualizadas:
+                EstatisticaDecisao.contabilizar(tipo_aprovador, [self])
+                decisoes_registradas.send(sender=Solicitacao, solicitacoes=[self])
+        if not atualizadas:
+            self.refresh_from_db()
+            raise DecisaoConcorrente(f'Solicitação #{self.pk} não está mais na fila de {tipo_aprovador}.')
         return decisao
 
+    @classmethod
+    def registrar_decisoes_em_lote(cls, ids, tipo_aprovador, usuario, decisao, justificativa=''):
+        agora = timezone.now()
+        resultados = []
+        alteradas = []
+
+        with transaction.atomic():
+            encontradas = cls.objects.select_for_update().in_bulk(ids)
+            for solicitacao_id in ids:
+                solicitacao = encontradas.get(solicitacao_id)
+                if solicitacao is None:
+                    resultado = 'não encontrada'
+                elif solicitacao.prazo_expirado:
+                    resultado = 'prazo expirado'
+                elif not solicitacao.pode_avaliar(tipo_aprovador):
+                    resultado = 'fora da sua fila'
+                else:
+                    solicitacao._aplicar_decisao(tipo_aprovador, usuario, decisao, justificativa, agora)
+                    alteradas.append(solicitacao)
+                    resultado = decisao
+                resultados.append({'id': solicitacao_id, 'ok': resultado == decisao, 'resultado': resultado})
+
+            if alteradas:
+                cls.objects.bulk_update(alteradas, [*CAMPOS_DECISAO[tipo_aprovador], *CAMPOS_STATUS_FINAL])
+                EstatisticaDecisao.contabilizar(tipo_aprovador, alteradas)
+                EventoNotificacao.objects.bulk_create([
+                    EventoNotificacao(
+                        user_id=solicitacao.aluno_id,
+                        solicitacao=solicitacao,
+                        mensagem=f'Seu pedido foi {decisao} pelo {tipo_aprovador}.',
+                    )
+                    for solicitacao in alteradas
+                ])
+                decisoes_registradas.send(sender=cls, solicitacoes=alteradas)
+
+        return resultados
+
     class Meta:
         ordering = ['-data_solicitacao']
+        indexes = [
+            models.Index(fields=['status', 'data_limite'], name='solicitacao_status_limite_idx'),
+            models.Index(fields=['aluno', '-data_solicitacao', '-id'], name='solicitacao_aluno_data_idx'),
+            models.Index(fields=['etapa_atual', 'data_limite'], name='solicitacao_etapa_limite_idx'),
+            models.Index(fields=['coordenador_responsavel', '-data_solicitacao'], name='solicitacao_coord_data_idx'),
+            models.Index(fields=['secretaria_responsavel', '-data_solicitacao'], name='solicitacao_secr_data_idx'),
+            models.Index(fields=['professor_responsavel', '-data_solicitacao'], name='solicitacao_prof_data_idx'),
+            models.Index(fields=['id'], condition=models.Q(arquivo_pendente=True), name='solicitacao_arquivo_pend_idx'),
+        ]
 
 
 class Notificacao(models.Model):
-    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    # Os índices compostos abaixo começam por user e substituem o da chave.
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False)
     solicitacao = models.ForeignKey(Solicitacao, on_delete=models.CASCADE, related_name='notificacoes')
     mensagem = models.TextField()
     lido = models.BooleanField(default=False)
@@ -153,6 +397,304 @@ class Notificacao(models.Model):
 
     class Meta:
         ordering = ['-criado_em']
+        indexes = [
+            models.Index(fields=['user', '-criado_em'], name='notificacao_user_data_idx'),
+            models.Index(fields=['user', 'lido', '-criado_em'], name='notificacao_user_lido_idx'),
+            models.Index(fields=['criado_em'], name='notificacao_criado_idx'),
+        ]
 
     def __str__(self):
         return f'Notificacao para {self.user.username} - {self.solicitacao_id}'
+
+
+# Solicitações encerradas movidas para fora das tabelas ativas por
+# `manage.py arquivar_solicitacoes` (arquivamento.py), com o id original. As
+# filas e os históricos só as leem quando a consulta pede as arquivadas.
+class SolicitacaoArquivada(DadosSolicitacao):
+    id = models.BigIntegerField(primary_key=True)
+    aluno = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    disciplina = models.ForeignKey(Disciplina, on_delete=models.CASCADE, related_name='+')
+    coordenador_responsavel = models.ForeignKey(User, on_delete=models.SET_NULL, related_name='+', null=True, blank=True)
+    secretaria_responsavel = models.ForeignKey(User, on_delete=models.SET_NULL, related_name='+', null=True, blank=True)
+    professor_responsavel = models.ForeignKey(User, on_delete=models.SET_NULL, related_name='+', null=True, blank=True)
+    # Sem auto_now_add: guarda a data original.
+    data_solicitacao = models.DateTimeField()
+    arquivada_em = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-data_solicitacao']
+        indexes = [
+            models.Index(fields=['aluno', '-data_solicitacao', '-id'], name='arquivada_aluno_data_idx'),
+            models.Index(fields=['coordenador_responsavel', '-data_solicitacao'], name='arquivada_coord_data_idx'),
+            models.Index(fields=['secretaria_responsavel', '-data_solicitacao'], name='arquivada_secr_data_idx'),
+            models.Index(fields=['professor_responsavel', '-data_solicitacao'], name='arquivada_prof_data_idx'),
+        ]
+
+
+class NotificacaoArquivada(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    solicitacao = models.ForeignKey(SolicitacaoArquivada, on_delete=models.CASCADE, related_name='notificacoes')
+    mensagem = models.TextField()
+    lido = models.BooleanField(default=False)
+    criado_em = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-criado_em']
+
+    def __str__(self):
+        return f'Notificacao arquivada para {self.user_id} - {self.solicitacao_id}'
+
+
+def _acumular(modelo, campos_chave, variacoes, criar=True):
+    # Soma as variações de cada chave com uma leitura, um UPDATE em lote e um
+    # INSERT para as chaves novas: o número de consultas não cresce com o lote.
+    # Só cria linha quando algum contador aumenta; sem linha não há o que
+    # descontar (e a disciplina pode estar sendo excluída junto).
+    variacoes = {chave: incrementos for chave, incrementos in variacoes.items() if any(incrementos.values())}
+    if not variacoes:
+        return
+    filtro = models.Q()
+    for chave in variacoes:
+        filtro |= models.Q(**dict(zip(campos_chave, chave)))
+    existentes = {
+        tuple(getattr(linha, campo) for campo in campos_chave): linha
+        for linha in modelo.objects.filter(filtro).only('pk', *campos_chave)
+    }
+    campos = sorted({campo for incrementos in variacoes.values() for campo in incrementos})
+    atualizar, novas = [], []
+    for chave, incrementos in variacoes.items():
+        linha = existentes.get(chave)
+        if linha is None:
+            if criar and any(valor > 0 for valor in incrementos.values()):
+                novas.append(modelo(**dict(zip(campos_chave, chave)), **incrementos))
+            continue
+        for campo in campos:
+            setattr(linha, campo, models.F(campo) + incrementos.get(campo, 0))
+        atualizar.append(linha)
+    if atualizar:
+        modelo.objects.bulk_update(atualizar, campos)
+    if novas:
+        try:
+            with transaction.atomic():
+                modelo.objects.bulk_create(novas)
+        except IntegrityError:
+            # Outra transação criou alguma das linhas depois da leitura;
+            # agora elas existem e basta somar.
+            _acumular(modelo, campos_chave, {
+                tuple(getattr(linha, campo) for campo in campos_chave): {
+                    campo: getattr(linha, campo) for campo in campos
+                }
+                for linha in novas
+            }, criar=False)
+
+
+# Contadores mantidos a cada criação, decisão, expiração e exclusão, para que
+# os relatórios não precisem varrer Solicitacao. Podem ser refeitos do zero
+# com `manage.py recalcular_estatisticas`.
+class EstatisticaFila(models.Model):
+    disciplina = models.ForeignKey(Disciplina, on_delete=models.CASCADE, related_name='+')
+    etapa = models.CharField(max_length=12)
+    pendentes = models.IntegerField(default=0)
+    expiradas = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['disciplina', 'etapa'], name='estatistica_fila_unica'),
+        ]
+
+    def __str__(self):
+        return f'{self.disciplina_id} - {self.etapa}: {self.pendentes}'
+
+    @classmethod
+    def ajustar(cls, variacoes):
+        _acumular(cls, ['disciplina_id', 'etapa'], {
+            chave: {'pendentes': variacao} for chave, variacao in variacoes.items()
+        })
+
+    @classmethod
+    def registrar_expiracao(cls, contagem):
+        _acumular(cls, ['disciplina_id', 'etapa'], {
+            (disciplina_id, etapa): {'pendentes': -total, 'expiradas': total}
+            for (disciplina_id, etapa), total in contagem.items()
+            if etapa in FILA_POR_PAPEL
+        })
+
+
+class EstatisticaDecisao(models.Model):
+    disciplina = models.ForeignKey(Disciplina, on_delete=models.CASCADE, related_name='+')
+    etapa = models.CharField(max_length=12)
+    responsavel = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='+')
+    # Índice em FAIXAS_HORAS; nulo para decisões antigas, sem data registrada.
+    faixa = models.PositiveSmallIntegerField(null=True)
+    aprovadas = models.PositiveIntegerField(default=0)
+    rejeitadas = models.PositiveIntegerField(default=0)
+    segundos = models.FloatField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['disciplina', 'etapa', 'responsavel', 'faixa'],
+                name='estatistica_decisao_unica',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.disciplina_id} - {self.etapa} - {self.responsavel_id}'
+
+    @staticmethod
+    def faixa_de(segundos):
+        horas = segundos / 3600
+        return next(indice for indice, limite in enumerate(FAIXAS_HORAS) if horas <= limite)
+
+    @classmethod
+    def contabilizar(cls, papel, solicitacoes):
+        decisoes = {}
+        filas = Counter()
+        for solicitacao in solicitacoes:
+            inicio = getattr(solicitacao, INICIO_POR_PAPEL[papel])
+            fim = getattr(solicitacao, DATA_DECISAO_POR_PAPEL[papel])
+            segundos = max((fim - inicio).total_seconds(), 0) if inicio and fim else None
+            chave = (
+                solicitacao.disciplina_id,
+                getattr(solicitacao, f'{RESPONSAVEL_POR_PAPEL[papel]}_id'),
+                None if segundos is None else cls.faixa_de(segundos),
+            )
+            contagem = decisoes.setdefault(chave, Counter())
+            contagem['aprovadas' if getattr(solicitacao, f'{papel}_status') == 'aprovada' else 'rejeitadas'] += 1
+            contagem['segundos'] += segundos or 0
+
+            filas[(solicitacao.disciplina_id, papel)] -= 1
+            if solicitacao.etapa_atual in FILA_POR_PAPEL:
+                filas[(solicitacao.disciplina_id, solicitacao.etapa_atual)] += 1
+
+        _acumular(cls, ['disciplina_id', 'etapa', 'responsavel_id', 'faixa'], {
+            (disciplina_id, papel, responsavel_id, faixa): dict(contagem)
+            for (disciplina_id, responsavel_id, faixa), contagem in decisoes.items()
+        })
+        EstatisticaFila.ajustar(filas)
+
+
+# Fila de saída: notificações aguardando entrega por processar_notificacoes.
+class EventoNotificacao(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    solicitacao = models.ForeignKey(Solicitacao, on_delete=models.CASCADE, related_name='+')
+    mensagem = models.TextField()
+    criado_em = models.DateTimeField(auto_now_add=True)
+    # Já virou Notificacao; a linha fica até o e-mail sair.
+    entregue = models.BooleanField(default=False)
+    tentativas_email = models.PositiveSmallIntegerField(default=0)
+    proxima_tentativa = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['id']
+
+    def __str__(self):
+        return f'Evento para {self.user_id} - {self.solicitacao_id}'
+
+
+# Conteúdo único no ArmazenamentoDeduplicado e quantas referências o usam.
+class ArquivoArmazenado(models.Model):
+    sha256 = models.CharField(max_length=64, primary_key=True)
+    nome = models.CharField(max_length=255, unique=True)
+    tamanho = models.PositiveBigIntegerField()
+    referencias = models.PositiveIntegerField(default=0)
+    criado_em = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.nome} ({self.referencias})'
+
+
+# Envio em partes do arquivo comprobatório. As partes são gravadas em `nome`
+# (blobs/parciais/<id>); ao concluir, o arquivo é movido para o blob do seu
+# conteúdo e `nome` passa a apontar para ele.
+class UploadParcial(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    nome = models.CharField(max_length=255)
+    nome_original = models.CharField(max_length=255)
+    tipo = models.CharField(max_length=100)
+    tamanho = models.PositiveBigIntegerField()
+    recebido = models.PositiveBigIntegerField(default=0)
+    criado_em = models.DateTimeField(auto_now_add=True)
+
+    @property
+    def concluido(self):
+        return self.recebido == self.tamanho
+
+    def __str__(self):
+        return f'{self.nome_original} ({self.recebido}/{self.tamanho})'
+
+
+# Arquivo de matrículas enviado pela equipe em /interno/usuarios/importar/.
+# O agendador processa a fila (provisionamento.processar_importacoes) e apaga
+# o arquivo ao terminar; só o resumo fica guardado.
+class ImportacaoUsuarios(models.Model):
+    STATUS_CHOICES = [
+        ('pendente', 'Pendente'),
+        ('processando', 'Processando'),
+        ('concluida', 'Concluída'),
+        ('falhou', 'Falhou'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    arquivo = models.FileField(upload_to='importacoes/', blank=True)
+    formato = models.CharField(max_length=4)
+    senha_matricula = models.BooleanField(default=False)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pendente')
+    resultado = models.JSONField(null=True, blank=True)
+    criado_por = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='+')
+    criado_em = models.DateTimeField(auto_now_add=True)
+    reservada_em = models.DateTimeField(null=True, blank=True)
+    tentativas = models.PositiveSmallIntegerField(default=0)
+    concluida_em = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f'Importação {self.id} ({self.get_status_display()})'
+
+
+# Exportação de solicitações gerada fora da requisição (exportacao.py). O
+# arquivo fica disponível por EXPORTACOES_VALIDADE_DIAS e depois é apagado.
+class Exportacao(models.Model):
+    STATUS_CHOICES = ImportacaoUsuarios.STATUS_CHOICES
+    FORMATO_CHOICES = [
+        ('csv', 'CSV'),
+        ('xlsx', 'XLSX'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='exportacoes')
+    formato = models.CharField(max_length=4, choices=FORMATO_CHOICES, default='csv')
+    filtros = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pendente')
+    arquivo = models.FileField(upload_to='exportacoes/', blank=True)
+    linhas = models.PositiveIntegerField(null=True, blank=True)
+    criado_em = models.DateTimeField(auto_now_add=True)
+    reservada_em = models.DateTimeField(null=True, blank=True)
+    tentativas = models.PositiveSmallIntegerField(default=0)
+    concluida_em = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f'Exportação {self.id} ({self.get_status_display()})'
+
+
+# Token de acesso à API para clientes sem sessão (Authorization: Bearer).
+# Só o SHA-256 fica no banco; o token é mostrado uma vez, ao ser criado.
+class TokenApi(models.Model):
+    chave = models.CharField(max_length=64, unique=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='tokens_api')
+    nome = models.CharField(max_length=100, blank=True)
+    criado_em = models.DateTimeField(auto_now_add=True)
+
+    @staticmethod
+    def resumir(token):
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    @classmethod
+    def gerar(cls, user, nome=''):
+        token = secrets.token_urlsafe(32)
+        cls.objects.create(user=user, nome=nome, chave=cls.resumir(token))
+        return token
+
+    def __str__(self):
+        return f'Token {self.nome or self.pk} de {self.user_id}'
@@ -0,0 +1,216 @@
+import logging
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.apps import apps as apps_globais
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import router, transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from . import cache_dashboard
+from .eventos import publicar_nao_lidas
+from .models import EventoNotificacao, Notificacao, Perfil
+
+logger = logging.getLogger(__name__)
+
+TAMANHO_LOTE = 200
+TAMANHO_LOTE_PURGA = 1000
+# Tempo em que os e-mails reservados por um worker ficam fora do alcance dos
+# outros; se ele cair antes de concluir, voltam para a fila depois disso.
+RESERVA_EMAIL = timedelta(minutes=10)
+ESPERA_MAXIMA_EMAIL = timedelta(hours=1)
+
+
+def ajustar_nao_lidas(variacoes):
+    # variacoes: {user_id: +n entregues / -n lidas ou apagadas}. Chame na
+    # mesma transação que muda as notificações; um UPDATE por variação.
+    usuarios_por_variacao = defaultdict(list)
+    for user_id, variacao in variacoes.items():
+        if variacao:
+            usuarios_por_variacao[variacao].append(user_id)
+    for variacao, usuarios in usuarios_por_variacao.items():
+        Perfil.objects.filter(user_id__in=usuarios).update(
+            notificacoes_nao_lidas=Greatest(F('notificacoes_nao_lidas') + variacao, 0),
+        )
+
+
+def contar_nao_lidas(user_id):
+    # Uma coluna do perfil, lida do banco: o perfil em cache (papeis.py) só
+    # é invalidado no processo que o altera, e a entrega e a purga rodam em
+    # outros processos. Sem perfil, conta pelo índice (user, lido).
+    total = Perfil.objects.filter(user_id=user_id).values_list('notificacoes_nao_lidas', flat=True).first()
+    if total is None:
+        total = Notificacao.objects.filter(user_id=user_id, lido=False).count()
+    return total
+
+
+def recontar_nao_lidas(apps=apps_globais):
+    # Refaz os contadores a partir da tabela; usado pela migração e por
+    # `purgar_notificacoes --recontar`.
+    Perfil = apps.get_model('solicitacoes', 'Perfil')
+    Notificacao = apps.get_model('solicitacoes', 'Notificacao')
+    contagens = Counter(dict(
+        Notificacao.objects.filter(lido=False).order_by()
+        .values('user_id').annotate(total=Count('id')).values_list('user_id', 'total')
+    ))
+    with transaction.atomic():
+        Perfil.objects.exclude(user_id__in=list(contagens)).exclude(notificacoes_nao_lidas=0).update(notificacoes_nao_lidas=0)
+        perfis = list(Perfil.objects.filter(user_id__in=list(contagens)))
+        for perfil in perfis:
+            perfil.notificacoes_nao_lidas = contagens[perfil.user_id]
+        Perfil.objects.bulk_update(perfis, ['notificacoes_nao_lidas'], batch_size=TAMANHO_LOTE_PURGA)
+    return len(perfis)
+
+
+def marcar_lidas(user_id, ids):
+    with transaction.atomic():
+        lidas = Notificacao.objects.filter(id__in=ids, user_id=user_id, lido=False).update(lido=True)
+        ajustar_nao_lidas({user_id: -lidas})
+    cache_dashboard.invalidar(f'notificacoes:{user_id}')
+    return lidas
+
+
+def _drenar_lote(tamanho, enviar_email):
+    with transaction.atomic():
+        eventos = list(
+            EventoNotificacao.objects.select_for_update(skip_locked=True, of=('self',))
+            .filter(entregue=False)
+            .select_related('user')
+            .order_by('id')[:tamanho]
+        )
+        if not eventos:
+            return []
+        Notificacao.objects.bulk_create([
+            Notificacao(user_id=evento.user_id, solicitacao_id=evento.solicitacao_id, mensagem=evento.mensagem)
+            for evento in eventos
+        ])
+        # Quem tem e-mail a receber fica na fila até o envio dar certo.
+        com_email = [evento.id for evento in eventos if enviar_email and evento.user.email]
+        EventoNotificacao.objects.filter(id__in=com_email).update(entregue=True)
+        EventoNotificacao.objects.filter(id__in=[evento.id for evento in eventos]).exclude(id__in=com_email).delete()
+        entregues = Counter(evento.user_id for evento in eventos)
+        ajustar_nao_lidas(entregues)
+        usuarios = set(entregues)
+        transaction.on_commit(lambda: cache_dashboard.invalidar(
+            *(f'notificacoes:{user_id}' for user_id in usuarios)
+        ))
+        publicar_nao_lidas(usuarios)
+    return eventos
+
+
+def _reservar_emails(tamanho, agora):
+    # A reserva sai numa transação curta: o SMTP é chamado fora dela, sem
+    # segurar a escrita do banco.
+    with transaction.atomic():
+        eventos = list(
+            EventoNotificacao.objects.select_for_update(skip_locked=True, of=('self',))
+            .filter(Q(proxima_tentativa__isnull=True) | Q(proxima_tentativa__lte=agora), entregue=True)
+            .select_related('user')
+            .order_by('id')[:tamanho]
+        )
+        EventoNotificacao.objects.filter(id__in=[evento.id for evento in eventos]).update(
+            proxima_tentativa=agora + RESERVA_EMAIL,
+        )
+    return eventos
+
+
+def _adiar_emails(eventos, agora):
+    for evento in eventos:
+        tentativas = evento.tentativas_email + 1
+        if tentativas >= settings.NOTIFICACOES_EMAIL_TENTATIVAS:
+            logger.error('E-mail da notificação %s descartado após %s tentativas.', evento.pk, tentativas)
+            EventoNotificacao.objects.filter(pk=evento.pk).delete()
+            continue
+        espera = min(timedelta(minutes=2 ** (tentativas - 1)), ESPERA_MAXIMA_EMAIL)
+        EventoNotificacao.objects.filter(pk=evento.pk).update(
+            tentativas_email=tentativas, proxima_tentativa=agora + espera,
+        )
+
+
+def _enviar_emails(eventos, connection, agora):
+    # Um a um: numa falha sabemos exatamente quais já saíram. Os que não
+    # saíram (o que falhou e os seguintes, já que o servidor provavelmente
+    # está fora) ficam para uma nova tentativa.
+    enviados = []
+    try:
+        connection.open()
+        for evento in eventos:
+            connection.send_messages([EmailMessage(
+                subject='Atualização da sua solicitação de segunda chamada',
+                body=evento.mensagem,
+                to=[evento.user.email],
+                connection=connection,
+            )])
+            enviados.append(evento.id)
+    except Exception:
+        logger.exception('Falha ao enviar %s e-mail(s) de notificação.', len(eventos) - len(enviados))
+        _adiar_emails(eventos[len(enviados):], agora)
+    EventoNotificacao.objects.filter(id__in=enviados).delete()
+    return len(enviados), len(enviados) == len(eventos)
+
+
+def processar_notificacoes(tamanho_lote=TAMANHO_LOTE, enviar_email=None):
+    if enviar_email is None:
+        enviar_email = settings.NOTIFICACOES_EMAIL
+
+    entregues = 0
+    enviados = 0
+    while True:
+        eventos = _drenar_lote(tamanho_lote, enviar_email)
+        entregues += len(eventos)
+        if len(eventos) < tamanho_lote:
+            break
+
+    if enviar_email:
+        # Uma única conexão é aberta para todos os lotes desta rodada.
+        connection = get_connection()
+        try:
+            while True:
+                eventos = _reservar_emails(tamanho_lote, timezone.now())
+                if not eventos:
+                    break
+                saidos, sem_falhas = _enviar_emails(eventos, connection, timezone.now())
+                enviados += saidos
+                if not sem_falhas or len(eventos) < tamanho_lote:
+                    break
+        finally:
+            connection.close()
+
+    if entregues:
+        logger.info('%s notificação(ões) entregue(s), %s e-mail(s) enviado(s).', entregues, enviados)
+    return entregues, enviados
+
+
+def _purgar_lote(limite, tamanho):
+    with transaction.atomic():
+        linhas = list(
+            Notificacao.objects.filter(criado_em__lt=limite)
+            .order_by('criado_em').values_list('id', 'user_id', 'lido')[:tamanho]
+        )
+        if not linhas:
+            return 0
+        # Sem o post_delete por linha: o ajuste dos contadores e a
+        # invalidação dos painéis saem uma vez por usuário.
+        Notificacao.objects.filter(id__in=[id_ for id_, _, _ in linhas])._raw_delete(router.db_for_write(Notificacao))
+        nao_lidas = Counter(user_id for _, user_id, lido in linhas if not lido)
+        ajustar_nao_lidas({user_id: -total for user_id, total in nao_lidas.items()})
+        usuarios = {user_id for _, user_id, _ in linhas}
+        transaction.on_commit(lambda: cache_dashboard.invalidar(
+            *(f'notificacoes:{user_id}' for user_id in usuarios)
+        ))
+    return len(linhas)
+
+
+def purgar_notificacoes(dias=None, tamanho=TAMANHO_LOTE_PURGA, agora=None):
+    # Lotes curtos seguram a escrita do SQLite por pouco tempo de cada vez.
+    if dias is None:
+        dias = settings.NOTIFICACOES_RETENCAO_DIAS
+    limite = (agora or timezone.now()) - timedelta(days=dias)
+    while True:
+        apagadas = _purgar_lote(limite, tamanho)
+        if not apagadas:
+            break
+        yield apagadas
@@ -0,0 +1,128 @@
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import caches
+from django.db import transaction
+from django.http import JsonResponse
+from django.shortcuts import redirect
+
+from .models import Perfil
+
+_AUSENTE = object()
+
+
+def _chave(user_id):
+    return f'papel:{user_id}'
+
+
+def perfil_do_usuario(user):
+    # O Perfil (ou a falta dele, guardada como None) fica no cache por
+    # usuário; só é lido do banco depois que um save o invalida.
+    if not user.is_authenticated:
+        return None
+    cache = caches[settings.DASHBOARD_CACHE]
+    perfil = cache.get(_chave(user.pk), _AUSENTE)
+    if perfil is _AUSENTE:
+        # O contador de não lidas muda fora deste processo: fica fora do
+        # cache e é lido com notificacoes.contar_nao_lidas.
+        perfil = Perfil.objects.defer('notificacoes_nao_lidas').filter(user_id=user.pk).first()
+        cache.set(_chave(user.pk), perfil, settings.PAPEIS_CACHE_VALIDADE)
+    # Preenche a relação: user.perfil não consulta de novo (nem levanta
+    # DoesNotExist com consulta) no restante da requisição.
+    Perfil.user.field.remote_field.set_cached_value(user, perfil)
+    if perfil is not None:
+        Perfil.user.field.set_cached_value(perfil, user)
+    return perfil
+
+
+def invalidar(user_id):
+    cache = caches[settings.DASHBOARD_CACHE]
+    cache.delete(_chave(user_id))
+    # Repete após o commit, como os escopos dos dashboards.
+    transaction.on_commit(lambda: cache.delete(_chave(user_id)))
+
+
+def _guardar(request, perfil):
+    request.perfil = perfil
+    request.papel = perfil.tipo if perfil else None
+
+
+class PapelMiddleware:
+    # Resolve o papel uma vez por requisição (request.perfil e request.papel),
+    # depois do AuthenticationMiddleware. Os estáticos servidos pelo Django
+    # não carregam usuário nem perfil.
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.assincrono = iscoroutinefunction(get_response)
+        if self.assincrono:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.assincrono:
+            return self.__acall__(request)
+        if request.path.startswith(settings.STATIC_URL):
+            _guardar(request, None)
+        else:
+            user = request.user
+            _guardar(request, perfil_do_usuario(user))
+
+            # request.auser() tem cache próprio; as views assíncronas (e o
+            # @login_required delas) recebem o usuário já carregado.
+            async def auser():
+                return user
+            request.auser = auser
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        if request.path.startswith(settings.STATIC_URL):
+            _guardar(request, None)
+        else:
+            user = await request.auser()
+            # O usuário já carregado substitui o preguiçoso, que consultaria
+            # de novo (e de forma síncrona) nas views e templates.
+            request.user = user
+            perfil = await sync_to_async(perfil_do_usuario)(user) if user.is_authenticated else None
+            _guardar(request, perfil)
+        return await self.get_response(request)
+
+
+def papel_requerido(*papeis, sem_perfil=False, staff=False, redirecionar=None, mensagem=None):
+    # Libera a view para os papéis listados (e, se pedido, para quem não tem
+    # perfil ou é staff). Os demais são redirecionados, com a mensagem se
+    # houver, ou recebem 403 em JSON quando não há para onde redirecionar ou a
+    # chamada é JSON. Use abaixo de @login_required.
+    def permitido(request):
+        return request.user.is_authenticated and (
+            request.papel in papeis
+            or (sem_perfil and request.perfil is None)
+            or (staff and request.user.is_staff)
+        )
+
+    def negar(request):
+        if redirecionar and request.content_type != 'application/json':
+            if mensagem:
+                messages.error(request, mensagem)
+            return redirect(redirecionar)
+        return JsonResponse({'erro': mensagem or 'Acesso negado.'}, status=403)
+
+    def decorador(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def envoltorio(request, *args, **kwargs):
+                if not permitido(request):
+                    return negar(request)
+                return await view(request, *args, **kwargs)
+        else:
+            @wraps(view)
+            def envoltorio(request, *args, **kwargs):
+                if not permitido(request):
+                    return negar(request)
+                return view(request, *args, **kwargs)
+        return envoltorio
+
+    return decorador
@@ -0,0 +1,227 @@
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from functools import partial
+
+from django.contrib.auth.hashers import get_hasher, make_password
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .importacao import detectar_formato, em_lotes, ler_registros
+from .models import ImportacaoUsuarios, Perfil
+
+logger = logging.getLogger(__name__)
+
+TAMANHO_LOTE = 500
+# Como nas exportações: uma importação 'processando' há mais que RESERVA volta
+# para a fila, e depois de TENTATIVAS reservas é dada como falha.
+RESERVA = timedelta(hours=1)
+TENTATIVAS = 3
+
+
+def criar_pool(processos=None):
+    # spawn em vez de fork: o servidor e o agendador têm threads, e um fork
+    # pode herdar travas presas (conexões, logging). Os processos só rodam
+    # make_password, sem precisar de django.setup().
+    return ProcessPoolExecutor(
+        max_workers=processos or os.cpu_count(),
+        mp_context=multiprocessing.get_context('spawn'),
+    )
+
+
+def _texto(registro, *chaves):
+    for chave in chaves:
+        valor = registro.get(chave)
+        if valor not in (None, ''):
+            return str(valor).strip()
+    return ''
+
+
+def _normalizar_usuario(registro, senha_matricula):
+    matricula = _texto(registro, 'matricula') or None
+    username = _texto(registro, 'username', 'usuario') or matricula
+    if not username:
+        raise ValueError('username ou matricula é obrigatório')
+    User.username_validator(username)
+    if len(username) > User._meta.get_field('username').max_length:
+        raise ValueError(f'username "{username}" excede o tamanho máximo')
+    if matricula and len(matricula) > Perfil._meta.get_field('matricula').max_length:
+        raise ValueError(f'matricula "{matricula}" excede o tamanho máximo')
+
+    tipo = _texto(registro, 'tipo').lower() or 'aluno'
+    if tipo not in dict(Perfil.TIPO_CHOICES):
+        raise ValueError(f'tipo "{tipo}" inválido')
+
+    first_name = _texto(registro, 'first_name', 'nome')
+    last_name = _texto(registro, 'last_name', 'sobrenome')
+    if not last_name and ' ' in first_name:
+        first_name, last_name = first_name.split(' ', 1)
+
+    senha = _texto(registro, 'senha', 'password') or (matricula if senha_matricula else None)
+    user = User(
+        username=username,
+        first_name=first_name[:150],
+        last_name=last_name[:150],
+        email=_texto(registro, 'email'),
+    )
+    return user, Perfil(tipo=tipo, matricula=matricula), senha
+
+
+def _registrar_erro(resultado, mensagem):
+    if len(resultado['erros']) < 20:
+        resultado['erros'].append(mensagem)
+
+
+def _provisionar_lote(lote, inicio, pool, senha_matricula, resultado):
+    candidatos = []
+    usernames, matriculas = set(), set()
+    for indice, registro in enumerate(lote, start=inicio):
+        try:
+            user, perfil, senha = _normalizar_usuario(registro, senha_matricula)
+        except (AttributeError, ValidationError, ValueError) as erro:
+            resultado['invalidos'] += 1
+            mensagem = erro.messages[0] if isinstance(erro, ValidationError) else erro
+            _registrar_erro(resultado, f'registro {indice}: {mensagem}')
+            continue
+        if user.username in usernames or (perfil.matricula and perfil.matricula in matriculas):
+            resultado['duplicados'] += 1
+            _registrar_erro(resultado, f'registro {indice}: {user.username} repetido no arquivo')
+            continue
+        usernames.add(user.username)
+        if perfil.matricula:
+            matriculas.add(perfil.matricula)
+        candidatos.append((indice, user, perfil, senha))
+
+    # Uma consulta por lote traz quem já existe, por username ou matrícula.
+    existentes_usernames, existentes_matriculas = set(), set()
+    for username, matricula in User.objects.filter(
+        Q(username__in=usernames) | Q(perfil__matricula__in=matriculas),
+    ).values_list('username', 'perfil__matricula'):
+        existentes_usernames.add(username)
+        existentes_matriculas.add(matricula)
+
+    novos = []
+    for indice, user, perfil, senha in candidatos:
+        if user.username in existentes_usernames or (perfil.matricula and perfil.matricula in existentes_matriculas):
+            resultado['existentes'] += 1
+            continue
+        novos.append((user, perfil, senha))
+    if not novos:
+        return
+
+    # O PBKDF2 é o gargalo: os hashes saem em paralelo nos processos do pool.
+    senhas = [senha for _, _, senha in novos if senha]
+    if pool and senhas:
+        tamanho = max(1, len(senhas) // ((os.cpu_count() or 1) * 4))
+        # O hasher vai junto para que os processos usem o mesmo algoritmo e
+        # número de iterações configurados aqui.
+        calcular = partial(make_password, hasher=get_hasher())
+        hashes = iter(pool.map(calcular, senhas, chunksize=tamanho))
+    else:
+        hashes = iter([make_password(senha) for senha in senhas])
+    for user, _, senha in novos:
+        user.password = next(hashes) if senha else make_password(None)
+
+    try:
+        with transaction.atomic():
+            usuarios = User.objects.bulk_create([user for user, _, _ in novos])
+            perfis = []
+            for user, (_, perfil, _) in zip(usuarios, novos):
+                perfil.user = user
+                perfis.append(perfil)
+            Perfil.objects.bulk_create(perfis)
+    except IntegrityError:
+        # Alguém criou um dos usuários entre a consulta e a gravação; o lote
+        # inteiro é desfeito e uma nova execução o importa sem duplicar.
+        resultado['falhas'] += len(novos)
+        _registrar_erro(resultado, f'registros {inicio}-{inicio + len(lote) - 1}: conflito concorrente, lote desfeito')
+        return
+    resultado['criados'] += len(novos)
+
+
+def provisionar_usuarios(registros, tamanho_lote=TAMANHO_LOTE, processos=None, senha_matricula=False):
+    resultado = {'criados': 0, 'existentes': 0, 'duplicados': 0, 'invalidos': 0, 'falhas': 0, 'erros': []}
+    pool = criar_pool(processos) if processos != 0 else None
+    try:
+        for numero, lote in enumerate(em_lotes(registros, tamanho_lote)):
+            _provisionar_lote(lote, numero * tamanho_lote + 1, pool, senha_matricula, resultado)
+    finally:
+        if pool:
+            pool.shutdown()
+    return resultado
+
+
+def provisionar_arquivo(caminho, formato=None, **opcoes):
+    formato = formato or detectar_formato(caminho)
+    with open(caminho, encoding='utf-8-sig', newline='') as arquivo:
+        return provisionar_usuarios(ler_registros(arquivo, formato), **opcoes)
+
+
+def liberar_reservas_vencidas(agora=None):
+    agora = agora or timezone.now()
+    vencidas = ImportacaoUsuarios.objects.filter(status='processando').filter(
+        Q(reservada_em__lt=agora - RESERVA) | Q(reservada_em__isnull=True),
+    )
+    falhas = 0
+    for importacao in vencidas.filter(tentativas__gte=TENTATIVAS):
+        importacao.arquivo.delete(save=False)
+        importacao.status = 'falhou'
+        importacao.resultado = {'erros': [f'interrompida {importacao.tentativas} vez(es); importação abandonada']}
+        importacao.concluida_em = agora
+        importacao.save(update_fields=['status', 'resultado', 'arquivo', 'concluida_em'])
+        falhas += 1
+    devolvidas = vencidas.update(status='pendente', reservada_em=None)
+    if falhas or devolvidas:
+        logger.warning('Importações de usuários interrompidas: %s de volta à fila, %s com falha.', devolvidas, falhas)
+    return devolvidas, falhas
+
+
+def processar_importacoes():
+    # Importações enviadas pela equipe ficam na fila; cada execução pega uma.
+    liberar_reservas_vencidas()
+    with transaction.atomic():
+        importacao = (
+            ImportacaoUsuarios.objects.select_for_update(skip_locked=True)
+            .filter(status='pendente').order_by('criado_em').first()
+        )
+        if importacao is None:
+            return None
+        importacao.status = 'processando'
+        importacao.reservada_em = timezone.now()
+        importacao.tentativas += 1
+        importacao.save(update_fields=['status', 'reservada_em', 'tentativas'])
+
+    try:
+        importacao.resultado = provisionar_arquivo(
+            importacao.arquivo.path,
+            importacao.formato,
+            senha_matricula=importacao.senha_matricula,
+        )
+        importacao.status = 'concluida'
+    except Exception as erro:
+        logger.exception('Falha na importação de usuários %s.', importacao.id)
+        importacao.resultado = {'erros': [str(erro)]}
+        importacao.status = 'falhou'
+    importacao.concluida_em = timezone.now()
+    # Só grava se a reserva ainda for desta execução. Senão a importação voltou
+    # para a fila, e quem a terminar ou abandonar apaga o arquivo.
+    gravada = ImportacaoUsuarios.objects.filter(
+        pk=importacao.pk, status='processando', reservada_em=importacao.reservada_em,
+    ).update(
+        status=importacao.status,
+        resultado=importacao.resultado,
+        arquivo='',
+        concluida_em=importacao.concluida_em,
+    )
+    if not gravada:
+        logger.warning('Importação de usuários %s terminou depois de perder a reserva; resultado descartado.', importacao.id)
+        importacao.refresh_from_db()
+        return importacao
+    # O arquivo pode conter senhas; não fica guardado depois do processamento.
+    importacao.arquivo.delete(save=False)
+    return importacao
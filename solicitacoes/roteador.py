@@ -0,0 +1,24 @@
+from django.db import DEFAULT_DB_ALIAS, connections
+
+LEITURA = 'leitura'
+
+
+class RoteadorLeitura:
+    # Leituras fora de transação vão para a conexão somente leitura. Dentro de
+    # um atomic() elas ficam na principal, a única que enxerga o que a própria
+    # transação ainda não confirmou. Como é o mesmo arquivo em WAL, não há
+    # atraso de replicação: o que foi confirmado já está visível na leitura.
+
+    def db_for_read(self, model, **hints):
+        if LEITURA in connections.settings and not connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return LEITURA
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != LEITURA
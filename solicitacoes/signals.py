@@ -0,0 +1,139 @@
+from django.db import connections, transaction
+
+from . import busca, cache_dashboard, eventos, notificacoes, papeis
+from .models import FILA_POR_PAPEL, RESPONSAVEL_POR_PAPEL, EstatisticaFila, Perfil, SolicitacaoArquivada
+
+ESCOPOS_FILAS = [f'fila:{papel}' for papel in FILA_POR_PAPEL]
+
+
+def _tem_tabela_solicitacoes(connection):
+    return 'solicitacoes_solicitacao' in connection.introspection.table_names()
+
+
+def suspender_indice_texto(sender, using='default', **kwargs):
+    connection = connections[using]
+    if _tem_tabela_solicitacoes(connection):
+        busca.suspender_gatilhos_texto(connection)
+
+
+def restaurar_indice_texto(sender, using='default', plan=None, **kwargs):
+    connection = connections[using]
+    if not _tem_tabela_solicitacoes(connection):
+        return
+    busca.restaurar_gatilhos_texto(connection)
+    if plan:
+        busca.reconstruir_indice_texto(connection)
+
+
+def _invalidar(*escopos):
+    cache_dashboard.invalidar(*escopos)
+    # Repete após o commit para descartar o que outra requisição tenha
+    # guardado em cache com os dados anteriores à transação.
+    transaction.on_commit(lambda: cache_dashboard.invalidar(*escopos))
+
+
+def invalidar_solicitacao(sender, instance, **kwargs):
+    responsaveis = {
+        getattr(instance, f'{campo}_id')
+        for campo in RESPONSAVEL_POR_PAPEL.values()
+    }
+    _invalidar(
+        *ESCOPOS_FILAS,
+        f'usuario:{instance.aluno_id}',
+        *(f'usuario:{user_id}' for user_id in responsaveis if user_id),
+    )
+
+
+def _escopos_dos_usuarios(solicitacoes):
+    escopos = set()
+    for solicitacao in solicitacoes:
+        escopos.add(f'usuario:{solicitacao.aluno_id}')
+        for campo in RESPONSAVEL_POR_PAPEL.values():
+            user_id = getattr(solicitacao, f'{campo}_id')
+            if user_id:
+                escopos.add(f'usuario:{user_id}')
+    return escopos
+
+
+def invalidar_decisoes(sender, solicitacoes, **kwargs):
+    _invalidar(*ESCOPOS_FILAS, *_escopos_dos_usuarios(solicitacoes))
+
+
+def invalidar_arquivadas(sender, solicitacoes, **kwargs):
+    # Encerradas não estão em fila: mudam só os históricos e as notificações.
+    _invalidar(
+        *_escopos_dos_usuarios(solicitacoes),
+        *{f'notificacoes:{solicitacao.aluno_id}' for solicitacao in solicitacoes},
+    )
+
+
+def invalidar_expiradas(sender, alunos, **kwargs):
+    _invalidar(*ESCOPOS_FILAS, *(f'usuario:{user_id}' for user_id in alunos))
+
+
+def publicar_solicitacao(sender, instance, **kwargs):
+    eventos.publicar_fila([instance])
+
+
+def publicar_decisoes(sender, solicitacoes, **kwargs):
+    eventos.publicar_fila(solicitacoes)
+
+
+def publicar_expiradas(sender, alunos, **kwargs):
+    eventos.publicar_fila([])
+
+
+def invalidar_notificacao(sender, instance, **kwargs):
+    _invalidar(f'notificacoes:{instance.user_id}')
+
+
+def descontar_nao_lida(sender, instance, **kwargs):
+    # Exclusões avulsas (em cascata com a solicitação, pelo admin); a purga e
+    # o arquivamento ajustam os contadores do lote de uma vez.
+    if not instance.lido:
+        notificacoes.ajustar_nao_lidas({instance.user_id: -1})
+
+
+def invalidar_disciplinas(sender, instance, **kwargs):
+    _invalidar('disciplinas', *ESCOPOS_FILAS)
+
+
+def invalidar_papel(sender, instance, **kwargs):
+    # Também no save do usuário: um id reaproveitado após um rollback (como
+    # nos testes) não herda o perfil de quem o usava antes.
+    papeis.invalidar(instance.user_id if sender is Perfil else instance.pk)
+
+
+def _apagar_miniatura(instance):
+    # A miniatura é gerada para uma única solicitação (fora do armazenamento
+    # deduplicado) e sai junto com a linha que a usa.
+    if instance.arquivo_miniatura:
+        storage, nome = instance.arquivo_miniatura.storage, instance.arquivo_miniatura.name
+        transaction.on_commit(lambda: storage.delete(nome))
+
+
+def liberar_arquivo(sender, instance, **kwargs):
+    # Devolve a referência ao blob; ele só é apagado quando ninguém mais o usa.
+    if instance.arquivo:
+        storage, nome = instance.arquivo.storage, instance.arquivo.name
+        transaction.on_commit(lambda: storage.delete(nome))
+    _apagar_miniatura(instance)
+
+
+def liberar_anexo_arquivado(sender, instance, **kwargs):
+    # A cópia em arquivadas/ não conta referências: sai quando nenhuma outra
+    # solicitação arquivada a usa. A miniatura passa para a linha arquivada
+    # e sai com ela.
+    if instance.arquivo:
+        storage, nome = instance.arquivo.storage, instance.arquivo.name
+
+        def apagar():
+            if not SolicitacaoArquivada.objects.filter(arquivo=nome).exists():
+                storage.delete(nome)
+        transaction.on_commit(apagar)
+    _apagar_miniatura(instance)
+
+
+def descontar_da_fila(sender, instance, **kwargs):
+    if instance.status == 'pendente' and instance.etapa_atual in FILA_POR_PAPEL:
+        EstatisticaFila.ajustar({(instance.disciplina_id, instance.etapa_atual): -1})
@@ -1,3 +1,1992 @@
-from django.test import TestCase
+import asyncio
+import base64
+import csv
+import gzip
+import hashlib
+import importlib
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core import mail
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import OperationalError, connections, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.http import HttpResponse
+from django.template import engines
+from django.template.base import Template as TemplateBase
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import benchmark, cache_dashboard, estaticos, estatisticas, instrumentacao, views
+from .arquivamento import arquivar_solicitacoes
+from .arquivos import processar_arquivos
+from .armazenamento import armazenamento
+from .busca import TAMANHO_PAGINA, decodificar_cursor, filtrar_solicitacoes, paginar
+from .models import (
+    MENSAGEM_EXPIRACAO,
+    ArquivoArmazenado,
+    DecisaoConcorrente,
+    Disciplina,
+    EstatisticaDecisao,
+    EstatisticaFila,
+    EventoNotificacao,
+    Exportacao,
+    ImportacaoUsuarios,
+    Notificacao,
+    Perfil,
+    Solicitacao,
+    SolicitacaoArquivada,
+    TokenApi,
+    UploadParcial,
+    solicitacoes_expiradas,
+)
+from .eventos import BrokerLocal, obter_broker
+from .exportacao import TENTATIVAS, _gravar, processar_exportacoes
+from .importacao import importar_disciplinas
+from .notificacoes import marcar_lidas, processar_notificacoes, purgar_notificacoes, recontar_nao_lidas
+from .provisionamento import TENTATIVAS as TENTATIVAS_IMPORTACAO, processar_importacoes, provisionar_usuarios
+
+
+def criar_usuario(username, tipo):
+    user = User.objects.create_user(username=username, password='senha-teste', first_name=username)
+    Perfil.objects.create(user=user, tipo=tipo)
+    return user
+
+
+class ConsultasDashboardTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.aluno = criar_usuario('aluno', 'aluno')
+        cls.coordenador = criar_usuario('coordenador', 'coordenador')
+        cls.secretaria = criar_usuario('secretaria', 'secretaria')
+        cls.professor = criar_usuario('professor', 'professor')
+        cls.disciplinas = [
+            Disciplina.objects.create(codigo=f'D{i:03}', nome=f'Disciplina {i}')
+            for i in range(5)
+        ]
+
+    def criar_solicitacoes(self, quantidade, **campos):
+        prazo = timezone.now() + timedelta(days=7)
+        for i in range(quantidade):
+            Solicitacao.objects.create(
+                aluno=self.aluno,
+                disciplina=self.disciplinas[i % len(self.disciplinas)],
+                motivo=f'Motivo {i}',
+                data_limite=prazo,
+                **campos,
+            )
+
+    def assert_consultas(self, usuario, quantidade, **campos):
+        url = reverse('dashboard_aluno' if usuario == self.aluno else 'dashboard_professor')
+        self.client.force_login(usuario)
+        for linhas in (3, 30):
+            self.criar_solicitacoes(linhas, **campos)
+            caches[settings.DASHBOARD_CACHE].clear()
+            with self.assertNumQueries(quantidade):
+                resposta = self.client.get(url)
+            self.assertEqual(resposta.status_code, 200)
+
+    def test_dashboard_aluno(self):
+        # usuário, perfil (o cache foi limpo), solicitações, notificações e o
+        # contador de não lidas; a sessão vem do cache
+        self.assert_consultas(self.aluno, 5)
+
+    def test_dashboard_coordenador(self):
+        # usuário, perfil, fila pendente e histórico
+        self.assert_consultas(self.coordenador, 4, coordenador_responsavel=self.coordenador)
+
+    def test_dashboard_secretaria(self):
+        self.assert_consultas(self.secretaria, 4, coordenador_status='aprovada')
+
+    def test_dashboard_professor(self):
+        self.assert_consultas(
+            self.professor,
+            4,
+            coordenador_status='aprovada',
+            secretaria_status='aprovada',
+        )
+
+    async def test_dashboards_pelo_asgi(self):
+        await sync_to_async(self.criar_solicitacoes)(3)
+        await self.async_client.aforce_login(self.coordenador)
+        resposta = await self.async_client.get(reverse('dashboard_professor'))
+        self.assertEqual(resposta.status_code, 200)
+        self.assertContains(resposta, 'Motivo 2')
+
+        await self.async_client.aforce_login(self.aluno)
+        resposta = await self.async_client.get(reverse('dashboard_aluno'))
+        self.assertContains(resposta, 'Motivo 2')
+        resposta = await self.async_client.get(reverse('dashboard_professor'))
+        self.assertRedirects(resposta, reverse('dashboard_aluno'), fetch_redirect_response=False)
+
+
+class FilaPorPapelTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.aluno = criar_usuario('aluno', 'aluno')
+        cls.coordenador = criar_usuario('coordenador', 'coordenador')
+        cls.disciplina = Disciplina.objects.create(codigo='ALG001', nome='Algoritmos')
+
+    def test_filas_seguem_pode_avaliar(self):
+        prazo = timezone.now() + timedelta(days=7)
+        combinacoes = [
+            ('pendente', 'pendente', 'pendente'),
+            ('aprovada', 'pendente', 'pendente'),
+            ('aprovada', 'aprovada', 'pendente'),
+            ('aprovada', 'aprovada', 'aprovada'),
+            ('rejeitada', 'pendente', 'pendente'),
+        ]
+        for coordenador, secretaria, professor in combinacoes:
+            Solicitacao.objects.create(
+                aluno=self.aluno,
+                disciplina=self.disciplina,
+                motivo='Atestado',
+                data_limite=prazo,
+                coordenador_status=coordenador,
+                secretaria_status=secretaria,
+                professor_status=professor,
+            )
+        Solicitacao.objects.create(
+            aluno=self.aluno,
+            disciplina=self.disciplina,
+            motivo='Fora do prazo',
+            data_limite=timezone.now() - timedelta(days=1),
+        )
+
+        for papel in ['coordenador', 'secretaria', 'professor']:
+            esperadas = {s.id for s in Solicitacao.objects.all() if s.pode_avaliar(papel)}
+            obtidas = set(Solicitacao.objects.pendentes_para(papel).values_list('id', flat=True))
+            self.assertEqual(obtidas, esperadas, papel)
+
+        self.assertFalse(Solicitacao.objects.pendentes_para('aluno').exists())
+
+    def test_avaliadas_por(self):
+        Solicitacao.objects.create(
+            aluno=self.aluno,
+            disciplina=self.disciplina,
+            motivo='Atestado',
+            coordenador_responsavel=self.coordenador,
+        )
+        self.assertEqual(Solicitacao.objects.avaliadas_por(self.coordenador, 'coordenador').count(), 1)
+        self.assertEqual(Solicitacao.objects.avaliadas_por(self.coordenador, 'secretaria').count(), 0)
+        self.assertEqual(Solicitacao.objects.avaliadas_por(self.coordenador).count(), 1)
+
+
+class EtapaAtualTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.aluno = criar_usuario('aluno', 'aluno')
+        cls.coordenador = criar_usuario('coordenador', 'coordenador')
+        cls.secretaria = criar_usuario('secretaria', 'secretaria')
+        cls.disciplina = Disciplina.objects.create(codigo='ALG001', nome='Algoritmos')
+
+    def criar_solicitacao(self, **campos):
+        return Solicitacao.objects.create(
+            aluno=self.aluno, disciplina=self.disciplina, motivo='Atestado',
+            data_limite=timezone.now() + timedelta(days=7), **campos,
+        )
+
+    def etapa_gravada(self, solicitacao):
+        return Solicitacao.objects.values_list('etapa_atual', flat=True).get(pk=solicitacao.pk)
+
+    def test_save_recalcula_a_etapa(self):
+        solicitacao = self.criar_solicitacao()
+        self.assertEqual(self.etapa_gravada(solicitacao), 'coordenador')
+        solicitacao.coordenador_status = 'aprovada'
+        solicitacao.save(update_fields=['coordenador_status'])
+        self.assertEqual(self.etapa_gravada(solicitacao), 'secretaria')
+        solicitacao.status = 'rejeitada'
+        solicitacao.save()
+        self.assertEqual(self.etapa_gravada(solicitacao), 'concluida')
+
+    def test_registrar_decisao_avanca_a_etapa(self):
+        solicitacao = self.criar_solicitacao()
+        solicitacao.registrar_decisao('coordenador', self.coordenador, 'aprovada', 'Ok')
+        self.assertEqual(self.etapa_gravada(solicitacao), 'secretaria')
+        solicitacao.registrar_decisao('secretaria', self.secretaria, 'rejeitada', 'Fora do prazo')
+        self.assertEqual(self.etapa_gravada(solicitacao), 'concluida')
+        self.assertFalse(Solicitacao.objects.pendentes_para('secretaria').exists())
+
+    def test_expirar_conclui_a_etapa(self):
+        vencida = self.criar_solicitacao(coordenador_status='aprovada')
+        Solicitacao.objects.filter(pk=vencida.pk).update(data_limite=timezone.now() - timedelta(days=1))
+        no_prazo = self.criar_solicitacao()
+        self.assertEqual(self.etapa_gravada(vencida), 'secretaria')
+
+        self.assertEqual(Solicitacao.objects.expirar(), 1)
+        self.assertEqual(self.etapa_gravada(vencida), 'concluida')
+        self.assertEqual(self.etapa_gravada(no_prazo), 'coordenador')
+
+
+class ExpiracaoTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.aluno = criar_usuario('aluno', 'aluno')
+        cls.outro = criar_usuario('outro', 'aluno')
+        cls.coordenador = criar_usuario('coordenador', 'coordenador')
+        cls.secretaria = criar_usuario('secretaria', 'secretaria')
+        cls.disciplina = Disciplina.objects.create(codigo='ALG001', nome='Algoritmos')
+
+    def criar(self, dias, aluno=None, **campos):
+        return Solicitacao.objects.create(
+            aluno=aluno or self.aluno, disciplina=self.disciplina, motivo='Atestado',
+            data_limite=timezone.now() + timedelta(days=dias), **campos,
+        )
+
+    def criar_vencida(self, **campos):
+        solicitacao = self.criar(7, **campos)
+        Solicitacao.objects.filter(pk=solicitacao.pk).update(data_limite=timezone.now() - timedelta(days=1))
+        return solicitacao
+
+    def test_um_update_rejeita_so_as_pendentes_vencidas(self):
+        vencida = self.criar_vencida()
+        com_observacao = self.criar_vencida(aluno=self.outro, coordenador_status='aprovada', observacoes_professor='Aguardando laudo')
+        aprovada = self.criar_vencida(status='aprovada')
+        no_prazo = self.criar(7)
+
+        with CaptureQueriesContext(connections['default']) as consultas:
+            self.assertEqual(Solicitacao.objects.expirar(), 2)
+        atualizacoes = [
+            consulta['sql'] for consulta in consultas
+            if consulta['sql'].startswith('UPDATE "solicitacoes_solicitacao"')
+        ]
+        self.assertEqual(len(atualizacoes), 1)
+
+        linhas = dict(Solicitacao.objects.values_list('id', 'status'))
+        self.assertEqual(linhas, {
+            vencida.id: 'rejeitada', com_observacao.id: 'rejeitada', aprovada.id: 'aprovada', no_prazo.id: 'pendente',
+        })
+        observacoes = dict(Solicitacao.objects.values_list('id', 'observacoes_professor'))
+        self.assertEqual(observacoes[com_observacao.id], 'Aguardando laudo')
+        self.assertEqual(observacoes[vencida.id], MENSAGEM_EXPIRACAO)
+        self.assertEqual(Solicitacao.objects.expirar(), 0)
+
+    def test_estatisticas_e_sinal(self):
+        self.criar_vencida()
+        self.criar_vencida(aluno=self.outro, coordenador_status='aprovada')
+        self.criar(7)
+        receptor = mock.Mock()
+        solicitacoes_expiradas.connect(receptor)
+        self.addCleanup(solicitacoes_expiradas.disconnect, receptor)
+
+        saida = io.StringIO()
+        call_command('expirar_solicitacoes', stdout=saida)
+        self.assertIn('Solicitações expiradas: 2', saida.getvalue())
+
+        receptor.assert_called_once()
+        self.assertEqual(receptor.call_args.kwargs['alunos'], {self.aluno.pk, self.outro.pk})
+        filas = {
+            etapa: (pendentes, expiradas)
+            for etapa, pendentes, expiradas in EstatisticaFila.objects.values_list('etapa', 'pendentes', 'expiradas')
+        }
+        self.assertEqual(filas, {'coordenador': (1, 1), 'secretaria': (0, 1)})
+
+    def test_dashboards_nao_gravam(self):
+        self.criar_vencida()
+        self.criar_vencida(coordenador_status='aprovada')
+        self.criar(7)
+        for usuario, nome in [
+            (self.aluno, 'dashboard_aluno'),
+            (self.coordenador, 'dashboard_professor'),
+            (self.secretaria, 'dashboard_professor'),
+        ]:
+            self.client.force_login(usuario)
+            caches[settings.DASHBOARD_CACHE].clear()
+            resumo = benchmark.medir(lambda i: self.client.get(reverse(nome)), 1)
+            self.assertEqual(resumo['erros'], 0)
+            self.assertEqual(resumo['linhas_escritas'], 0, nome)
+        self.assertEqual(Solicitacao.objects.filter(status='pendente').count(), 3)
+
+
+class AgendadorTests(SimpleTestCase):
+    def test_servidor_so_inicia_com_a_configuracao(self):
+        for nome in ('segunda_chamada.wsgi', 'segunda_chamada.asgi'):
+            with self.subTest(nome), mock.patch('solicitacoes.agendador.iniciar_agendador') as iniciar:
+                modulo = importlib.import_module(nome)
+                importlib.reload(modulo)
+                iniciar.assert_not_called()
+                with override_settings(AGENDADOR=True):
+                    importlib.reload(modulo)
+                iniciar.assert_called_once_with()
+
+
+class BuscaSolicitacoesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.aluno = criar_usuario('aluno', 'aluno')
+        cls.outro = criar_usuario('outro', 'aluno')
+        cls.algoritmos = Disciplina.objects.create(codigo='ALG001', nome='Algoritmos')
+        cls.calculo = Disciplina.objects.create(codigo='CAL001', nome='Cálculo Diferencial')
+
+    def setUp(self):
+        caches[settings.DASHBOARD_CACHE].clear()
+
+    def criar(self, motivo='Atestado', disciplina=None, aluno=None, **campos):
+        return Solicitacao.objects.create(
+            aluno=aluno or self.aluno, disciplina=disciplina or self.algoritmos, motivo=motivo, **campos,
+        )
+
+    def ids(self, queryset):
+        return set(queryset.values_list('id', flat=True))
+
+    def test_busca_por_motivo_e_por_disciplina(self):
+        atestado = self.criar('Atestado médico por gripe')
+        viagem = self.criar('Viagem a trabalho', disciplina=self.calculo)
+        self.criar('Atestado médico', aluno=self.outro)
+        do_aluno = Solicitacao.objects.filter(aluno=self.aluno)
+
+        self.assertEqual(self.ids(filtrar_solicitacoes(do_aluno, termo='gripe')), {atestado.id})
+        self.assertEqual(self.ids(filtrar_solicitacoes(do_aluno, termo='medico')), {atestado.id})
+        self.assertEqual(self.ids(filtrar_solicitacoes(do_aluno, termo='calculo')), {viagem.id})
+        self.assertEqual(self.ids(filtrar_solicitacoes(do_aluno, termo='Difer')), {viagem.id})
+        self.assertEqual(self.ids(filtrar_solicitacoes(do_aluno, termo='!!!')), {atestado.id, viagem.id})
+
+        # Renomear a disciplina atualiza o índice.
+        self.calculo.nome = 'Geometria Analítica'
+        self.calculo.save()
+        self.assertEqual(self.ids(filtrar_solicitacoes(do_aluno, termo='geometria')), {viagem.id})
+        self.assertFalse(filtrar_solicitacoes(do_aluno, termo='calculo').exists())
+
+    def test_filtro_por_status(self):
+        pendente = self.criar()
+        rejeitada = self.criar(status='rejeitada')
+        do_aluno = Solicitacao.objects.filter(aluno=self.aluno)
+        self.assertEqual(self.ids(filtrar_solicitacoes(do_aluno, status='rejeitada')), {rejeitada.id})
+        self.assertEqual(self.ids(filtrar_solicitacoes(do_aluno, status='pendente')), {pendente.id})
+        # Status desconhecido não filtra.
+        self.assertEqual(self.ids(filtrar_solicitacoes(do_aluno, status='qualquer')), {pendente.id, rejeitada.id})
+
+    def test_paginacao_por_cursor_com_empates(self):
+        solicitacoes = [self.criar(f'Motivo {i}') for i in range(7)]
+        # Quatro pedidos no mesmo instante: o id desempata.
+        instante = timezone.now() - timedelta(days=1)
+        Solicitacao.objects.filter(pk__in=[s.pk for s in solicitacoes[1:5]]).update(data_solicitacao=instante)
+
+        esperado = list(Solicitacao.objects.order_by('-data_solicitacao', '-id').values_list('id', flat=True))
+        lidos, cursor, paginas = [], None, 0
+        while True:
+            pagina, cursor = paginar(Solicitacao.objects.filter(aluno=self.aluno), cursor, tamanho=2)
+            lidos.extend(solicitacao.id for solicitacao in pagina)
+            paginas += 1
+            if cursor is None:
+                break
+        self.assertEqual(lidos, esperado)
+        self.assertEqual(paginas, 4)
+
+    def test_cursor_invalido_volta_a_primeira_pagina(self):
+        for i in range(3):
+            self.criar(f'Motivo {i}')
+        primeira, _ = paginar(Solicitacao.objects.all(), tamanho=2)
+        forjados = [
+            'nao-e-base64!',
+            base64.urlsafe_b64encode(b'ontem|1').decode(),
+            base64.urlsafe_b64encode(b'2026-01-01T00:00:00+00:00|abc').decode(),
+            base64.urlsafe_b64encode(b'2026-01-01T00:00:00+00:00|1|2').decode(),
+            base64.urlsafe_b64encode('\xff\xfe'.encode('latin-1')).decode(),
+        ]
+        for cursor in forjados:
+            self.assertIsNone(decodificar_cursor(cursor), cursor)
+            self.assertEqual(paginar(Solicitacao.objects.all(), cursor, tamanho=2)[0], primeira)
+
+        self.client.force_login(self.aluno)
+        resposta = self.client.get(reverse('solicitacoes_aluno_json'), {'cursor': forjados[1]})
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(len(resposta.json()['resultados']), 3)
+
+    def test_json_do_dashboard_do_aluno(self):
+        solicitacoes = [self.criar(f'Motivo {i}') for i in range(TAMANHO_PAGINA + 1)]
+        rejeitada = self.criar('Viagem', disciplina=self.calculo, status='rejeitada')
+        self.criar('Atestado', aluno=self.outro)
+        self.client.force_login(self.aluno)
+        url = reverse('solicitacoes_aluno_json')
+
+        dados = self.client.get(url).json()
+        self.assertEqual(len(dados['resultados']), TAMANHO_PAGINA)
+        self.assertEqual(dados['resultados'][0], {
+            'id': rejeitada.id,
+            'disciplina': 'Cálculo Diferencial',
+            'status': 'rejeitada',
+            'data_solicitacao': rejeitada.data_solicitacao.isoformat(),
+        })
+        self.assertIn('Viagem', dados['html'])
+        dados = self.client.get(url, {'cursor': dados['proximo']}).json()
+        self.assertEqual([linha['id'] for linha in dados['resultados']], [solicitacoes[1].id, solicitacoes[0].id])
+        self.assertIsNone(dados['proximo'])
+
+        dados = self.client.get(url, {'q': 'viagem', 'status': 'rejeitada'}).json()
+        self.assertEqual([linha['id'] for linha in dados['resultados']], [rejeitada.id])
+        self.assertIsNone(dados['proximo'])
+        self.assertFalse(self.client.get(url, {'q': 'viagem', 'status': 'pendente'}).json()['resultados'])
+
+
+class MigracaoEtapaAtualTests(TransactionTestCase):
+    databases = {'default', 'leitura'}
+    antes = [('solicitacoes', '0006_busca_solicitacoes')]
+    depois = [('solicitacoes', '0007_solicitacao_etapa_atual')]
+
+    def setUp(self):
+        self.executor = MigrationExecutor(connections['default'])
+        self.final = self.executor.loader.graph.leaf_nodes()
+        self.executor.migrate(self.antes)
+
+    def tearDown(self):
+        executor = MigrationExecutor(connections['default'])
+        executor.migrate(self.final)
+
+    def test_preenche_etapa_das_linhas_existentes(self):
+        apps = self.executor.loader.project_state(self.antes).apps
+        usuario = apps.get_model('auth', 'User').objects.create(username='aluno')
+        disciplina = apps.get_model('solicitacoes', 'Disciplina').objects.create(codigo='ALG001', nome='Algoritmos')
+        Antiga = apps.get_model('solicitacoes', 'Solicitacao')
+        combinacoes = {
+            ('pendente', 'pendente', 'pendente', 'pendente'): 'coordenador',
+            ('pendente', 'aprovada', 'pendente', 'pendente'): 'secretaria',
+            ('pendente', 'aprovada', 'aprovada', 'pendente'): 'professor',
+            ('aprovada', 'aprovada', 'aprovada', 'aprovada'): 'concluida',
+            ('rejeitada', 'rejeitada', 'pendente', 'pendente'): 'concluida',
+            ('rejeitada', 'pendente', 'pendente', 'pendente'): 'concluida',
+        }
+        ids = {}
+        for campos, etapa in combinacoes.items():
+            status, coordenador, secretaria, professor = campos
+            solicitacao = Antiga.objects.create(
+                aluno=usuario, disciplina=disciplina, motivo='Atestado', status=status,
+                coordenador_status=coordenador, secretaria_status=secretaria, professor_status=professor,
+            )
+            ids[solicitacao.pk] = etapa
+
+        executor = MigrationExecutor(connections['default'])
+        executor.migrate(self.depois)
+        Nova = executor.loader.project_state(self.depois).apps.get_model('solicitacoes', 'Solicitacao')
+        self.assertEqual(dict(Nova.objects.values_list('id', 'etapa_atual')), ids)
+
+
+class CacheDashboardTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.aluno = criar_usuario('aluno', 'aluno')
+        cls.coordenador = criar_usuario('coordenador', 'coordenador')
+        cls.disciplina = Disciplina.objects.create(codigo='ALG001', nome='Algoritmos')
+
+    def setUp(self):
+        caches[settings.DASHBOARD_CACHE].clear()
+        cache_dashboard.zerar_estatisticas()
+        self.client.force_login(self.coordenador)
+
+    def criar_solicitacao(self):
+        return Solicitacao.objects.create(aluno=self.aluno, disciplina=self.disciplina, motivo='Atestado')
+
+    def test_segunda_visita_usa_cache(self):
+        self.criar_solicitacao()
+        self.client.get(reverse('dashboard_professor'))
+        # só o usuário: sessão, perfil e listagens vêm do cache
+        with self.assertNumQueries(1):
+            resposta = self.client.get(reverse('dashboard_professor'))
+        self.assertEqual(len(resposta.context['solicitacoes_pendentes']), 1)
+        self.assertContains(resposta, '<td class="px-6 py-4 whitespace-nowrap">', html=False)
+        self.assertEqual(cache_dashboard.estatisticas()['hits'], 2)
+
+    def test_nova_solicitacao_invalida_fila(self):
+        self.criar_solicitacao()
+        self.client.get(reverse('dashboard_professor'))
+        self.criar_solicitacao()
+        resposta = self.client.get(reverse('dashboard_professor'))
+        self.assertEqual(len(resposta.context['solicitacoes_pendentes']), 2)
+
+    def test_decisao_move_pedido_entre_filas(self):
+        solicitacao = self.criar_solicitacao()
+        self.client.get(reverse('dashboard_professor'))
+        solicitacao.registrar_decisao('coordenador', self.coordenador, 'aprovada', 'Ok')
+        resposta = self.client.get(reverse('dashboard_professor'))
+        self.assertEqual(len(resposta.context['solicitacoes_pendentes']), 0)
+        self.assertEqual(len(resposta.context['solicitacoes_avaliadas']), 1)
+
+
+class PapeisTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.aluno = criar_usuario('aluno', 'aluno')
+        cls.coordenador = criar_usuario('coordenador', 'coordenador')
+        cls.sem_perfil = User.objects.create_user('sem_perfil', password='senha-teste')
+        cls.staff = User.objects.create_user('staff', password='senha-teste', is_staff=True)
+
+    def setUp(self):
+        caches[settings.DASHBOARD_CACHE].clear()
+
+    def test_papel_em_cache_ate_o_perfil_mudar(self):
+        self.client.force_login(self.coordenador)
+        self.assertEqual(self.client.get(reverse('fila_pendentes')).status_code, 200)
+        # só o usuário: o perfil e a fila vêm do cache
+        with self.assertNumQueries(1):
+            self.client.get(reverse('fila_pendentes'))
+        perfil = Perfil.objects.get(user=self.coordenador)
+        perfil.tipo = 'aluno'
+        perfil.save()
+        self.assertEqual(self.client.get(reverse('fila_pendentes')).status_code, 403)
+        self.assertRedirects(
+            self.client.get(reverse('dashboard_professor')),
+            reverse('dashboard_aluno'),
+            fetch_redirect_response=False,
+        )
+
+    def test_papel_requerido(self):
+        casos = [
+            (self.aluno, 'solicitacoes_aluno_json', 200),
+            (self.sem_perfil, 'solicitacoes_aluno_json', 200),
+            (self.coordenador, 'solicitacoes_aluno_json', 403),
+            (self.aluno, 'fila_pendentes', 403),
+            (self.sem_perfil, 'relatorio_estatisticas', 403),
+            (self.staff, 'relatorio_estatisticas', 200),
+            (self.coordenador, 'relatorio_estatisticas', 200),
+        ]
+        for usuario, view, status in casos:
+            with self.subTest(usuario=usuario.username, view=view):
+                self.client.force_login(usuario)
+                self.assertEqual(self.client.get(reverse(view)).status_code, status)
+        self.client.force_login(self.sem_perfil)
+        self.assertRedirects(
+            self.client.get(reverse('dashboard_professor')),
+            reverse('dashboard_aluno'),
+            fetch_redirect_response=False,
+        )
+        self.assertEqual(self.client.get(reverse('dashboard_aluno')).status_code, 200)
+
+    async def test_papel_sob_asgi(self):
+        await self.async_client.aforce_login(self.coordenador)
+        resposta = await self.async_client.get(reverse('dashboard_professor'))
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.context['papel'], 'coordenador')
+        resposta = await self.async_client.get(reverse('dashboard_aluno'))
+        self.assertRedirects(resposta, reverse('dashboard_professor'), fetch_redirect_response=False)
+
+
+class DecisaoEmLoteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.aluno = criar_usuario('aluno', 'aluno')
+        cls.coordenador = criar_usuario('coordenador', 'coordenador')
+        cls.professor = criar_usuario('professor', 'professor')
+        cls.disciplina = Disciplina.objects.create(codigo='ALG001', nome='Algoritmos')
+
+    def criar_solicitacao(self, **campos):
+        return Solicitacao.objects.create(
+            aluno=self.aluno,
+            disciplina=self.disciplina,
+            motivo='Atestado',
+            data_limite=timezone.now() + timedelta(days=7),
+            **campos,
+        )
+
+    def postar(self, dados):
+        return self.client.post(reverse('avaliar_em_lote'), dados, content_type='application/json')
+
+    def test_json_malformado_responde_400(self):
+        solicitacao = self.criar_solicitacao()
+        self.client.force_login(self.coordenador)
+        corpos = [
+            [solicitacao.id],
+            5,
+            {'ids': str(solicitacao.id), 'decisao': 'aprovada', 'observacoes': 'Ok'},
+            {'ids': [solicitacao.id, '2'], 'decisao': 'aprovada', 'observacoes': 'Ok'},
+            {'ids': [True], 'decisao': 'aprovada', 'observacoes': 'Ok'},
+            {'ids': [solicitacao.id], 'decisao': 'aprovada', 'observacoes': ['Ok']},
+        ]
+        for corpo in corpos:
+            resposta = self.postar(corpo)
+            self.assertEqual(resposta.status_code, 400, corpo)
+            self.assertIn('erro', resposta.json())
+        resposta = self.client.post(reverse('avaliar_em_lote'), 'nao é json', content_type='application/json')
+        self.assertEqual(resposta.json(), {'erro': 'JSON inválido.'})
+        self.assertEqual(Solicitacao.objects.get().coordenador_status, 'pendente')
+
+    def test_aplica_decisao_e_relata_cada_item(self):
+        pendentes = [self.criar_solicitacao() for _ in range(3)]
+        ja_avaliada = self.criar_solicitacao(coordenador_status='aprovada')
+        ids = [s.id for s in pendentes] + [ja_avaliada.id, 999999]
+
+        self.client.force_login(self.coordenador)
+        resposta = self.postar({'ids': ids, 'decisao': 'aprovada', 'observacoes': 'Documentação ok'})
+
+        self.assertEqual(resposta.status_code, 200)
+        resultados = {item['id']: item for item in resposta.json()['resultados']}
+        self.assertTrue(all(resultados[s.id]['ok'] for s in pendentes))
+        self.assertEqual(resultados[ja_avaliada.id]['resultado'], 'fora da sua fila')
+        self.assertEqual(resultados[999999]['resultado'], 'não encontrada')
+
+        processar_notificacoes()
+        for solicitacao in pendentes:
+            solicitacao.refresh_from_db()
+            self.assertEqual(solicitacao.coordenador_status, 'aprovada')
+            self.assertEqual(solicitacao.coordenador_responsavel, self.coordenador)
+            self.assertEqual(solicitacao.etapa_atual, 'secretaria')
+            self.assertEqual(solicitacao.notificacoes.count(), 1)
+
+    def test_consultas_nao_crescem_com_o_lote(self):
+        ids = [self.criar_solicitacao().id for _ in range(21)]
+        self.client.force_login(self.coordenador)
+        # A primeira decisão cria as linhas de estatística; as seguintes só as atualizam.
+        self.postar({'ids': ids[:1], 'decisao': 'aprovada', 'observacoes': 'Ok'})
+        # usuário, savepoint, leitura, bulk_update, estatísticas (leitura e
+        # UPDATE das decisões e das filas), bulk_create e liberação do
+        # savepoint; sessão e perfil vêm do cache
+        with self.assertNumQueries(10):
+            self.postar({'ids': ids[1:], 'decisao': 'aprovada', 'observacoes': 'Ok'})
+
+    def test_professor_nao_decide_em_lote(self):
+        solicitacao = self.criar_solicitacao(coordenador_status='aprovada', secretaria_status='aprovada')
+        self.client.force_login(self.professor)
+        resposta = self.postar({'ids': [solicitacao.id], 'decisao': 'aprovada'})
+        self.assertEqual(resposta.status_code, 403)
+
+    def test_coordenador_precisa_justificar(self):
+        solicitacao = self.criar_solicitacao()
+        self.client.force_login(self.coordenador)
+        resposta = self.postar({'ids': [solicitacao.id], 'decisao': 'aprovada'})
+        self.assertEqual(resposta.status_code, 400)
+
+
+class DecisaoConcorrenteTests(TransactionTestCase):
+    databases = {'default', 'leitura'}
+
+    def setUp(self):
+        self.aluno = criar_usuario('aluno', 'aluno')
+        self.coordenadores = [criar_usuario(f'coordenador{indice}', 'coordenador') for indice in range(4)]
+        self.solicitacao = Solicitacao.objects.create(
+            aluno=self.aluno,
+            disciplina=Disciplina.objects.create(codigo='ALG001', nome='Algoritmos'),
+            motivo='Atestado',
+            data_limite=timezone.now() + timedelta(days=7),
+        )
+
+    def test_copia_desatualizada_nao_sobrescreve_a_decisao(self):
+        primeira = Solicitacao.objects.get(pk=self.solicitacao.pk)
+        segunda = Solicitacao.objects.get(pk=self.solicitacao.pk)
+        primeira.registrar_decisao('coordenador', self.coordenadores[0], 'aprovada', 'Ok')
+
+        with self.assertRaises(DecisaoConcorrente):
+            segunda.registrar_decisao('coordenador', self.coordenadores[1], 'rejeitada', 'Não')
+        # A cópia volta ao estado gravado, sem a decisão recusada.
+        self.assertEqual(segunda.coordenador_status, 'aprovada')
+        self.assertEqual(segunda.coordenador_responsavel, self.coordenadores[0])
+        self.assertEqual(segunda.etapa_atual, 'secretaria')
+        self.assertEqual(EstatisticaDecisao.objects.get().aprovadas, 1)
+
+    def test_decisoes_simultaneas_tem_um_vencedor(self):
+        barreira = threading.Barrier(len(self.coordenadores))
+        resultados = []
+
+        def decidir(coordenador, decisao):
+            copia = Solicitacao.objects.get(pk=self.solicitacao.pk)
+            barreira.wait()
+            try:
+                while True:
+                    try:
+                        copia.registrar_decisao('coordenador', coordenador, decisao, 'Justificativa')
+                        resultados.append(coordenador)
+                    except DecisaoConcorrente:
+                        resultados.append(None)
+                    except OperationalError:
+                        # O banco de teste em memória (cache compartilhado)
+                        # recusa em vez de esperar o timeout; repete a espera.
+                        time.sleep(0.01)
+                        continue
+                    break
+            finally:
+                connections.close_all()
+
+        threads = [
+            threading.Thread(target=decidir, args=(coordenador, 'aprovada' if indice % 2 else 'rejeitada'))
+            for indice, coordenador in enumerate(self.coordenadores)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        vencedores = [coordenador for coordenador in resultados if coordenador]
+        self.assertEqual(len(resultados), len(self.coordenadores))
+        self.assertEqual(len(vencedores), 1)
+        self.solicitacao.refresh_from_db()
+        self.assertEqual(self.solicitacao.coordenador_responsavel, vencedores[0])
+        estatistica = EstatisticaDecisao.objects.get()
+        self.assertEqual(estatistica.aprovadas + estatistica.rejeitadas, 1)
+
+
+class NotificacoesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.aluno = criar_usuario('aluno', 'aluno')
+        cls.aluno.email = 'aluno@example.com'
+        cls.aluno.save()
+        cls.disciplina = Disciplina.objects.create(codigo='ALG001', nome='Algoritmos')
+
+    def setUp(self):
+        caches[settings.DASHBOARD_CACHE].clear()
+
+    def criar_solicitacao(self):
+        return Solicitacao.objects.create(aluno=self.aluno, disciplina=self.disciplina, motivo='Atestado')
+
+    def test_notificar_aluno_apenas_enfileira(self):
+        solicitacao = self.criar_solicitacao()
+        solicitacao.notificar_aluno('Seu pedido foi aprovada pelo coordenador.')
+        self.assertEqual(EventoNotificacao.objects.count(), 1)
+        self.assertFalse(Notificacao.objects.exists())
+
+    def test_processamento_em_lotes_com_email(self):
+        solicitacao = self.criar_solicitacao()
+        for i in range(5):
+            solicitacao.notificar_aluno(f'Mensagem {i}')
+
+        entregues, enviados = processar_notificacoes(tamanho_lote=2, enviar_email=True)
+
+        self.assertEqual((entregues, enviados), (5, 5))
+        self.assertEqual(Notificacao.objects.filter(user=self.aluno).count(), 5)
+        self.assertFalse(EventoNotificacao.objects.exists())
+        self.assertEqual(len(mail.outbox), 5)
+
+    def test_email_que_falha_fica_na_fila(self):
+        solicitacao = self.criar_solicitacao()
+        for i in range(3):
+            solicitacao.notificar_aluno(f'Mensagem {i}')
+        envio = 'django.core.mail.backends.locmem.EmailBackend.send_messages'
+        with mock.patch(envio, side_effect=[1, OSError('SMTP fora do ar')]):
+            with self.assertLogs('solicitacoes.notificacoes', 'ERROR'):
+                self.assertEqual(processar_notificacoes(enviar_email=True), (3, 1))
+
+        # O painel já recebeu as três; os dois e-mails que não saíram esperam.
+        self.assertEqual(Notificacao.objects.count(), 3)
+        pendentes = EventoNotificacao.objects.order_by('id')
+        self.assertEqual([evento.tentativas_email for evento in pendentes], [1, 1])
+        self.assertEqual(processar_notificacoes(enviar_email=True), (0, 0))
+
+        pendentes.update(proxima_tentativa=timezone.now())
+        self.assertEqual(processar_notificacoes(enviar_email=True), (0, 2))
+        self.assertEqual([email.body for email in mail.outbox], ['Mensagem 1', 'Mensagem 2'])
+        self.assertFalse(EventoNotificacao.objects.exists())
+        self.assertEqual(Notificacao.objects.count(), 3)
+
+    @override_settings(NOTIFICACOES_EMAIL_TENTATIVAS=2)
+    def test_email_descartado_apos_tentativas(self):
+        self.criar_solicitacao().notificar_aluno('Mensagem')
+        envio = 'django.core.mail.backends.locmem.EmailBackend.send_messages'
+        with mock.patch(envio, side_effect=OSError('SMTP fora do ar')), self.assertLogs('solicitacoes.notificacoes', 'ERROR'):
+            processar_notificacoes(enviar_email=True)
+            EventoNotificacao.objects.update(proxima_tentativa=timezone.now())
+            processar_notificacoes(enviar_email=True)
+        self.assertFalse(EventoNotificacao.objects.exists())
+
+    def test_dashboard_marca_como_lidas_apenas_as_exibidas(self):
+        solicitacao = self.criar_solicitacao()
+        for i in range(12):
+            Notificacao.objects.create(user=self.aluno, solicitacao=solicitacao, mensagem=f'Mensagem {i}')
+
+        self.client.force_login(self.aluno)
+        self.client.get(reverse('dashboard_aluno'))
+
+        self.assertEqual(Notificacao.objects.filter(lido=True).count(), 10)
+        self.assertEqual(Notificacao.objects.filter(lido=False).count(), 2)
+
+    def nao_lidas(self):
+        return Perfil.objects.get(user=self.aluno).notificacoes_nao_lidas
+
+    def test_contador_de_nao_lidas(self):
+        solicitacao = self.criar_solicitacao()
+        for i in range(12):
+            solicitacao.notificar_aluno(f'Mensagem {i}')
+        processar_notificacoes(enviar_email=False)
+        self.assertEqual(self.nao_lidas(), 12)
+
+        self.client.force_login(self.aluno)
+        resposta = self.client.get(reverse('dashboard_aluno'))
+        self.assertEqual(resposta.context['nao_lidas'], 2)
+        self.assertContains(resposta, '2 novas')
+        self.assertEqual(self.nao_lidas(), 2)
+        # Um ajuste feito em outro processo (worker, comando) não passa pelo
+        # cache de papéis deste: o contador é lido do banco mesmo assim.
+        Perfil.objects.filter(user=self.aluno).update(notificacoes_nao_lidas=5)
+        self.assertEqual(self.client.get(reverse('dashboard_aluno')).context['nao_lidas'], 5)
+        Perfil.objects.filter(user=self.aluno).update(notificacoes_nao_lidas=2)
+
+        solicitacao.delete()
+        self.assertEqual(self.nao_lidas(), 0)
+
+    def test_purga_em_lotes(self):
+        solicitacao = self.criar_solicitacao()
+        for i in range(5):
+            solicitacao.notificar_aluno(f'Mensagem {i}')
+        processar_notificacoes(enviar_email=False)
+        antigas = list(Notificacao.objects.order_by('id').values_list('id', flat=True)[:3])
+        Notificacao.objects.filter(id__in=antigas).update(criado_em=timezone.now() - timedelta(days=365))
+        marcar_lidas(self.aluno.pk, antigas[:1])
+        self.assertEqual(self.nao_lidas(), 4)
+
+        self.assertEqual(list(purgar_notificacoes(dias=180, tamanho=2)), [2, 1])
+
+        self.assertEqual(Notificacao.objects.count(), 2)
+        self.assertEqual(self.nao_lidas(), 2)
+        self.assertEqual(recontar_nao_lidas(), 1)
+        self.assertEqual(self.nao_lidas(), 2)
+
+
+PDF_TESTE = b'%PDF-1.4\n' + b'1 0 obj << /Type /Pages /Count 2 >> endobj\n' + b'2 0 obj << /Type /Page >> endobj\n' * 2 + b'%%EOF\n'
+
+
+@override_settings(UPLOAD_PARTE_TAMANHO=16, ARQUIVO_TAMANHO_MAXIMO=1024)
+class UploadArquivoTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.aluno = criar_usuario('aluno', 'aluno')
+        cls.disciplina = Disciplina.objects.create(codigo='ALG001', nome='Algoritmos')
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        media = override_settings(MEDIA_ROOT=self.media)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.client.force_login(self.aluno)
+
+    def iniciar(self, conteudo, nome='atestado.pdf', tipo='application/pdf'):
+        return self.client.post(
+            reverse('iniciar_upload'),
+            {'nome': nome, 'tamanho': len(conteudo), 'tipo': tipo},
+            content_type='application/json',
+        )
+
+    def enviar_parte(self, upload_id, conteudo, inicio, fim):
+        return self.client.put(
+            reverse('parte_upload', args=[upload_id]),
+            conteudo[inicio:fim],
+            content_type='application/octet-stream',
+            headers={'Content-Range': f'bytes {inicio}-{fim - 1}/{len(conteudo)}'},
+        )
+
+    def test_envio_em_partes_retomavel(self):
+        upload_id = self.iniciar(PDF_TESTE).json()['id']
+        self.assertEqual(self.enviar_parte(upload_id, PDF_TESTE, 0, 16).status_code, 200)
+        # Parte repetida após uma queda: o servidor informa de onde continuar.
+        resposta = self.enviar_parte(upload_id, PDF_TESTE, 0, 16)
+        self.assertEqual(resposta.status_code, 409)
+        recebido = resposta.json()['recebido']
+        while recebido < len(PDF_TESTE):
+            fim = min(recebido + 16, len(PDF_TESTE))
+            recebido = self.enviar_parte(upload_id, PDF_TESTE, recebido, fim).json()['recebido']
+
+        resposta = self.client.post(reverse('nova_solicitacao'), {
+            'disciplina': self.disciplina.id,
+            'motivo': 'Atestado',
+            'upload': upload_id,
+        })
+
+        self.assertRedirects(resposta, reverse('dashboard_aluno'))
+        solicitacao = Solicitacao.objects.get()
+        sha256 = hashlib.sha256(PDF_TESTE).hexdigest()
+        self.assertEqual(solicitacao.arquivo.name, f'blobs/{sha256[:2]}/{sha256}.pdf')
+        self.assertEqual(solicitacao.nome_arquivo, 'atestado.pdf')
+        with solicitacao.arquivo.open('rb') as arquivo:
+            self.assertEqual(arquivo.read(), PDF_TESTE)
+        self.assertFalse(UploadParcial.objects.exists())
+
+        self.assertEqual(processar_arquivos(), (1, 0))
+        solicitacao.refresh_from_db()
+        self.assertFalse(solicitacao.arquivo_pendente)
+        self.assertEqual(solicitacao.arquivo_paginas, 2)
+        self.assertEqual(solicitacao.arquivo_tipo, 'application/pdf')
+        self.assertEqual(solicitacao.arquivo_tamanho, len(PDF_TESTE))
+
+    def test_falha_em_um_arquivo_nao_trava_a_fila(self):
+        for i in range(2):
+            Solicitacao.objects.create(
+                aluno=self.aluno, disciplina=self.disciplina, motivo=f'Atestado {i}', arquivo_pendente=True,
+                arquivo=SimpleUploadedFile(f'atestado{i}.pdf', PDF_TESTE),
+            )
+        with mock.patch('solicitacoes.arquivos.contar_paginas_pdf', side_effect=[SyntaxError('PDF corrompido'), 2]):
+            with self.assertLogs('solicitacoes.arquivos', 'ERROR'):
+                self.assertEqual(processar_arquivos(tamanho_lote=1), (2, 0))
+
+        primeira, segunda = Solicitacao.objects.order_by('id')
+        self.assertFalse(primeira.arquivo_pendente)
+        self.assertIsNone(primeira.arquivo_paginas)
+        self.assertFalse(segunda.arquivo_pendente)
+        self.assertEqual(segunda.arquivo_paginas, 2)
+
+    def test_recusa_tipo_e_tamanho_antes_de_receber(self):
+        self.assertEqual(self.iniciar(b'x' * 10, 'script.exe', 'application/octet-stream').status_code, 400)
+        self.assertEqual(self.iniciar(b'x' * 2048).status_code, 400)
+        upload_id = self.iniciar(b'GIF89a' + b'x' * 10).json()['id']
+        resposta = self.enviar_parte(upload_id, b'GIF89a' + b'x' * 10, 0, 16)
+        self.assertEqual(resposta.status_code, 400)
+        self.assertFalse(UploadParcial.objects.exists())
+
+    def test_formulario_tradicional_valida_conteudo(self):
+        dados = {'disciplina': self.disciplina.id, 'motivo': 'Atestado'}
+        falso = SimpleUploadedFile('atestado.pdf', b'nao sou pdf', content_type='application/pdf')
+        resposta = self.client.post(reverse('nova_solicitacao'), {**dados, 'arquivo': falso})
+        self.assertEqual(resposta.status_code, 200)
+        self.assertFalse(Solicitacao.objects.exists())
+
+        valido = SimpleUploadedFile('atestado.pdf', PDF_TESTE, content_type='application/pdf')
+        self.client.post(reverse('nova_solicitacao'), {**dados, 'arquivo': valido})
+        self.assertTrue(Solicitacao.objects.get().arquivo_pendente)
+
+    def test_conteudo_repetido_e_gravado_uma_vez(self):
+        dados = {'disciplina': self.disciplina.id, 'motivo': 'Atestado'}
+        for nome in ('atestado.pdf', 'atestado-copia.pdf'):
+            arquivo = SimpleUploadedFile(nome, PDF_TESTE, content_type='application/pdf')
+            self.client.post(reverse('nova_solicitacao'), {**dados, 'arquivo': arquivo})
+
+        primeira, segunda = Solicitacao.objects.order_by('id')
+        self.assertEqual(primeira.arquivo.name, segunda.arquivo.name)
+        self.assertEqual(segunda.nome_arquivo, 'atestado-copia.pdf')
+        self.assertEqual(ArquivoArmazenado.objects.get().referencias, 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            primeira.delete()
+        self.assertTrue(armazenamento.exists(segunda.arquivo.name))
+        with self.captureOnCommitCallbacks(execute=True):
+            segunda.delete()
+        self.assertFalse(armazenamento.exists(segunda.arquivo.name))
+        self.assertFalse(ArquivoArmazenado.objects.exists())
+
+    def test_comando_migra_arquivos_existentes(self):
+        for nome in ('calendario.pdf', 'calendario_0oTEaVW.pdf'):
+            caminho = os.path.join(self.media, 'solicitacoes', '2025', '11', nome)
+            os.makedirs(os.path.dirname(caminho), exist_ok=True)
+            with open(caminho, 'wb') as arquivo:
+                arquivo.write(PDF_TESTE)
+            Solicitacao.objects.create(
+                aluno=self.aluno,
+                disciplina=self.disciplina,
+                motivo='Calendário',
+                arquivo=f'solicitacoes/2025/11/{nome}',
+            )
+        orfao = armazenamento.path('blobs/00/orfao.pdf')
+        os.makedirs(os.path.dirname(orfao))
+        open(orfao, 'wb').close()
+        os.utime(orfao, (0, 0))
+
+        call_command('deduplicar_arquivos', stdout=io.StringIO())
+
+        nomes = set(Solicitacao.objects.values_list('arquivo', flat=True))
+        self.assertEqual(len(nomes), 1)
+        self.assertTrue(nomes.pop().startswith('blobs/'))
+        self.assertEqual(ArquivoArmazenado.objects.get().referencias, 2)
+        self.assertEqual(os.listdir(os.path.join(self.media, 'solicitacoes', '2025', '11')), [])
+        self.assertFalse(os.path.exists(orfao))
+        self.assertEqual(
+            sorted(Solicitacao.objects.values_list('arquivo_nome', flat=True)),
+            ['calendario.pdf', 'calendario_0oTEaVW.pdf'],
+        )
+
+    def test_recontagem_preserva_blobs_recentes(self):
+        nomes = []
+        for conteudo in (b'antigo', b'recente'):
+            nome = armazenamento.save('anexo.pdf', io.BytesIO(conteudo))
+            nomes.append(nome)
+        antigo, recente = nomes
+        ArquivoArmazenado.objects.filter(nome=antigo).update(criado_em=timezone.now() - timedelta(days=1))
+        usado = Solicitacao.objects.create(aluno=self.aluno, disciplina=self.disciplina, motivo='Atestado', arquivo=antigo)
+        ArquivoArmazenado.objects.filter(nome=antigo).update(referencias=5)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('deduplicar_arquivos', '--sem-migrar', stdout=io.StringIO())
+        # O antigo teve a contagem corrigida; o recente, sem solicitação
+        # ainda, pode ser de um envio em andamento e fica como está.
+        self.assertEqual(ArquivoArmazenado.objects.get(nome=antigo).referencias, 1)
+        self.assertEqual(ArquivoArmazenado.objects.get(nome=recente).referencias, 1)
+        self.assertTrue(armazenamento.exists(recente))
+
+        usado.delete()
+        ArquivoArmazenado.objects.filter(nome=antigo).update(referencias=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('deduplicar_arquivos', '--sem-migrar', stdout=io.StringIO())
+        self.assertFalse(ArquivoArmazenado.objects.filter(nome=antigo).exists())
+        self.assertFalse(armazenamento.exists(antigo))
+        self.assertTrue(armazenamento.exists(recente))
+
+    def test_miniatura_sai_com_a_solicitacao(self):
+        solicitacao = Solicitacao.objects.create(aluno=self.aluno, disciplina=self.disciplina, motivo='Atestado')
+        campo = Solicitacao._meta.get_field('arquivo_miniatura')
+        miniatura = campo.storage.save(campo.generate_filename(solicitacao, 'foto.jpg'), io.BytesIO(b'jpeg'))
+        Solicitacao.objects.filter(pk=solicitacao.pk).update(arquivo_miniatura=miniatura)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Solicitacao.objects.get(pk=solicitacao.pk).delete()
+        self.assertFalse(campo.storage.exists(miniatura))
+
+        # Excluída enquanto a miniatura era gerada: a miniatura nova não fica.
+        solicitacao = Solicitacao.objects.create(
+            aluno=self.aluno, disciplina=self.disciplina, motivo='Foto',
+            arquivo=SimpleUploadedFile('foto.png', b'\x89PNG\r\n\x1a\n'), arquivo_pendente=True,
+        )
+        gerada = []
+
+        def gerar(alvo, arquivo):
+            gerada.append(campo.storage.save(campo.generate_filename(alvo, 'foto.jpg'), io.BytesIO(b'jpeg')))
+            Solicitacao.objects.filter(pk=alvo.pk).delete()
+            return gerada[0]
+
+        with mock.patch('solicitacoes.arquivos.gerar_miniatura', gerar):
+            processar_arquivos()
+        self.assertEqual(len(gerada), 1)
+        self.assertFalse(campo.storage.exists(gerada[0]))
+
+
+@override_settings(ARQUIVOS_SERVIDOR='django')
+class DownloadArquivoTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.aluno = criar_usuario('aluno', 'aluno')
+        cls.outro_aluno = criar_usuario('outro', 'aluno')
+        cls.coordenador = criar_usuario('coordenador', 'coordenador')
+        cls.secretaria = criar_usuario('secretaria', 'secretaria')
+        cls.disciplina = Disciplina.objects.create(codigo='ALG001', nome='Algoritmos')
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        media = override_settings(MEDIA_ROOT=self.media)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.solicitacao = Solicitacao.objects.create(
+            aluno=self.aluno,
+            disciplina=self.disciplina,
+            motivo='Atestado',
+            arquivo=SimpleUploadedFile('atestado.pdf', PDF_TESTE),
+            arquivo_nome='atestado.pdf',
+        )
+        self.url = reverse('baixar_arquivo', args=[self.solicitacao.id])
+
+    def baixar(self, usuario, **headers):
+        self.client.force_login(usuario)
+        return self.client.get(self.url, headers=headers)
+
+    def test_permissao_do_aluno_e_da_etapa_atual(self):
+        resposta = self.baixar(self.aluno)
+        self.assertEqual(b''.join(resposta.streaming_content), PDF_TESTE)
+        self.assertIn('atestado.pdf', resposta['Content-Disposition'])
+        self.assertEqual(self.baixar(self.outro_aluno).status_code, 404)
+        self.assertEqual(self.baixar(self.coordenador).status_code, 200)
+        self.assertEqual(self.baixar(self.secretaria).status_code, 404)
+
+        self.solicitacao.registrar_decisao('coordenador', self.coordenador, 'aprovada', 'Ok')
+        self.assertEqual(self.baixar(self.coordenador).status_code, 404)
+        self.assertEqual(self.baixar(self.secretaria).status_code, 200)
+
+    def test_permissao_em_uma_consulta(self):
+        self.client.force_login(self.coordenador)
+        self.client.get(self.url)
+        # usuário e a consulta de permissão; sessão e perfil vêm do cache
+        with self.assertNumQueries(2):
+            self.client.get(self.url)
+
+    def test_faixa_e_etag(self):
+        resposta = self.baixar(self.aluno, Range='bytes=4-9')
+        self.assertEqual(resposta.status_code, 206)
+        self.assertEqual(resposta['Content-Range'], f'bytes 4-9/{len(PDF_TESTE)}')
+        self.assertEqual(b''.join(resposta.streaming_content), PDF_TESTE[4:10])
+
+        resposta = self.baixar(self.aluno, Range='bytes=-5')
+        self.assertEqual(b''.join(resposta.streaming_content), PDF_TESTE[-5:])
+        self.assertEqual(self.baixar(self.aluno, Range=f'bytes={len(PDF_TESTE)}-').status_code, 416)
+
+        etag = resposta['ETag']
+        self.assertEqual(etag, f'"{hashlib.sha256(PDF_TESTE).hexdigest()}"')
+        self.assertEqual(self.baixar(self.aluno, If_None_Match=etag).status_code, 304)
+
+    @override_settings(ARQUIVOS_SERVIDOR='nginx')
+    def test_entrega_pelo_proxy(self):
+        resposta = self.baixar(self.aluno)
+        self.assertEqual(resposta['X-Accel-Redirect'], '/protegido/' + self.solicitacao.arquivo.name)
+        self.assertEqual(resposta.content, b'')
+
+
+class RoteadorLeituraTests(TransactionTestCase):
+    databases = {'default', 'leitura'}
+
+    def test_leituras_fora_de_transacao_usam_conexao_somente_leitura(self):
+        Disciplina.objects.create(codigo='ALG001', nome='Algoritmos')
+
+        consulta = Disciplina.objects.all()
+        self.assertEqual(consulta.db, 'leitura')
+        self.assertEqual(consulta.count(), 1)
+        with transaction.atomic():
+            self.assertEqual(Disciplina.objects.all().db, 'default')
+
+        with self.assertRaises(OperationalError):
+            with connections['leitura'].cursor() as cursor:
+                cursor.execute('DELETE FROM solicitacoes_disciplina')
+
+
+class EstatisticasTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.aluno = criar_usuario('aluno', 'aluno')
+        cls.coordenador = criar_usuario('coordenador', 'coordenador')
+        cls.secretaria = criar_usuario('secretaria', 'secretaria')
+        cls.disciplina = Disciplina.objects.create(codigo='ALG001', nome='Algoritmos')
+
+    def criar_solicitacao(self, prazo=7):
+        return Solicitacao.objects.create(
+            aluno=self.aluno,
+            disciplina=self.disciplina,
+            motivo='Atestado',
+            data_limite=timezone.now() + timedelta(days=prazo),
+        )
+
+    def contadores(self):
+        return (
+            sorted(EstatisticaFila.objects.values_list('etapa', 'pendentes', 'expiradas')),
+            sorted(EstatisticaDecisao.objects.values_list('etapa', 'responsavel_id', 'aprovadas', 'rejeitadas')),
+        )
+
+    def test_contadores_incrementais_batem_com_o_recalculo(self):
+        solicitacoes = [self.criar_solicitacao() for _ in range(4)]
+        solicitacoes[0].registrar_decisao('coordenador', self.coordenador, 'aprovada', 'Ok')
+        solicitacoes[0].registrar_decisao('secretaria', self.secretaria, 'rejeitada', 'Fora do prazo')
+        Solicitacao.registrar_decisoes_em_lote(
+            [solicitacoes[1].id, solicitacoes[2].id], 'coordenador', self.coordenador, 'aprovada', 'Ok',
+        )
+        vencida = self.criar_solicitacao(prazo=-1)
+        Solicitacao.objects.filter(pk=vencida.pk).expirar()
+        solicitacoes[3].delete()
+
+        incremental = self.contadores()
+        self.assertEqual(incremental[0], [('coordenador', 0, 1), ('secretaria', 2, 0)])
+        estatisticas.recalcular()
+        self.assertEqual(self.contadores(), incremental)
+
+    def test_relatorio_le_apenas_as_estatisticas(self):
+        for _ in range(2):
+            self.criar_solicitacao().registrar_decisao('coordenador', self.coordenador, 'aprovada', 'Ok')
+        self.criar_solicitacao()
+        self.client.force_login(self.coordenador)
+
+        # usuário, perfil, filas, decisões e disciplinas
+        with self.assertNumQueries(5):
+            resposta = self.client.get(reverse('relatorio_estatisticas'))
+        linha, = resposta.json()['linhas']
+        self.assertEqual(linha['codigo'], 'ALG001')
+        self.assertEqual(linha['coordenador_pendentes'], 1)
+        self.assertEqual(linha['secretaria_pendentes'], 2)
+        self.assertEqual(linha['coordenador_taxa_aprovacao'], 1.0)
+        self.assertLess(linha['coordenador_mediana_horas'], 1)
+
+        resposta = self.client.get(reverse('relatorio_estatisticas'), {'agrupar': 'responsavel', 'formato': 'csv'})
+        self.assertEqual(resposta['Content-Type'], 'text/csv; charset=utf-8')
+        linhas = resposta.content.decode().splitlines()
+        self.assertTrue(linhas[0].startswith('etapa,responsavel,nome,aprovadas'))
+        self.assertTrue(linhas[1].startswith('coordenador,coordenador,coordenador,2,0,1.0'))
+
+        self.client.force_login(self.aluno)
+        self.assertEqual(self.client.get(reverse('relatorio_estatisticas')).status_code, 403)
+
+
+@override_settings(ARQUIVOS_SERVIDOR='django')
+class ArquivamentoTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.aluno = criar_usuario('aluno', 'aluno')
+        cls.coordenador = criar_usuario('coordenador', 'coordenador')
+        cls.disciplina = Disciplina.objects.create(codigo='ALG001', nome='Algoritmos')
+
+    def setUp(self):
+        caches[settings.DASHBOARD_CACHE].clear()
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        media = override_settings(MEDIA_ROOT=self.media)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.antiga = timezone.now() - timedelta(days=3 * 365)
+
+    def criar_solicitacao(self, decisao=None, data=None, **campos):
+        if decisao == 'aprovada':
+            # Só a aprovação do coordenador falta para encerrar.
+            campos.update(secretaria_status='aprovada', professor_status='aprovada')
+        solicitacao = Solicitacao.objects.create(
+            aluno=self.aluno, disciplina=self.disciplina, motivo='Atestado médico', **campos,
+        )
+        if decisao:
+            solicitacao.registrar_decisao('coordenador', self.coordenador, decisao, 'Ok')
+        if data:
+            Solicitacao.objects.filter(pk=solicitacao.pk).update(data_solicitacao=data)
+        return solicitacao
+
+    def arquivar(self, **opcoes):
+        with self.captureOnCommitCallbacks(execute=True):
+            return list(arquivar_solicitacoes(**opcoes))
+
+    def test_move_encerradas_antigas_em_lotes(self):
+        encerradas = [self.criar_solicitacao(decisao, self.antiga) for decisao in ('rejeitada', 'rejeitada', 'aprovada')]
+        encerradas[0].notificar_aluno('Rejeitada.')
+        Notificacao.objects.create(user=self.aluno, solicitacao=encerradas[0], mensagem='Rejeitada.')
+        pendente = self.criar_solicitacao(data=self.antiga)
+        recente = self.criar_solicitacao('rejeitada')
+        contadores = lambda: sorted(EstatisticaDecisao.objects.values_list('etapa', 'faixa', 'aprovadas', 'rejeitadas'))
+        estatisticas.recalcular()
+        antes = contadores()
+
+        self.assertEqual(self.arquivar(semestres=2, tamanho=2), [2, 1])
+
+        self.assertCountEqual(Solicitacao.objects.values_list('id', flat=True), [pendente.id, recente.id])
+        arquivada = SolicitacaoArquivada.objects.get(pk=encerradas[0].pk)
+        self.assertEqual(arquivada.data_solicitacao, self.antiga)
+        self.assertEqual(arquivada.coordenador_responsavel, self.coordenador)
+        self.assertEqual(arquivada.notificacoes.get().mensagem, 'Rejeitada.')
+        self.assertFalse(Notificacao.objects.exists())
+        self.assertFalse(EventoNotificacao.objects.exists())
+        self.assertEqual(self.arquivar(), [])
+
+        # Os relatórios refeitos do zero ainda contam as decisões arquivadas.
+        estatisticas.recalcular()
+        self.assertEqual(contadores(), antes)
+
+    def test_miniatura_acompanha_a_arquivada(self):
+        solicitacao = self.criar_solicitacao('aprovada', self.antiga)
+        campo = Solicitacao._meta.get_field('arquivo_miniatura')
+        miniatura = campo.storage.save('solicitacoes/miniaturas/foto.jpg', io.BytesIO(b'jpeg'))
+        Solicitacao.objects.filter(pk=solicitacao.pk).update(arquivo_miniatura=miniatura)
+
+        self.arquivar()
+        arquivada = SolicitacaoArquivada.objects.get(pk=solicitacao.pk)
+        self.assertEqual(arquivada.arquivo_miniatura.name, miniatura)
+        self.assertTrue(campo.storage.exists(miniatura))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            arquivada.delete()
+        self.assertFalse(campo.storage.exists(miniatura))
+
+    def test_historicos_incluem_arquivadas_so_quando_pedido(self):
+        arquivada = self.criar_solicitacao('aprovada', self.antiga)
+        ativa = self.criar_solicitacao('rejeitada')
+        self.arquivar()
+
+        self.client.force_login(self.aluno)
+        ids = lambda resposta, chave: [solicitacao.id for solicitacao in resposta.context[chave]]
+        resposta = self.client.get(reverse('dashboard_aluno'))
+        self.assertEqual(ids(resposta, 'solicitacoes'), [ativa.id])
+        resposta = self.client.get(reverse('dashboard_aluno'), {'arquivadas': '1', 'q': 'médico'})
+        self.assertEqual(ids(resposta, 'solicitacoes'), [ativa.id, arquivada.id])
+
+        self.client.force_login(self.coordenador)
+        resposta = self.client.get(reverse('dashboard_professor'))
+        self.assertEqual(ids(resposta, 'solicitacoes_avaliadas'), [ativa.id])
+        resposta = self.client.get(reverse('dashboard_professor'), {'arquivadas': '1'})
+        self.assertEqual(ids(resposta, 'solicitacoes_avaliadas'), [ativa.id, arquivada.id])
+
+    def test_anexo_vai_para_arquivadas(self):
+        solicitacao = self.criar_solicitacao(
+            'rejeitada', self.antiga, arquivo=SimpleUploadedFile('atestado.pdf', PDF_TESTE), arquivo_nome='atestado.pdf',
+        )
+        blob = solicitacao.arquivo.name
+        self.arquivar()
+
+        arquivada = SolicitacaoArquivada.objects.get()
+        self.assertEqual(arquivada.arquivo.name, f'arquivadas/{blob}')
+        self.assertFalse(os.path.exists(os.path.join(self.media, blob)))
+        self.assertFalse(ArquivoArmazenado.objects.exists())
+
+        url = reverse('baixar_arquivo', args=[arquivada.id])
+        self.client.force_login(self.aluno)
+        resposta = self.client.get(url)
+        self.assertEqual(b''.join(resposta.streaming_content), PDF_TESTE)
+        self.client.force_login(self.coordenador)
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.aluno = criar_usuario('aluno', 'aluno')
+        cls.coordenador = criar_usuario('coordenador', 'coordenador')
+        cls.disciplina = Disciplina.objects.create(codigo='ALG001', nome='Algoritmos')
+
+    def setUp(self):
+        caches[settings.DASHBOARD_CACHE].clear()
+
+    def criar_solicitacao(self, motivo='Atestado'):
+        return Solicitacao.objects.create(
+            aluno=self.aluno, disciplina=self.disciplina, motivo=motivo, data_limite=timezone.now() + timedelta(days=7),
+        )
+
+    def test_solicitacoes_com_campos_e_cursor(self):
+        criadas = [self.criar_solicitacao(f'Motivo {i}') for i in range(3)]
+        self.client.force_login(self.aluno)
+        url = reverse('api_solicitacoes')
+
+        dados = self.client.get(url, {'fields': 'id,status', 'limite': 2}).json()
+        self.assertEqual(dados['resultados'], [{'id': criadas[2].id, 'status': 'pendente'}, {'id': criadas[1].id, 'status': 'pendente'}])
+        dados = self.client.get(url, {'fields': 'id', 'limite': 2, 'cursor': dados['proximo']}).json()
+        self.assertEqual(dados, {'resultados': [{'id': criadas[0].id}], 'proximo': None})
+
+        resposta = self.client.get(url, {'fields': 'id,senha'})
+        self.assertEqual(resposta.status_code, 400)
+        self.assertEqual(resposta.json(), {'erro': 'Campos desconhecidos: senha.'})
+
+    def cache_compartilhado(self):
+        # Um cache em arquivos faz o papel do Redis: vários processos o enxergam.
+        diretorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, diretorio, ignore_errors=True)
+        contexto = override_settings(CACHES={
+            **settings.CACHES,
+            settings.DASHBOARD_CACHE: {
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': diretorio,
+            },
+        })
+        contexto.enable()
+        self.addCleanup(contexto.disable)
+
+    def test_get_condicional_nao_le_solicitacoes(self):
+        self.cache_compartilhado()
+        self.criar_solicitacao()
+        self.client.force_login(self.aluno)
+        url = reverse('api_solicitacoes')
+        resposta = self.client.get(url)
+        etag, modificado = resposta['ETag'], resposta['Last-Modified']
+        self.assertIn('private', resposta['Cache-Control'])
+
+        with CaptureQueriesContext(connections['default']) as consultas:
+            resposta = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resposta.status_code, 304)
+        self.assertFalse([consulta for consulta in consultas if 'solicitacoes_solicitacao' in consulta['sql']])
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=modificado).status_code, 304)
+        # Outra projeção é outro recurso.
+        self.assertEqual(self.client.get(url, {'fields': 'id'}, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        self.criar_solicitacao()
+        resposta = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(len(resposta.json()['resultados']), 2)
+
+    def test_versao_trocada_por_outro_processo(self):
+        self.cache_compartilhado()
+        self.client.force_login(self.aluno)
+        url = reverse('api_solicitacoes')
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # Outra instância do mesmo cache, como a de um worker ou de um comando.
+        outro = caches.create_connection(settings.DASHBOARD_CACHE)
+        self.assertIsNot(outro, caches[settings.DASHBOARD_CACHE])
+        outro.set(f'dashboard:versao:usuario:{self.aluno.pk}', time.time_ns())
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_cache_local_nao_responde_304(self):
+        self.assertFalse(cache_dashboard.compartilhado())
+        self.client.force_login(self.aluno)
+        url = reverse('api_solicitacoes')
+        self.assertNotIn('ETag', self.client.get(url))
+        self.criar_solicitacao()
+        resposta = self.client.get(url, HTTP_IF_NONE_MATCH='*')
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(len(resposta.json()['resultados']), 1)
+
+    def test_fila_e_decisao(self):
+        solicitacao = self.criar_solicitacao()
+        self.client.force_login(self.coordenador)
+        fila = lambda: [linha['id'] for linha in self.client.get(reverse('api_fila'), {'fields': 'id'}).json()['resultados']]
+        self.assertEqual(fila(), [solicitacao.id])
+
+        url = reverse('api_decidir', args=[solicitacao.id])
+        resposta = self.client.post(url, {'decisao': 'aprovada'}, content_type='application/json')
+        self.assertEqual(resposta.status_code, 400)
+        resposta = self.client.post(url, {'decisao': 'aprovada', 'observacoes': 'Ok'}, content_type='application/json')
+        self.assertEqual(resposta.json()['coordenador_status'], 'aprovada')
+        self.assertEqual(resposta.json()['etapa'], 'secretaria')
+        self.assertEqual(fila(), [])
+        avaliadas = self.client.get(reverse('api_avaliadas'), {'fields': 'id,coordenador_status'}).json()
+        self.assertEqual(avaliadas['resultados'], [{'id': solicitacao.id, 'coordenador_status': 'aprovada'}])
+        resposta = self.client.post(url, {'decisao': 'rejeitada', 'observacoes': 'Não'}, content_type='application/json')
+        self.assertEqual(resposta.status_code, 409)
+
+        self.client.force_login(self.aluno)
+        self.assertEqual(self.client.get(reverse('api_fila')).status_code, 403)
+
+    def test_notificacoes(self):
+        self.cache_compartilhado()
+        solicitacao = self.criar_solicitacao()
+        for i in range(3):
+            solicitacao.notificar_aluno(f'Mensagem {i}')
+        processar_notificacoes(enviar_email=False)
+        self.client.force_login(self.aluno)
+        url = reverse('api_notificacoes')
+
+        resposta = self.client.get(url, {'fields': 'id,lido'})
+        dados = resposta.json()
+        self.assertEqual(dados['nao_lidas'], 3)
+        self.assertEqual([linha['lido'] for linha in dados['resultados']], [False] * 3)
+
+        ids = [linha['id'] for linha in dados['resultados'][:2]]
+        marcadas = self.client.post(reverse('api_marcar_notificacoes_lidas'), {'ids': ids}, content_type='application/json')
+        self.assertEqual(marcadas.json(), {'lidas': 2, 'nao_lidas': 1})
+        resposta = self.client.get(url, {'fields': 'id,lido'}, HTTP_IF_NONE_MATCH=resposta['ETag'])
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.json()['nao_lidas'], 1)
+
+    def test_token_sem_sessao_e_sem_csrf(self):
+        solicitacao = self.criar_solicitacao()
+        cliente = Client(enforce_csrf_checks=True)
+        url = reverse('api_decidir', args=[solicitacao.id])
+        dados = {'decisao': 'aprovada', 'observacoes': 'Ok'}
+
+        cliente.force_login(self.coordenador)
+        self.assertEqual(cliente.post(url, dados, content_type='application/json').status_code, 403)
+        cliente.logout()
+
+        token = TokenApi.gerar(self.coordenador, 'aplicativo')
+        self.assertFalse(TokenApi.objects.filter(chave=token).exists())
+        cabecalhos = {'Authorization': f'Bearer {token}'}
+        resposta = cliente.post(url, dados, content_type='application/json', headers=cabecalhos)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.json()['coordenador_status'], 'aprovada')
+        self.assertNotIn('sessionid', resposta.cookies)
+        fila = cliente.get(reverse('api_fila'), headers=cabecalhos)
+        self.assertEqual(fila.json()['resultados'], [])
+
+        resposta = cliente.post(url, dados, content_type='application/json', headers={'Authorization': 'Bearer outro'})
+        self.assertEqual(resposta.status_code, 401)
+        self.coordenador.is_active = False
+        self.coordenador.save()
+        self.assertEqual(cliente.get(reverse('api_fila'), headers=cabecalhos).status_code, 401)
+
+    async def test_token_sob_asgi(self):
+        solicitacao = await sync_to_async(self.criar_solicitacao)()
+        token = await sync_to_async(TokenApi.gerar)(self.coordenador)
+        resposta = await self.async_client.get(reverse('api_fila'), headers={'Authorization': f'Bearer {token}'})
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual([linha['id'] for linha in resposta.json()['resultados']], [solicitacao.id])
+
+    def test_comando_cria_e_revoga_token(self):
+        saida = io.StringIO()
+        call_command('criar_token_api', 'aluno', nome='celular', stdout=saida)
+        token = saida.getvalue().strip()
+        resposta = self.client.get(reverse('api_solicitacoes'), headers={'Authorization': f'Bearer {token}'})
+        self.assertEqual(resposta.status_code, 200)
+
+        call_command('criar_token_api', 'aluno', revogar=True, stdout=io.StringIO())
+        self.assertFalse(TokenApi.objects.exists())
+        with self.assertRaises(CommandError):
+            call_command('criar_token_api', 'ninguem', stdout=io.StringIO())
+
+
+class ImportacaoDisciplinasTests(TestCase):
+    def setUp(self):
+        Disciplina.objects.create(codigo='ALG001', nome='Algoritmos I')
+        Disciplina.objects.create(codigo='BD001', nome='Banco de Dados I')
+        Disciplina.objects.create(codigo='SO001', nome='Sistemas Operacionais')
+
+    def importar(self, conteudo, formato='csv', *argumentos):
+        diretorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, diretorio)
+        caminho = os.path.join(diretorio, f'disciplinas.{formato}')
+        with open(caminho, 'w', encoding='utf-8') as arquivo:
+            arquivo.write(conteudo)
+        saida = io.StringIO()
+        call_command('popular_disciplinas', caminho, *argumentos, stdout=saida, stderr=io.StringIO())
+        return saida.getvalue()
+
+    def test_csv_faz_upsert_e_desativa_ausentes(self):
+        conteudo = (
+            'codigo;nome;descricao;ativo\n'
+            'ALG001;Algoritmos e Estruturas de Dados I;Revisada;sim\n'
+            'BD001;Banco de Dados I;;1\n'
+            'WEB001;Desenvolvimento Web I;;1\n'
+            ';Sem código;;1\n'
+        )
+        saida = self.importar(conteudo, 'csv', '--atualizar', '--desativar-ausentes', '--lote', '2')
+
+        self.assertIn('criadas: 1, atualizadas: 1, inalteradas: 1, mantidas: 0, desativadas: 1, inválidas: 1', saida)
+        self.assertEqual(Disciplina.objects.get(codigo='ALG001').descricao, 'Revisada')
+        self.assertTrue(Disciplina.objects.filter(codigo='WEB001', ativo=True).exists())
+        self.assertFalse(Disciplina.objects.get(codigo='SO001').ativo)
+
+    def test_json_em_dry_run_nao_grava(self):
+        conteudo = '[{"codigo": "PY001", "nome": "Python"},\n {"codigo": "SO001", "nome": "SO", "ativo": false}]'
+        saida = self.importar(conteudo, 'json', '--atualizar', '--dry-run')
+
+        self.assertIn('[dry-run] Disciplinas criadas: 1, atualizadas: 1', saida)
+        self.assertFalse(Disciplina.objects.filter(codigo='PY001').exists())
+        self.assertTrue(Disciplina.objects.get(codigo='SO001').ativo)
+
+    def test_sem_atualizar_so_cria(self):
+        saida = self.importar('codigo,nome,ativo\nALG001,Outro nome,0\nWEB001,Desenvolvimento Web I,1\n')
+
+        self.assertIn('criadas: 1, atualizadas: 0, inalteradas: 0, mantidas: 1', saida)
+        algoritmos = Disciplina.objects.get(codigo='ALG001')
+        self.assertEqual((algoritmos.nome, algoritmos.ativo), ('Algoritmos I', True))
+
+    def test_cada_lote_em_uma_transacao(self):
+        conteudo = 'codigo,nome\nN1,Um\nN2,Dois\nN3,Três\n'
+        with CaptureQueriesContext(connections['default']) as consultas:
+            saida = self.importar(conteudo, 'csv', '--lote', '1', '--desativar-ausentes')
+        # Três lotes e a desativação, cada um na sua transação curta (aqui,
+        # dentro da transação do teste, savepoints).
+        transacoes = [consulta for consulta in consultas if consulta['sql'].startswith('SAVEPOINT')]
+        self.assertEqual(len(transacoes), 4)
+        self.assertIn('criadas: 3', saida)
+
+        falhas = iter([None, OperationalError('database is locked')])
+
+        def gravar(*args, **kwargs):
+            erro = next(falhas)
+            if erro:
+                raise erro
+            return gravar_original(*args, **kwargs)
+
+        gravar_original = Disciplina.objects.bulk_create
+        with mock.patch.object(Disciplina.objects, 'bulk_create', side_effect=gravar):
+            with self.assertRaises(OperationalError):
+                importar_disciplinas(iter([{'codigo': 'P1', 'nome': 'Um'}, {'codigo': 'P2', 'nome': 'Dois'}]), 1)
+        # O primeiro lote ficou gravado; o segundo foi desfeito.
+        self.assertEqual(list(Disciplina.objects.filter(codigo__startswith='P').values_list('codigo', flat=True)), ['P1'])
+
+    def test_csv_pela_entrada_padrao_sem_seek(self):
+        leitura, escrita = os.pipe()
+        with os.fdopen(escrita, 'w', encoding='utf-8') as arquivo:
+            arquivo.write('codigo;nome\nX1;Teste\nX2;Outra disciplina\n')
+        with os.fdopen(leitura, encoding='utf-8') as entrada:
+            self.assertFalse(entrada.seekable())
+            # Amostra menor que a primeira linha: o resto da linha é lido antes do sniff.
+            with mock.patch('sys.stdin', entrada), mock.patch('solicitacoes.importacao.TAMANHO_BLOCO', 8):
+                call_command('popular_disciplinas', '-', stdout=io.StringIO(), stderr=io.StringIO())
+
+        self.assertEqual(
+            dict(Disciplina.objects.filter(codigo__startswith='X').values_list('codigo', 'nome')),
+            {'X1': 'Teste', 'X2': 'Outra disciplina'},
+        )
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ProvisionamentoUsuariosTests(TestCase):
+    def setUp(self):
+        existente = User.objects.create_user('joao', password='x')
+        Perfil.objects.create(user=existente, tipo='aluno', matricula='2024001')
+
+    def test_cria_usuarios_e_ignora_conflitos(self):
+        registros = [
+            {'matricula': '2024001', 'nome': 'Outro João'},
+            {'matricula': '2024002', 'nome': 'Maria da Silva', 'email': 'maria@exemplo.com'},
+            {'username': 'joao', 'matricula': '2024003'},
+            {'matricula': '2024004', 'tipo': 'professor', 'senha': 'segredo123'},
+            {'matricula': '2024004'},
+            {'nome': 'Sem identificação'},
+            {'matricula': '2024005', 'tipo': 'diretor'},
+        ]
+        resultado = provisionar_usuarios(registros, tamanho_lote=3, processos=0, senha_matricula=True)
+
+        self.assertEqual(
+            {chave: resultado[chave] for chave in ('criados', 'existentes', 'duplicados', 'invalidos')},
+            {'criados': 2, 'existentes': 2, 'duplicados': 1, 'invalidos': 2},
+        )
+        maria = User.objects.get(username='2024002')
+        self.assertEqual((maria.first_name, maria.last_name), ('Maria', 'da Silva'))
+        self.assertTrue(maria.check_password('2024002'))
+        self.assertEqual(maria.perfil.tipo, 'aluno')
+        professor = User.objects.get(perfil__matricula='2024004')
+        self.assertEqual(professor.perfil.tipo, 'professor')
+        self.assertTrue(professor.check_password('segredo123'))
+
+    def test_hashes_calculados_no_pool(self):
+        provisionar_usuarios([{'matricula': '2024010', 'senha': 'segredo123'}], processos=1)
+
+        self.assertTrue(User.objects.get(username='2024010').check_password('segredo123'))
+
+    def test_envio_da_equipe_entra_na_fila(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        staff = User.objects.create_user('staff', password='x', is_staff=True)
+        self.client.force_login(staff)
+
+        with override_settings(MEDIA_ROOT=media):
+            arquivo = SimpleUploadedFile('matriculas.csv', b'matricula,nome\n2024020,Ana Souza\n')
+            resposta = self.client.post(reverse('importar_usuarios'), {'arquivo': arquivo})
+            self.assertEqual(resposta.status_code, 202)
+            importacao = processar_importacoes()
+
+        self.assertEqual(importacao.status, 'concluida')
+        self.assertEqual(importacao.resultado['criados'], 1)
+        self.assertFalse(os.listdir(os.path.join(media, 'importacoes')))
+        self.assertFalse(User.objects.get(username='2024020').has_usable_password())
+        estado = self.client.get(resposta.json()['url']).json()
+        self.assertEqual(estado['status'], 'concluida')
+
+    def test_reserva_vencida_volta_para_a_fila(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        duas_horas = timezone.now() - timedelta(hours=2)
+
+        with override_settings(MEDIA_ROOT=media):
+            interrompida = ImportacaoUsuarios.objects.create(
+                arquivo=SimpleUploadedFile('a.csv', b'matricula\n2024030\n'), formato='csv',
+                status='processando', reservada_em=duas_horas, tentativas=1,
+            )
+            esgotada = ImportacaoUsuarios.objects.create(
+                arquivo=SimpleUploadedFile('b.csv', b'matricula\n2024031\n'), formato='csv',
+                status='processando', reservada_em=duas_horas, tentativas=TENTATIVAS_IMPORTACAO,
+            )
+            with self.assertLogs('solicitacoes.provisionamento', 'WARNING'):
+                importacao = processar_importacoes()
+
+        self.assertEqual(importacao.pk, interrompida.pk)
+        self.assertEqual((importacao.status, importacao.tentativas), ('concluida', 2))
+        self.assertTrue(User.objects.filter(username='2024030').exists())
+        esgotada.refresh_from_db()
+        self.assertEqual((esgotada.status, esgotada.arquivo.name), ('falhou', ''))
+        self.assertFalse(User.objects.filter(username='2024031').exists())
+        self.assertFalse(os.listdir(os.path.join(media, 'importacoes')))
+
+
+class ExportacaoTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.aluno = criar_usuario('aluno', 'aluno')
+        cls.secretaria = criar_usuario('secretaria', 'secretaria')
+        cls.secretaria.email = 'secretaria@exemplo.com'
+        cls.secretaria.save()
+        algoritmos = Disciplina.objects.create(codigo='ALG001', nome='Algoritmos')
+        banco = Disciplina.objects.create(codigo='BD001', nome='Banco de Dados')
+        cls.solicitacoes = [
+            Solicitacao.objects.create(aluno=cls.aluno, disciplina=disciplina, motivo=motivo)
+            for disciplina, motivo in [(algoritmos, 'Atestado, "médico"'), (banco, 'Viagem\x01'), (algoritmos, 'Luto')]
+        ]
+        Solicitacao.objects.filter(pk=cls.solicitacoes[2].pk).update(data_solicitacao=timezone.now() - timedelta(days=30))
+
+    def setUp(self):
+        self.client.force_login(self.secretaria)
+
+    def test_csv_em_streaming_com_filtros(self):
+        resposta = self.client.get(reverse('exportar_solicitacoes'), {'disciplina': 'ALG001'})
+        self.assertTrue(resposta.streaming)
+        self.assertEqual(resposta['Content-Type'], 'text/csv; charset=utf-8')
+        linhas = b''.join(resposta.streaming_content).decode('utf-8-sig').splitlines()
+        self.assertTrue(linhas[0].startswith('id,data_solicitacao,aluno,nome'))
+        self.assertEqual(len(linhas), 3)
+        self.assertIn('"Atestado, ""médico"""', linhas[1])
+
+        desde = (timezone.localdate() - timedelta(days=7)).isoformat()
+        resposta = self.client.get(reverse('exportar_solicitacoes'), {'de': desde, 'disciplina': 'ALG001'})
+        self.assertEqual(len(b''.join(resposta.streaming_content).splitlines()), 2)
+
+        resposta = self.client.get(reverse('exportar_solicitacoes'), {'etapa': 'diretoria'})
+        self.assertEqual(resposta.status_code, 400)
+        self.client.force_login(self.aluno)
+        self.assertEqual(self.client.get(reverse('exportar_solicitacoes')).status_code, 403)
+
+    def test_csv_neutraliza_formulas(self):
+        Solicitacao.objects.filter(pk=self.solicitacoes[0].pk).update(motivo='=HYPERLINK("http://x","clique")')
+        User.objects.filter(pk=self.aluno.pk).update(first_name='@SOMA(A1)', last_name='-2+3')
+
+        resposta = self.client.get(reverse('exportar_solicitacoes'), {'disciplina': 'ALG001'})
+        linhas = list(csv.reader(b''.join(resposta.streaming_content).decode('utf-8-sig').splitlines()))
+        cabecalho = linhas[0]
+        linha = dict(zip(cabecalho, linhas[1]))
+        self.assertEqual(linha['motivo'], '\'=HYPERLINK("http://x","clique")')
+        self.assertEqual((linha['nome'], linha['sobrenome']), ("'@SOMA(A1)", "'-2+3"))
+        self.assertEqual(dict(zip(cabecalho, linhas[2]))['motivo'], 'Luto')
+
+    def test_xlsx_abre_como_planilha(self):
+        resposta = self.client.get(reverse('exportar_solicitacoes'), {'formato': 'xlsx'})
+        pacote = zipfile.ZipFile(io.BytesIO(b''.join(resposta.streaming_content)))
+
+        self.assertIsNone(pacote.testzip())
+        planilha = pacote.read('xl/worksheets/sheet1.xml').decode()
+        self.assertEqual(planilha.count('<row>'), 4)
+        self.assertIn('Viagem</t>', planilha)
+        self.assertIn('Atestado, "médico"</t>', planilha)
+
+    def test_segundo_plano_grava_arquivo_e_avisa(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+
+        with override_settings(MEDIA_ROOT=media):
+            resposta = self.client.post(
+                reverse('exportar_solicitacoes'), {'status': 'pendente'}, content_type='application/json',
+            )
+            self.assertEqual(resposta.status_code, 202)
+            exportacao = processar_exportacoes()
+            self.assertEqual((exportacao.status, exportacao.linhas), ('concluida', 3))
+            self.assertEqual(len(mail.outbox), 1)
+            self.assertIn(reverse('baixar_exportacao', args=[exportacao.id]), mail.outbox[0].body)
+
+            estado = self.client.get(resposta.json()['url']).json()
+            download = self.client.get(estado['arquivo'])
+            self.assertEqual(download['Content-Type'], 'application/gzip')
+            conteudo = gzip.decompress(b''.join(download.streaming_content)).decode('utf-8-sig')
+            self.assertEqual(len(conteudo.splitlines()), 4)
+
+            self.client.force_login(self.aluno)
+            self.assertEqual(self.client.get(estado['arquivo']).status_code, 404)
+
+            Exportacao.objects.filter(pk=exportacao.pk).update(criado_em=timezone.now() - timedelta(days=30))
+            processar_exportacoes()
+        self.assertFalse(Exportacao.objects.exists())
+        self.assertFalse(os.listdir(os.path.join(media, 'exportacoes')))
+
+    def test_reserva_vencida_volta_para_a_fila(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        duas_horas = timezone.now() - timedelta(hours=2)
+        interrompida = Exportacao.objects.create(
+            user=self.secretaria, status='processando', reservada_em=duas_horas, tentativas=1,
+        )
+        esgotada = Exportacao.objects.create(
+            user=self.secretaria, status='processando', reservada_em=duas_horas, tentativas=TENTATIVAS,
+        )
+        recente = Exportacao.objects.create(user=self.secretaria, status='processando', reservada_em=timezone.now())
+        antiga = Exportacao.objects.create(user=self.secretaria, status='processando')
+        Exportacao.objects.filter(pk=antiga.pk).update(criado_em=timezone.now() - timedelta(days=30))
+
+        with override_settings(MEDIA_ROOT=media), self.assertLogs('solicitacoes.exportacao', 'WARNING'):
+            exportacao = processar_exportacoes()
+
+        self.assertEqual(exportacao.pk, interrompida.pk)
+        self.assertEqual((exportacao.status, exportacao.tentativas, exportacao.linhas), ('concluida', 2, 3))
+        self.assertEqual(Exportacao.objects.get(pk=esgotada.pk).status, 'falhou')
+        self.assertEqual(Exportacao.objects.get(pk=recente.pk).status, 'processando')
+        self.assertFalse(Exportacao.objects.filter(pk=antiga.pk).exists())
+
+    def test_resultado_descartado_se_a_reserva_foi_perdida(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        exportacao = Exportacao.objects.create(user=self.secretaria)
+        outra_reserva = timezone.now() + timedelta(minutes=1)
+
+        def gravar_devagar(alvo):
+            Exportacao.objects.filter(pk=alvo.pk).update(reservada_em=outra_reserva)
+            return _gravar(alvo)
+
+        with (
+            override_settings(MEDIA_ROOT=media),
+            mock.patch('solicitacoes.exportacao._gravar', gravar_devagar),
+            self.assertLogs('solicitacoes.exportacao', 'WARNING'),
+        ):
+            resultado = processar_exportacoes()
+
+        self.assertEqual(resultado.pk, exportacao.pk)
+        self.assertEqual((resultado.status, resultado.reservada_em), ('processando', outra_reserva))
+        self.assertFalse(os.listdir(os.path.join(media, 'exportacoes')))
+        self.assertEqual(mail.outbox, [])
+
+
+class EventosTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.aluno = criar_usuario('aluno', 'aluno')
+        cls.coordenador = criar_usuario('coordenador', 'coordenador')
+        cls.disciplina = Disciplina.objects.create(codigo='ALG001', nome='Algoritmos')
+
+    async def test_broker_entrega_de_outra_thread_e_descarta_excesso(self):
+        broker = BrokerLocal(limite=2)
+        assinatura = broker.assinar(['fila:coordenador'])
+        publicacao = threading.Thread(target=broker.publicar, args=('fila:coordenador', 'fila', {'n': 1}))
+        publicacao.start()
+        publicacao.join()
+        self.assertEqual(await assinatura.proximo(1), ('fila', {'n': 1}))
+
+        for numero in range(3):
+            broker.publicar('fila:coordenador', 'fila', {'n': numero})
+        await asyncio.sleep(0)
+        self.assertEqual(await assinatura.proximo(1), ('recarregar', {}))
+        assinatura.fechar()
+        self.assertEqual(broker.conexoes(), 0)
+
+    async def test_coordenador_recebe_nova_solicitacao(self):
+        await self.async_client.aforce_login(self.coordenador)
+        resposta = await self.async_client.get(reverse('eventos'))
+        self.assertEqual(resposta['Content-Type'], 'text/event-stream')
+        fluxo = aiter(resposta.streaming_content)
+        self.assertTrue((await anext(fluxo)).startswith(b'retry: '))
+
+        def criar():
+            with self.captureOnCommitCallbacks(execute=True):
+                return Solicitacao.objects.create(aluno=self.aluno, disciplina=self.disciplina, motivo='Atestado')
+
+        proxima = asyncio.ensure_future(anext(fluxo))
+        await asyncio.sleep(0)
+        solicitacao = await sync_to_async(criar)()
+        mensagem = (await asyncio.wait_for(proxima, 1)).decode()
+        self.assertTrue(mensagem.startswith('event: fila\n'))
+        self.assertIn(f'"id": {solicitacao.id}, "etapa": "coordenador"', mensagem)
+
+        # Desconexão: o servidor ASGI cancela a leitura em andamento.
+        proxima = asyncio.ensure_future(anext(fluxo))
+        await asyncio.sleep(0)
+        proxima.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await proxima
+        self.assertEqual(obter_broker().conexoes(), 0)
+
+    def test_sem_asgi_responde_204(self):
+        self.client.force_login(self.aluno)
+        self.assertEqual(self.client.get(reverse('eventos')).status_code, 204)
+
+
+class BenchmarkTests(TestCase):
+    def test_gera_dados_e_mede_cenarios(self):
+        resultado = benchmark.executar(2, solicitacoes=400, disciplinas=5, alunos=20)
+
+        self.assertEqual(Solicitacao.objects.filter(disciplina__codigo__startswith='BENCH').count(), 400)
+        cenarios = resultado['cenarios']
+        self.assertIn('avaliar_em_lote_50', cenarios)
+        self.assertTrue(all(medida['erros'] == 0 for medida in cenarios.values()))
+        self.assertGreaterEqual(cenarios['avaliar_em_lote_50']['linhas_escritas'], 50)
+
+        pior = {'cenarios': {nome: {**medida, 'consultas': medida['consultas'] + 1} for nome, medida in cenarios.items()}}
+        self.assertEqual(benchmark.comparar(resultado, resultado, 0.5), [])
+        self.assertTrue(benchmark.comparar(pior, resultado, 0.5))
+
+
+@override_settings(INSTRUMENTACAO=True, INSTRUMENTACAO_TOKEN='segredo')
+class InstrumentacaoTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.coordenador = criar_usuario('coordenador', 'coordenador')
+        cls.staff = User.objects.create_user('staff', password='senha-teste', is_staff=True)
+
+    def setUp(self):
+        instrumentacao.registro.zerar()
+        caches[settings.DASHBOARD_CACHE].clear()
+
+    def test_registra_por_view_e_papel(self):
+        self.client.force_login(self.coordenador)
+        resposta = self.client.get(reverse('dashboard_professor'))
+        self.assertIn('db;dur=', resposta['Server-Timing'])
+
+        serie = next(
+            item for item in instrumentacao.registro.resumo()['views']
+            if item['view'] == 'dashboard_professor'
+        )
+        self.assertEqual(serie['papel'], 'coordenador')
+        self.assertEqual(serie['consultas_media'], 4)
+        self.assertGreater(serie['template_ms_medio'], 0)
+
+        self.client.force_login(self.staff)
+        self.assertEqual(self.client.get(reverse('estatisticas_instrumentacao')).status_code, 200)
+
+    def test_exportacao_prometheus(self):
+        self.client.force_login(self.coordenador)
+        self.client.get(reverse('dashboard_professor'))
+        self.assertEqual(self.client.get(reverse('metricas_prometheus')).status_code, 403)
+
+        self.client.logout()
+        resposta = self.client.get(reverse('metricas_prometheus'), headers={'Authorization': 'Bearer segredo'})
+        self.assertContains(
+            resposta,
+            'segunda_chamada_consultas_total{view="dashboard_professor",papel="coordenador"} 4',
+        )
+        self.assertContains(resposta, 'le="+Inf"')
+
+    def test_mede_templates_nas_threads_de_em_paralelo(self):
+        render_original = TemplateBase.render
+        threads = []
+
+        def renderizar():
+            threads.append(threading.get_ident())
+            return engines['django'].from_string('{% for i in itens %}{{ i }}{% endfor %}').render({'itens': range(5000)})
+
+        def view(request):
+            html, = async_to_sync(views._em_paralelo)(renderizar)
+            return HttpResponse(html)
+
+        # Fora de transação, como em produção: cada função em sua thread.
+        with mock.patch('solicitacoes.views._estado_conexoes', return_value=(False, {})):
+            instrumentacao.InstrumentacaoMiddleware(view)(RequestFactory().get('/'))
+
+        self.assertIs(TemplateBase.render, render_original)
+        self.assertNotEqual(threads, [threading.get_ident()])
+        serie = instrumentacao.registro.resumo()['views'][0]
+        self.assertEqual(serie['view'], 'nao_resolvida')
+        self.assertGreater(serie['template_ms_medio'], 0)
+
+    def test_impressao_digital_agrupa_listas_in(self):
+        self.assertEqual(
+            instrumentacao.impressao_digital('SELECT * FROM t WHERE id IN (%s, %s, %s)'),
+            instrumentacao.impressao_digital('SELECT * FROM t WHERE id IN (%s, %s)'),
+        )
+
+
+class EstaticosTests(TestCase):
+    @skipUnless(
+        estaticos.versao_tailwind() == estaticos.TAILWIND_VERSAO,
+        f'Tailwind v{estaticos.TAILWIND_VERSAO} não instalado (requirements-estaticos.txt)',
+    )
+    def test_css_gerado_acompanha_os_templates(self):
+        destino = Path(tempfile.mkdtemp()) / 'app.css'
+        self.addCleanup(shutil.rmtree, destino.parent)
+        estaticos.construir_css(destino)
+        self.assertEqual(
+            estaticos.DESTINO_CSS.read_text(encoding='utf-8'),
+            destino.read_text(encoding='utf-8'),
+            'app.css desatualizado: rode manage.py construir_estaticos',
+        )
+
+    def test_icones_acompanham_os_templates(self):
+        icones = estaticos.DESTINO_ICONES.read_text(encoding='utf-8')
+        for nome in estaticos.icones_usados(estaticos.classes_usadas()):
+            self.assertIn(f'.fa-{nome}::before', icones)
+
+    def test_comando_usa_o_cli_do_tailwind(self):
+        ajuda = mock.Mock(stdout=f'tailwindcss v{estaticos.TAILWIND_VERSAO}\n')
+        with mock.patch('solicitacoes.estaticos.subprocess.run', return_value=ajuda) as executar:
+            call_command('construir_estaticos', '--sem-icones', '--tailwind', '/opt/tailwindcss', stdout=io.StringIO())
+        self.assertEqual(executar.call_args.args[0], [
+            '/opt/tailwindcss', '-i', str(estaticos.ENTRADA_CSS), '-o', str(estaticos.DESTINO_CSS), '--minify',
+        ])
+
+        ajuda.stdout = 'tailwindcss v3.4.17\n'
+        with mock.patch('solicitacoes.estaticos.subprocess.run', return_value=ajuda) as executar:
+            with self.assertRaisesMessage(CommandError, f'gerado pela v{estaticos.TAILWIND_VERSAO}'):
+                call_command('construir_estaticos', '--tailwind', '/opt/tailwindcss', stdout=io.StringIO())
+        self.assertEqual(executar.call_count, 1)
+
+        with self.assertRaisesMessage(CommandError, 'CLI do Tailwind não encontrado'):
+            call_command('construir_estaticos', '--tailwind', '/nao/existe/tailwindcss', stdout=io.StringIO())
+
+    def test_paginas_sem_cdn(self):
+        resposta = self.client.get(reverse('login'))
+        self.assertNotContains(resposta, 'cdn.tailwindcss.com')
+        self.assertNotContains(resposta, 'cdnjs.cloudflare.com')
+        self.assertContains(resposta, '/static/solicitacoes/css/app.css')
+
+    def test_coletados_com_hash_comprimidos_e_cache_longo(self):
+        destino = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, destino)
+        armazenamento = {
+            'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+            'staticfiles': {'BACKEND': 'solicitacoes.estaticos.ArmazenamentoEstatico'},
+        }
+        with override_settings(DEBUG=False, STATIC_ROOT=destino, STORAGES=armazenamento):
+            call_command('collectstatic', interactive=False, verbosity=0)
+            url = staticfiles_storage.url('solicitacoes/css/app.css')
+            self.assertRegex(url, r'/app\.[0-9a-f]{12}\.css$')
+
+            resposta = self.client.get(url, headers={'Accept-Encoding': 'gzip'})
+            self.assertEqual(resposta['Content-Encoding'], 'gzip')
+            self.assertIn('immutable', resposta['Cache-Control'])
+            self.assertEqual(
+                gzip.decompress(b''.join(resposta.streaming_content)),
+                estaticos.DESTINO_CSS.read_bytes(),
+            )
+
+            resposta = self.client.get('/static/solicitacoes/css/app.css')
+            self.assertFalse(resposta.has_header('Content-Encoding'))
+            self.assertIn('no-cache', resposta['Cache-Control'])
+            resposta.close()
+            self.assertEqual(self.client.get('/static/nao-existe.css').status_code, 404)
@@ -0,0 +1,120 @@
+import hashlib
+import os
+import re
+
+from django.conf import settings
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+
+from .armazenamento import PREFIXO_PARCIAIS, armazenamento
+
+# Assinaturas (magic numbers) aceitas para cada tipo permitido.
+TIPOS_PERMITIDOS = {
+    'application/pdf': (b'%PDF',),
+    'application/msword': (b'\xd0\xcf\x11\xe0',),
+    'application/vnd.openxmlformats-officedocument.wordprocessingml.document': (b'PK\x03\x04',),
+    'image/jpeg': (b'\xff\xd8\xff',),
+    'image/png': (b'\x89PNG\r\n\x1a\n',),
+}
+EXTENSOES_PERMITIDAS = {'.pdf', '.doc', '.docx', '.jpg', '.jpeg', '.png'}
+
+# Margem para os demais campos do formulário no corpo multipart.
+FOLGA_FORMULARIO = 256 * 1024
+TAMANHO_LEITURA = 64 * 1024
+
+CONTENT_RANGE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+
+
+def tamanho_maximo():
+    return settings.ARQUIVO_TAMANHO_MAXIMO
+
+
+def validar_metadados(nome, tipo, tamanho):
+    extensao = os.path.splitext(nome or '')[1].lower()
+    if extensao not in EXTENSOES_PERMITIDAS or tipo not in TIPOS_PERMITIDOS:
+        return 'Tipo de arquivo não permitido. Envie PDF, DOC, DOCX, JPG ou PNG.'
+    if tamanho is not None and tamanho > tamanho_maximo():
+        return f'O arquivo excede o limite de {tamanho_maximo() // (1024 * 1024)}MB.'
+    return None
+
+
+def assinatura_valida(tipo, inicio):
+    return any(inicio.startswith(assinatura) for assinatura in TIPOS_PERMITIDOS.get(tipo, ()))
+
+
+class ValidacaoUploadHandler(FileUploadHandler):
+    """Recusa o arquivo antes de ler o corpo inteiro e calcula o SHA-256
+    enquanto as partes chegam (ver request.sha256_arquivos)."""
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        self.tamanho_corpo = content_length
+
+    def new_file(self, field_name, file_name, content_type, content_length, charset=None, content_type_extra=None):
+        super().new_file(field_name, file_name, content_type, content_length, charset, content_type_extra)
+        tamanho = content_length
+        if tamanho is None and self.tamanho_corpo > tamanho_maximo() + FOLGA_FORMULARIO:
+            tamanho = self.tamanho_corpo
+        self._recusar_se(validar_metadados(file_name, content_type, tamanho))
+        self.recebido = 0
+        self.digest = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        if start == 0 and not assinatura_valida(self.content_type, raw_data):
+            self._recusar_se('O conteúdo do arquivo não corresponde ao tipo informado.')
+        self.recebido += len(raw_data)
+        if self.recebido > tamanho_maximo():
+            self._recusar_se(validar_metadados(self.file_name, self.content_type, self.recebido))
+        self.digest.update(raw_data)
+        return raw_data
+
+    def file_complete(self, file_size):
+        # O arquivo em si é montado pelos handlers padrão, que vêm depois deste.
+        if not hasattr(self.request, 'sha256_arquivos'):
+            self.request.sha256_arquivos = {}
+        self.request.sha256_arquivos[self.field_name] = self.digest.hexdigest()
+        return None
+
+    def _recusar_se(self, erro):
+        if erro:
+            self.request.erro_upload = erro
+            raise StopUpload(connection_reset=True)
+
+
+def reservar_nome(upload_id):
+    nome = f'{PREFIXO_PARCIAIS}/{upload_id}'
+    caminho = armazenamento.path(nome)
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    os.close(os.open(caminho, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644))
+    return nome
+
+
+def gravar_parte(upload, inicio, stream, tamanho):
+    caminho = armazenamento.path(upload.nome)
+    gravados = 0
+    fd = os.open(caminho, os.O_WRONLY)
+    try:
+        os.lseek(fd, inicio, os.SEEK_SET)
+        while gravados < tamanho:
+            dados = stream.read(min(TAMANHO_LEITURA, tamanho - gravados))
+            if not dados:
+                break
+            if inicio + gravados == 0 and not assinatura_valida(upload.tipo, dados):
+                return gravados, 'O conteúdo do arquivo não corresponde ao tipo informado.'
+            os.write(fd, dados)
+            gravados += len(dados)
+    finally:
+        os.close(fd)
+    if gravados != tamanho:
+        return gravados, 'Parte incompleta.'
+    return gravados, None
+
+
+def concluir(upload):
+    # Com as partes gravadas em ordem, o conteúdo é lido uma única vez para
+    # o hash e o arquivo é movido (rename) para o blob correspondente.
+    upload.nome = armazenamento.incorporar(armazenamento.path(upload.nome), upload.nome_original)
+    upload.save(update_fields=['nome'])
+
+
+def descartar(upload):
+    armazenamento.delete(upload.nome)
+    upload.delete()
@@ -1,12 +1,34 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 urlpatterns = [
     path('', views.user_login, name='login'),
     path('logout/', views.user_logout, name='logout'),
     path('registro/', views.registro, name='registro'),
     path('dashboard/aluno/', views.dashboard_aluno, name='dashboard_aluno'),
+    path('dashboard/aluno/solicitacoes.json', views.solicitacoes_aluno_json, name='solicitacoes_aluno_json'),
     path('dashboard/professor/', views.dashboard_professor, name='dashboard_professor'),
+    path('dashboard/professor/fila/', views.fila_pendentes, name='fila_pendentes'),
+    path('eventos/', views.eventos, name='eventos'),
     path('nova-solicitacao/', views.nova_solicitacao, name='nova_solicitacao'),
+    path('uploads/', views.iniciar_upload, name='iniciar_upload'),
+    path('uploads/<uuid:upload_id>/', views.parte_upload, name='parte_upload'),
+    path('solicitacoes/<int:solicitacao_id>/arquivo/', views.baixar_arquivo, name='baixar_arquivo'),
     path('avaliar/<int:solicitacao_id>/', views.avaliar_solicitacao, name='avaliar_solicitacao'),
+    path('avaliar/lote/', views.avaliar_em_lote, name='avaliar_em_lote'),
+    path('relatorios/estatisticas/', views.relatorio_estatisticas, name='relatorio_estatisticas'),
+    path('exportacoes/solicitacoes/', views.exportar_solicitacoes, name='exportar_solicitacoes'),
+    path('exportacoes/<uuid:exportacao_id>/', views.exportacao, name='exportacao'),
+    path('exportacoes/<uuid:exportacao_id>/arquivo/', views.baixar_exportacao, name='baixar_exportacao'),
+    path('interno/cache/', views.estatisticas_cache, name='estatisticas_cache'),
+    path('interno/instrumentacao/', views.estatisticas_instrumentacao, name='estatisticas_instrumentacao'),
+    path('interno/usuarios/importar/', views.importar_usuarios, name='importar_usuarios'),
+    path('interno/usuarios/importar/<uuid:importacao_id>/', views.importacao_usuarios, name='importacao_usuarios'),
+    path('interno/metricas/', views.metricas_prometheus, name='metricas_prometheus'),
+    path(f'api/{api.VERSAO}/solicitacoes/', api.solicitacoes, name='api_solicitacoes'),
+    path(f'api/{api.VERSAO}/solicitacoes/<int:solicitacao_id>/decisao/', api.decidir, name='api_decidir'),
+    path(f'api/{api.VERSAO}/fila/', api.fila, name='api_fila'),
+    path(f'api/{api.VERSAO}/avaliadas/', api.avaliadas, name='api_avaliadas'),
+    path(f'api/{api.VERSAO}/notificacoes/', api.notificacoes, name='api_notificacoes'),
+    path(f'api/{api.VERSAO}/notificacoes/lidas/', api.marcar_notificacoes_lidas, name='api_marcar_notificacoes_lidas'),
 ]
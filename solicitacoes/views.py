@@ -1,13 +1,42 @@
+import asyncio
+import csv
+import json
+import uuid
+from contextlib import ExitStack
 from datetime import timedelta
 
-from django.shortcuts import render, redirect, get_object_or_404
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connections
+from django.db.models import Q
+from django.http import Http404, HttpResponse, HttpResponseNotAllowed, JsonResponse, StreamingHttpResponse
+from django.shortcuts import aget_object_or_404, render, redirect, get_object_or_404
+from django.template.loader import render_to_string
+from django.urls import reverse
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
+from django.core.handlers.asgi import ASGIRequest
 from django.contrib import messages
 from django.utils import timezone
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from django.views.decorators.http import require_POST, require_http_methods
 
-from .models import Solicitacao, Perfil, Disciplina, Notificacao
+from . import cache_dashboard, estatisticas, instrumentacao, papeis
+from .busca import filtrar_solicitacoes, paginar
+from .downloads import responder_arquivo
+from .eventos import canais_do_usuario, transmitir
+from .exportacao import FORMATOS, extensao_gravada, gerar, limpar_filtros, nome_arquivo
+from .importacao import detectar_formato
+from .models import FILA_POR_PAPEL, DecisaoConcorrente, Exportacao, ImportacaoUsuarios, Solicitacao, SolicitacaoArquivada, Perfil, Disciplina, Notificacao, UploadParcial
+from .notificacoes import contar_nao_lidas, marcar_lidas
+from .papeis import papel_requerido
+from .uploads import CONTENT_RANGE, ValidacaoUploadHandler, concluir, descartar, gravar_parte, reservar_nome, validar_metadados
+
+PAPEIS_DECISAO_EM_LOTE = ('coordenador', 'secretaria')
+PAPEIS_RELATORIO = ('coordenador', 'secretaria')
+LIMITE_DECISAO_EM_LOTE = 500
 
 
 def user_login(request):
@@ -17,13 +46,10 @@ def user_login(request):
         user = authenticate(request, username=username, password=password)
         if user:
             login(request, user)
-            try:
-                perfil = user.perfil
-                if perfil.tipo == 'aluno':
-                    return redirect('dashboard_aluno')
-                return redirect('dashboard_professor')
-            except Perfil.DoesNotExist:
+            perfil = papeis.perfil_do_usuario(user)
+            if perfil is None or perfil.tipo == 'aluno':
                 return redirect('dashboard_aluno')
+            return redirect('dashboard_professor')
         else:
             messages.error(request, 'Usuário ou senha inválidos.')
     return render(request, 'solicitacoes/login.html')
@@ -77,122 +103,466 @@ def registro(request):
     return render(request, 'solicitacoes/registro.html')
 
 
-@login_required
-def dashboard_aluno(request):
-    try:
-        perfil = request.user.perfil
-        if perfil.tipo != 'aluno':
-            return redirect('dashboard_professor')
-    except Perfil.DoesNotExist:
-        pass
+def _estado_conexoes():
+    return (
+        connections[DEFAULT_DB_ALIAS].in_atomic_block,
+        {conexao.alias: list(conexao.execute_wrappers) for conexao in connections.all()},
+    )
 
-    solicitacoes = list(Solicitacao.objects.filter(aluno=request.user))
-    for solicitacao in solicitacoes:
-        solicitacao.atualizar_status_final()
-        solicitacao.save()
 
-    notificacoes = Notificacao.objects.filter(user=request.user).order_by('-criado_em')[:10]
-    Notificacao.objects.filter(user=request.user, lido=False).update(lido=True)
-    return render(request, 'solicitacoes/dashboard_aluno.html', {
-        'solicitacoes': solicitacoes,
+def _isolada(funcao, wrappers):
+    # Os execute_wrappers da requisição (instrumentação, benchmark) valem
+    # também na outra thread, para que as consultas de lá sejam contadas.
+    def executar():
+        close_old_connections()
+        try:
+            with ExitStack() as pilha:
+                for alias, lista in wrappers.items():
+                    for wrapper in lista:
+                        pilha.enter_context(connections[alias].execute_wrapper(wrapper))
+                return funcao()
+        finally:
+            close_old_connections()
+    return executar
+
+
+async def _em_paralelo(*funcoes):
+    # O ORM assíncrono leva todas as consultas da requisição para uma mesma
+    # thread: aget/acount reunidos em gather() não se sobrepõem. Aqui cada
+    # função roda em sua própria thread e conexão (leituras simultâneas no
+    # WAL). Dentro de uma transação só a conexão atual enxerga o que ainda
+    # não foi confirmado, e as funções seguem em sequência nela.
+    em_transacao, wrappers = await sync_to_async(_estado_conexoes)()
+    if em_transacao:
+        return [await sync_to_async(funcao)() for funcao in funcoes]
+    return await asyncio.gather(*(
+        sync_to_async(_isolada(funcao, wrappers), thread_sensitive=False)() for funcao in funcoes
+    ))
+
+
+@login_required
+@papel_requerido('aluno', sem_perfil=True, redirecionar='dashboard_professor')
+async def dashboard_aluno(request):
+    busca = request.GET.get('q', '').strip()
+    status_filtro = request.GET.get('status', '')
+    pagina, notificacoes, nao_lidas = await _em_paralelo(
+        lambda: _pagina_solicitacoes_aluno(request, busca, status_filtro),
+        lambda: _notificacoes_recentes(request.user),
+        lambda: contar_nao_lidas(request.user.pk),
+    )
+    exibidas_nao_lidas = [notificacao.id for notificacao in notificacoes if not notificacao.lido]
+    lidas = 0
+    if exibidas_nao_lidas:
+        lidas = await sync_to_async(marcar_lidas)(request.user.pk, exibidas_nao_lidas)
+    return await sync_to_async(render)(request, 'solicitacoes/dashboard_aluno.html', {
+        'solicitacoes': pagina['solicitacoes'],
+        'linhas_solicitacoes': pagina['html'],
+        'proximo_cursor': pagina['proximo'],
+        'busca': busca,
+        'status_filtro': status_filtro,
+        'arquivadas': _com_arquivadas(request),
         'notificacoes': notificacoes,
+        # As não lidas além das exibidas.
+        'nao_lidas': max(nao_lidas - lidas, 0),
+    })
+
+
+def _notificacoes_recentes(user):
+    return cache_dashboard.obter(
+        'notificacoes',
+        [f'notificacoes:{user.pk}'],
+        lambda: list(Notificacao.objects.filter(user=user).order_by('-criado_em')[:10]),
+        user.pk,
+    )
+
+
+def _com_arquivadas(request):
+    # As tabelas de arquivadas só são lidas quando a página pede.
+    return request.GET.get('arquivadas') == '1'
+
+
+def _pagina_solicitacoes_aluno(request, busca, status_filtro):
+    cursor = request.GET.get('cursor')
+    arquivadas = _com_arquivadas(request)
+
+    def calcular():
+        def filtrar(modelo):
+            return filtrar_solicitacoes(modelo.objects.do_aluno(request.user), termo=busca, status=status_filtro)
+
+        antigas = filtrar(SolicitacaoArquivada) if arquivadas else None
+        solicitacoes, proximo = paginar(filtrar(Solicitacao), cursor, arquivadas=antigas)
+        html = render_to_string('solicitacoes/partials/linhas_aluno.html', {
+            'solicitacoes': solicitacoes,
+        })
+        return {'solicitacoes': solicitacoes, 'proximo': proximo, 'html': html}
+
+    return cache_dashboard.obter(
+        'pagina_aluno',
+        [f'usuario:{request.user.pk}'],
+        calcular,
+        request.user.pk, busca, status_filtro, cursor, arquivadas,
+    )
+
+
+@login_required
+@papel_requerido('aluno', sem_perfil=True, mensagem='Acesso restrito a alunos.')
+def solicitacoes_aluno_json(request):
+    pagina = _pagina_solicitacoes_aluno(
+        request,
+        request.GET.get('q', '').strip(),
+        request.GET.get('status', ''),
+    )
+    return JsonResponse({
+        'resultados': [
+            {
+                'id': solicitacao.id,
+                'disciplina': solicitacao.disciplina.nome,
+                'status': solicitacao.status,
+                'data_solicitacao': solicitacao.data_solicitacao.isoformat(),
+            }
+            for solicitacao in pagina['solicitacoes']
+        ],
+        'html': pagina['html'],
+        'proximo': pagina['proximo'],
     })
 
 
 @login_required
-def dashboard_professor(request):
-    try:
-        perfil = request.user.perfil
-        if perfil.tipo == 'aluno':
-            return redirect('dashboard_aluno')
-        papel = perfil.tipo
-    except Perfil.DoesNotExist:
-        return redirect('dashboard_aluno')
-
-    base_pendentes = Solicitacao.objects.filter(status='pendente')
-
-    if papel == 'coordenador':
-        solicitacoes_pendentes = base_pendentes.filter(coordenador_status='pendente')
-        solicitacoes_avaliadas = Solicitacao.objects.filter(coordenador_responsavel=request.user)
-    elif papel == 'secretaria':
-        solicitacoes_pendentes = base_pendentes.filter(coordenador_status='aprovada', secretaria_status='pendente')
-        solicitacoes_avaliadas = Solicitacao.objects.filter(secretaria_responsavel=request.user)
-    else:
-        solicitacoes_pendentes = base_pendentes.filter(
-            coordenador_status='aprovada',
-            secretaria_status='aprovada',
-            professor_status='pendente',
-        )
-        solicitacoes_avaliadas = Solicitacao.objects.filter(professor_responsavel=request.user)
+@papel_requerido(*FILA_POR_PAPEL, redirecionar='dashboard_aluno')
+async def dashboard_professor(request):
+    papel = request.papel
+    arquivadas = _com_arquivadas(request)
+
+    pendentes, avaliadas = await _em_paralelo(
+        lambda: _pendentes(papel),
+        lambda: _avaliadas(request.user, papel, arquivadas),
+    )
+
+    return await sync_to_async(render)(request, 'solicitacoes/dashboard_professor.html', {
+        'solicitacoes_pendentes': pendentes['solicitacoes'],
+        'linhas_pendentes': pendentes['html'],
+        'solicitacoes_avaliadas': avaliadas['solicitacoes'],
+        'linhas_avaliadas': avaliadas['html'],
+        # Chamado pelo template apenas se for usado.
+        'disciplinas': _disciplinas_ordenadas,
+        'papel': papel,
+        'arquivadas': arquivadas,
+        'decisao_em_lote': papel in PAPEIS_DECISAO_EM_LOTE,
+        'exportar': papel in PAPEIS_RELATORIO,
+        'status_choices': Solicitacao.STATUS_CHOICES,
+        'etapa_choices': Solicitacao.ETAPA_CHOICES,
+    })
 
-    for solicitacao in solicitacoes_pendentes:
-        solicitacao.atualizar_status_final()
-        solicitacao.save()
-    disciplinas = Disciplina.objects.all().order_by('nome')
 
-    return render(request, 'solicitacoes/dashboard_professor.html', {
-        'solicitacoes_pendentes': solicitacoes_pendentes,
-        'solicitacoes_avaliadas': solicitacoes_avaliadas,
-        'disciplinas': disciplinas,
+def _pendentes(papel):
+    return cache_dashboard.obter(
+        'pendentes',
+        [f'fila:{papel}'],
+        lambda: _listagem('solicitacoes/partials/linhas_pendentes.html', Solicitacao.objects.pendentes_para(papel), papel),
+        papel,
+    )
+
+
+def _avaliadas(user, papel, arquivadas=False):
+    def calcular():
+        solicitacoes = list(Solicitacao.objects.avaliadas_por(user, papel))
+        if arquivadas:
+            solicitacoes = sorted(
+                solicitacoes + list(SolicitacaoArquivada.objects.avaliadas_por(user, papel)),
+                key=lambda solicitacao: solicitacao.data_solicitacao,
+                reverse=True,
+            )
+        return _listagem('solicitacoes/partials/linhas_avaliadas.html', solicitacoes)
+
+    return cache_dashboard.obter('avaliadas', [f'usuario:{user.pk}'], calcular, user.pk, papel, arquivadas)
+
+
+@login_required
+@papel_requerido(*FILA_POR_PAPEL, mensagem='Sem fila de aprovação.')
+def fila_pendentes(request):
+    # Recarregada pelo painel a cada evento da fila, no lugar da página inteira.
+    pendentes = _pendentes(request.papel)
+    return JsonResponse({'html': str(pendentes['html']), 'total': len(pendentes['solicitacoes'])})
+
+
+@login_required
+async def eventos(request):
+    # Sob WSGI cada conexão prenderia uma thread; o 204 faz o EventSource
+    # parar de reconectar e o painel segue como antes.
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+    canais = canais_do_usuario(request.user.pk, request.papel)
+    resposta = StreamingHttpResponse(transmitir(canais), content_type='text/event-stream')
+    resposta['Cache-Control'] = 'no-cache'
+    # Desliga o buffer do nginx para os eventos saírem na hora.
+    resposta['X-Accel-Buffering'] = 'no'
+    return resposta
+
+
+def _listagem(template, queryset, papel=None):
+    solicitacoes = list(queryset)
+    html = render_to_string(template, {
+        'solicitacoes': solicitacoes,
         'papel': papel,
+        'decisao_em_lote': papel in PAPEIS_DECISAO_EM_LOTE,
     })
+    return {'solicitacoes': solicitacoes, 'html': html}
+
+
+def _disciplinas_ordenadas():
+    return cache_dashboard.obter(
+        'disciplinas',
+        ['disciplinas'],
+        lambda: list(Disciplina.objects.all().order_by('nome')),
+    )
+
+
+@staff_member_required
+def estatisticas_cache(request):
+    return JsonResponse(cache_dashboard.estatisticas())
+
+
+@staff_member_required
+def estatisticas_instrumentacao(request):
+    return JsonResponse(instrumentacao.registro.resumo())
+
+
+def _estado_importacao(importacao):
+    return {
+        'id': str(importacao.id),
+        'status': importacao.status,
+        'resultado': importacao.resultado,
+        'criado_em': importacao.criado_em.isoformat(),
+        'concluida_em': importacao.concluida_em.isoformat() if importacao.concluida_em else None,
+        'url': reverse('importacao_usuarios', args=[importacao.id]),
+    }
+
+
+@staff_member_required
+@require_POST
+def importar_usuarios(request):
+    arquivo = request.FILES.get('arquivo')
+    if arquivo is None:
+        return JsonResponse({'erro': 'Envie o arquivo de matrículas no campo "arquivo".'}, status=400)
+    formato = request.POST.get('formato') or detectar_formato(arquivo.name)
+    if formato not in ('csv', 'json'):
+        return JsonResponse({'erro': 'Formato inválido; use csv ou json.'}, status=400)
+
+    # A importação roda no agendador: milhares de hashes de senha não cabem
+    # no tempo de uma requisição.
+    importacao = ImportacaoUsuarios.objects.create(
+        arquivo=arquivo,
+        formato=formato,
+        senha_matricula=request.POST.get('senha_matricula') in ('1', 'true', 'on'),
+        criado_por=request.user,
+    )
+    return JsonResponse(_estado_importacao(importacao), status=202)
+
+
+@staff_member_required
+def importacao_usuarios(request, importacao_id):
+    importacao = get_object_or_404(ImportacaoUsuarios, id=importacao_id)
+    return JsonResponse(_estado_importacao(importacao))
+
+
+def metricas_prometheus(request):
+    token = settings.INSTRUMENTACAO_TOKEN
+    autorizado = request.user.is_active and request.user.is_staff
+    if token and request.headers.get('Authorization') == f'Bearer {token}':
+        autorizado = True
+    if not autorizado:
+        return HttpResponse(status=403)
+    return HttpResponse(instrumentacao.registro.prometheus(), content_type='text/plain; version=0.0.4')
 
 
 @login_required
+@csrf_exempt
 def nova_solicitacao(request):
-    try:
-        perfil = request.user.perfil
-        if perfil.tipo != 'aluno':
-            return redirect('dashboard_professor')
-    except Perfil.DoesNotExist:
-        pass
+    # O handler precisa estar instalado antes de qualquer leitura de request.POST,
+    # inclusive a do CSRF; por isso a verificação fica na função interna.
+    request.upload_handlers.insert(0, ValidacaoUploadHandler(request))
+    return _nova_solicitacao(request)
 
+
+@csrf_protect
+@papel_requerido('aluno', sem_perfil=True, redirecionar='dashboard_professor')
+def _nova_solicitacao(request):
     disciplinas = Disciplina.objects.filter(ativo=True)
 
     if request.method == 'POST':
         disciplina_id = request.POST.get('disciplina')
         motivo = request.POST.get('motivo')
         arquivo = request.FILES.get('arquivo')
+        if arquivo:
+            # Hash calculado pelo ValidacaoUploadHandler durante o recebimento.
+            arquivo.sha256 = request.sha256_arquivos.get('arquivo')
+        erro = getattr(request, 'erro_upload', None)
+        upload = None
+
+        if not erro and request.POST.get('upload'):
+            upload = _upload_do_usuario(request, request.POST['upload'])
+            if upload is None or not upload.concluido:
+                erro = 'O envio do arquivo não foi concluído. Selecione o arquivo novamente.'
+
+        if erro:
+            messages.error(request, erro)
+        else:
+            try:
+                disciplina = Disciplina.objects.get(id=disciplina_id)
+                data_limite = timezone.now() + timedelta(days=7)
+                # Um único INSERT: o arquivo já está no caminho final (envio em
+                # partes) ou é gravado pelo próprio FileField no create.
+                Solicitacao.objects.create(
+                    aluno=request.user,
+                    disciplina=disciplina,
+                    motivo=motivo,
+                    data_limite=data_limite,
+                    arquivo=upload.nome if upload else arquivo,
+                    arquivo_nome=upload.nome_original if upload else getattr(arquivo, 'name', ''),
+                    arquivo_pendente=bool(upload or arquivo),
+                )
+                if upload:
+                    upload.delete()
+
+                messages.success(request, 'Solicitação enviada com sucesso!')
+                return redirect('dashboard_aluno')
+            except Disciplina.DoesNotExist:
+                messages.error(request, 'Disciplina inválida.')
+
+    return render(request, 'solicitacoes/formulario.html', {
+        'disciplinas': disciplinas,
+        'upload_parte_tamanho': settings.UPLOAD_PARTE_TAMANHO,
+        'arquivo_tamanho_maximo': settings.ARQUIVO_TAMANHO_MAXIMO,
+    })
 
-        try:
-            disciplina = Disciplina.objects.get(id=disciplina_id)
-            data_limite = timezone.now() + timedelta(days=7)
-            solicitacao = Solicitacao.objects.create(
-                aluno=request.user,
-                disciplina=disciplina,
-                motivo=motivo,
-                data_limite=data_limite
-            )
 
-            if arquivo:
-                solicitacao.arquivo = arquivo
-                solicitacao.save()
+def _upload_do_usuario(request, upload_id):
+    try:
+        return UploadParcial.objects.filter(pk=uuid.UUID(str(upload_id)), user=request.user).first()
+    except ValueError:
+        return None
 
-            messages.success(request, 'Solicitação enviada com sucesso!')
-            return redirect('dashboard_aluno')
-        except Disciplina.DoesNotExist:
-            messages.error(request, 'Disciplina inválida.')
 
-    return render(request, 'solicitacoes/formulario.html', {
-        'disciplinas': disciplinas
-    })
+def _estado_upload(upload):
+    return {
+        'id': str(upload.id),
+        'recebido': upload.recebido,
+        'tamanho': upload.tamanho,
+        'concluido': upload.concluido,
+        'parte': settings.UPLOAD_PARTE_TAMANHO,
+    }
 
 
 @login_required
-def avaliar_solicitacao(request, solicitacao_id):
+@require_POST
+@papel_requerido('aluno', sem_perfil=True, mensagem='Apenas alunos enviam arquivos comprobatórios.')
+def iniciar_upload(request):
     try:
-        perfil = request.user.perfil
-        if perfil.tipo == 'aluno':
-            return redirect('dashboard_aluno')
-        papel = perfil.tipo
-    except Perfil.DoesNotExist:
-        return redirect('dashboard_aluno')
+        dados = json.loads(request.body)
+        nome = str(dados['nome'])[:255]
+        tipo = str(dados['tipo'])
+        tamanho = int(dados['tamanho'])
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'erro': 'Dados inválidos.'}, status=400)
+
+    erro = validar_metadados(nome, tipo, tamanho) or (tamanho <= 0 and 'Arquivo vazio.')
+    if erro:
+        return JsonResponse({'erro': erro}, status=400)
+
+    upload_id = uuid.uuid4()
+    upload = UploadParcial.objects.create(
+        id=upload_id,
+        user=request.user,
+        nome=reservar_nome(upload_id),
+        nome_original=nome,
+        tipo=tipo,
+        tamanho=tamanho,
+    )
+    return JsonResponse(_estado_upload(upload), status=201)
+
+
+@login_required
+def parte_upload(request, upload_id):
+    upload = get_object_or_404(UploadParcial, pk=upload_id, user=request.user)
+
+    if request.method == 'GET':
+        return JsonResponse(_estado_upload(upload))
+    if request.method == 'DELETE':
+        descartar(upload)
+        return HttpResponse(status=204)
+    if request.method != 'PUT':
+        return HttpResponseNotAllowed(['GET', 'PUT', 'DELETE'])
+
+    intervalo = CONTENT_RANGE.match(request.headers.get('Content-Range', ''))
+    if not intervalo:
+        return JsonResponse({'erro': 'Cabeçalho Content-Range ausente ou inválido.'}, status=400)
+    inicio, fim, total = map(int, intervalo.groups())
+    tamanho = fim - inicio + 1
+    if (
+        total != upload.tamanho
+        or fim >= total
+        or not 0 < tamanho <= settings.UPLOAD_PARTE_TAMANHO
+        or int(request.META.get('CONTENT_LENGTH') or 0) != tamanho
+    ):
+        return JsonResponse({'erro': 'Parte inválida.', **_estado_upload(upload)}, status=400)
+    if inicio != upload.recebido:
+        return JsonResponse({'erro': 'Parte fora de ordem.', **_estado_upload(upload)}, status=409)
+
+    _, erro = gravar_parte(upload, inicio, request, tamanho)
+    if erro:
+        if inicio == 0:
+            descartar(upload)
+        return JsonResponse({'erro': erro}, status=400)
+
+    # Só avança se nenhuma outra requisição já confirmou esta mesma parte.
+    avancou = UploadParcial.objects.filter(pk=upload.pk, recebido=inicio).update(recebido=inicio + tamanho)
+    upload.refresh_from_db(fields=['recebido'])
+    if avancou and upload.concluido:
+        concluir(upload)
+    return JsonResponse(_estado_upload(upload))
+
+
+@login_required
+def baixar_arquivo(request, solicitacao_id):
+    # Uma única consulta pela chave primária: o aluno dono do pedido ou quem
+    # tem o papel da etapa atual.
+    permitido = Q(aluno=request.user)
+    if request.papel in FILA_POR_PAPEL:
+        permitido |= Q(etapa_atual=request.papel)
+    arquivo = (
+        Solicitacao.objects
+        .filter(permitido, pk=solicitacao_id)
+        .exclude(arquivo='').exclude(arquivo__isnull=True)
+        .order_by()
+        .values_list('arquivo', 'arquivo_nome', 'arquivo_tipo')
+        .first()
+    )
+    if arquivo is None:
+        # Anexo de solicitação arquivada: só o aluno dono do pedido.
+        arquivo = (
+            SolicitacaoArquivada.objects
+            .filter(aluno=request.user, pk=solicitacao_id)
+            .exclude(arquivo='').exclude(arquivo__isnull=True)
+            .order_by()
+            .values_list('arquivo', 'arquivo_nome', 'arquivo_tipo')
+            .first()
+        )
+    if arquivo is None:
+        raise Http404('Arquivo não encontrado.')
+    nome, nome_download, tipo = arquivo
+    storage = Solicitacao._meta.get_field('arquivo').storage
+    return responder_arquivo(request, storage, nome, nome_download, tipo or None)
+
+
+@login_required
+@papel_requerido(*FILA_POR_PAPEL, redirecionar='dashboard_aluno')
+async def avaliar_solicitacao(request, solicitacao_id):
+    papel = request.papel
 
-    solicitacao = get_object_or_404(Solicitacao, id=solicitacao_id)
+    solicitacao = await aget_object_or_404(Solicitacao.objects.select_related('aluno', 'disciplina'), id=solicitacao_id)
 
     if solicitacao.prazo_expirado:
-        solicitacao.atualizar_status_final()
-        solicitacao.save()
+        await sync_to_async(Solicitacao.objects.filter(pk=solicitacao.pk).expirar)()
         messages.error(request, 'Prazo expirado para esta solicitação.')
         return redirect('dashboard_professor')
 
@@ -201,24 +571,205 @@ def avaliar_solicitacao(request, solicitacao_id):
         return redirect('dashboard_professor')
 
     if request.method == 'POST':
+        # A decisão grava em transação e notifica: segue pelo caminho síncrono.
+        return await sync_to_async(_decidir)(request, solicitacao, papel)
+
+    return await sync_to_async(render)(request, 'solicitacoes/avaliar_solicitacao.html', {
+        'solicitacao': solicitacao,
+        'papel': papel,
+    })
+
+
+def _decidir(request, solicitacao, papel):
+    decisao = request.POST.get('decisao')
+    observacoes = request.POST.get('observacoes', '')
+
+    if decisao not in ['aprovada', 'rejeitada']:
+        messages.error(request, 'Decisão inválida.')
+        return redirect('dashboard_professor')
+
+    if (papel == 'coordenador' or decisao == 'rejeitada') and not observacoes:
+        messages.error(request, 'Inclua uma justificativa para esta decisão.')
+        return redirect('avaliar_solicitacao', solicitacao_id=solicitacao.id)
+
+    try:
+        solicitacao.registrar_decisao(papel, request.user, decisao, observacoes)
+    except DecisaoConcorrente:
+        messages.error(
+            request,
+            f'A solicitação #{solicitacao.id} foi alterada por outra pessoa enquanto você avaliava '
+            f'e já não está na sua fila; nada foi gravado.',
+        )
+        return redirect('dashboard_professor')
+    solicitacao.notificar_aluno(f'Seu pedido foi {decisao} pelo {papel}.')
+
+    messages.success(request, f'Solicitação {decisao} com sucesso!')
+    return redirect('dashboard_professor')
+
+
+@login_required
+@require_POST
+@papel_requerido(
+    *PAPEIS_DECISAO_EM_LOTE,
+    redirecionar='dashboard_professor',
+    mensagem='Apenas a coordenação e a secretaria podem decidir em lote.',
+)
+def avaliar_em_lote(request):
+    quer_json = request.content_type == 'application/json'
+
+    def responder(erro=None, resultados=None, status=200):
+        if quer_json:
+            if erro:
+                return JsonResponse({'erro': erro}, status=status)
+            return JsonResponse({'resultados': resultados})
+        if erro:
+            messages.error(request, erro)
+        else:
+            aplicadas = sum(1 for resultado in resultados if resultado['ok'])
+            if aplicadas:
+                messages.success(request, f'{aplicadas} solicitação(ões) {decisao}(s) com sucesso!')
+            for resultado in resultados:
+                if not resultado['ok']:
+                    messages.error(request, f'Solicitação #{resultado["id"]}: {resultado["resultado"]}.')
+        return redirect('dashboard_professor')
+
+    papel = request.papel
+    if quer_json:
+        try:
+            dados = json.loads(request.body)
+        except ValueError:
+            dados = None
+        if not isinstance(dados, dict):
+            return responder('JSON inválido.', status=400)
+        ids = dados.get('ids', [])
+        decisao = dados.get('decisao')
+        observacoes = dados.get('observacoes', '')
+        # No JSON os ids vêm como números; no formulário, como texto.
+        if not isinstance(ids, list) or not all(type(solicitacao_id) is int for solicitacao_id in ids):
+            return responder('Identificadores inválidos.', status=400)
+        if not isinstance(observacoes, str):
+            return responder('Observações inválidas.', status=400)
+    else:
+        ids = request.POST.getlist('ids')
         decisao = request.POST.get('decisao')
         observacoes = request.POST.get('observacoes', '')
 
-        if decisao not in ['aprovada', 'rejeitada']:
-            messages.error(request, 'Decisão inválida.')
-            return redirect('dashboard_professor')
+    try:
+        ids = list(dict.fromkeys(int(solicitacao_id) for solicitacao_id in ids))
+    except (TypeError, ValueError):
+        return responder('Identificadores inválidos.', status=400)
 
-        if (papel == 'coordenador' or decisao == 'rejeitada') and not observacoes:
-            messages.error(request, 'Inclua uma justificativa para esta decisão.')
-            return redirect('avaliar_solicitacao', solicitacao_id=solicitacao.id)
+    if not ids:
+        return responder('Selecione ao menos uma solicitação.', status=400)
+    if len(ids) > LIMITE_DECISAO_EM_LOTE:
+        return responder(f'Selecione no máximo {LIMITE_DECISAO_EM_LOTE} solicitações por vez.', status=400)
+    if decisao not in ['aprovada', 'rejeitada']:
+        return responder('Decisão inválida.', status=400)
+    if (papel == 'coordenador' or decisao == 'rejeitada') and not observacoes:
+        return responder('Inclua uma justificativa para esta decisão.', status=400)
+
+    resultados = Solicitacao.registrar_decisoes_em_lote(ids, papel, request.user, decisao, observacoes)
+    return responder(resultados=resultados)
+
+
+@login_required
+@papel_requerido(*PAPEIS_RELATORIO, staff=True, mensagem='Apenas a coordenação e a secretaria acessam os relatórios.')
+def relatorio_estatisticas(request):
+    # Lê apenas as tabelas de estatísticas: o custo depende do número de
+    # disciplinas e avaliadores, não do de solicitações.
+    agrupar = request.GET.get('agrupar', 'disciplina')
+    if agrupar == 'disciplina':
+        linhas = estatisticas.relatorio_por_disciplina()
+    elif agrupar == 'responsavel':
+        linhas = estatisticas.relatorio_por_responsavel()
+    else:
+        return JsonResponse({'erro': 'Use agrupar=disciplina ou agrupar=responsavel.'}, status=400)
+
+    if request.GET.get('formato') == 'csv':
+        resposta = HttpResponse(content_type='text/csv; charset=utf-8')
+        resposta['Content-Disposition'] = f'attachment; filename="estatisticas-{agrupar}.csv"'
+        if linhas:
+            escritor = csv.DictWriter(resposta, fieldnames=list(linhas[0]))
+            escritor.writeheader()
+            escritor.writerows(linhas)
+        return resposta
+    return JsonResponse({'agrupamento': agrupar, 'linhas': linhas})
+
+
+def _estado_exportacao(exportacao):
+    concluida = exportacao.status == 'concluida'
+    return {
+        'id': str(exportacao.id),
+        'status': exportacao.status,
+        'formato': exportacao.formato,
+        'filtros': exportacao.filtros,
+        'linhas': exportacao.linhas,
+        'criado_em': exportacao.criado_em.isoformat(),
+        'concluida_em': exportacao.concluida_em.isoformat() if exportacao.concluida_em else None,
+        'url': reverse('exportacao', args=[exportacao.id]),
+        'arquivo': reverse('baixar_exportacao', args=[exportacao.id]) if concluida else None,
+    }
 
-        solicitacao.registrar_decisao(papel, request.user, decisao, observacoes)
-        solicitacao.notificar_aluno(f'Seu pedido foi {decisao} pelo {papel}.')
 
-        messages.success(request, f'Solicitação {decisao} com sucesso!')
+@login_required
+@require_http_methods(['GET', 'POST'])
+@papel_requerido(*PAPEIS_RELATORIO, staff=True, mensagem='Apenas a coordenação e a secretaria exportam solicitações.')
+def exportar_solicitacoes(request):
+
+    quer_json = request.content_type == 'application/json'
+    if request.method == 'POST' and quer_json:
+        try:
+            dados = json.loads(request.body)
+        except ValueError:
+            dados = None
+        if not isinstance(dados, dict):
+            return JsonResponse({'erro': 'JSON inválido.'}, status=400)
+    else:
+        dados = request.GET if request.method == 'GET' else request.POST
+
+    formato = dados.get('formato') or 'csv'
+    try:
+        if formato not in FORMATOS:
+            raise ValueError('Formato inválido; use csv ou xlsx.')
+        filtros = limpar_filtros(dados)
+    except ValueError as erro:
+        if request.method == 'POST' and not quer_json:
+            messages.error(request, str(erro))
+            return redirect('dashboard_professor')
+        return JsonResponse({'erro': str(erro)}, status=400)
+
+    # POST JSON ou o botão "segundo_plano" do painel vão para a fila: o
+    # agendador grava o arquivo comprimido e avisa por e-mail quando termina.
+    if request.method == 'POST' and (quer_json or dados.get('segundo_plano')):
+        exportacao = Exportacao.objects.create(user=request.user, formato=formato, filtros=filtros)
+        if quer_json:
+            return JsonResponse(_estado_exportacao(exportacao), status=202)
+        messages.success(request, 'Exportação enfileirada; você receberá o link por e-mail quando ela estiver pronta.')
         return redirect('dashboard_professor')
 
-    return render(request, 'solicitacoes/avaliar_solicitacao.html', {
-        'solicitacao': solicitacao,
-        'papel': papel,
-    })
+    # As linhas saem do cursor direto para o cliente, em blocos: a memória não
+    # cresce com o tamanho do resultado e o download começa de imediato.
+    tipo, _ = FORMATOS[formato]
+    resposta = StreamingHttpResponse(gerar(formato, filtros), content_type=tipo)
+    resposta['Content-Disposition'] = f'attachment; filename="{nome_arquivo(formato)}"'
+    resposta['Cache-Control'] = 'private, no-store'
+    return resposta
+
+
+@login_required
+def exportacao(request, exportacao_id):
+    exportacao = get_object_or_404(Exportacao, id=exportacao_id, user=request.user)
+    return JsonResponse(_estado_exportacao(exportacao))
+
+
+@login_required
+def baixar_exportacao(request, exportacao_id):
+    exportacao = get_object_or_404(Exportacao, id=exportacao_id, user=request.user, status='concluida')
+    if not exportacao.arquivo:
+        raise Http404('Arquivo não encontrado.')
+    nome_download = nome_arquivo(exportacao.formato, timezone.localdate(exportacao.criado_em))
+    tipo = FORMATOS[exportacao.formato][0]
+    if extensao_gravada(exportacao.formato).endswith('.gz'):
+        nome_download, tipo = f'{nome_download}.gz', 'application/gzip'
+    storage = Exportacao._meta.get_field('arquivo').storage
+    return responder_arquivo(request, storage, exportacao.arquivo.name, nome_download, tipo)